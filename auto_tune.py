@@ -0,0 +1,315 @@
+"""
+Auto-tuner proposing the next parameters to try, from what was tried before.
+
+Observations come from the flag history of the controller: flags with a measured score
+(sweeps, auto-tune trials, see param_sweep.py; for flags driven on the car, the best lap
+the telemetry recorded, see telemetry.py) and flags whose reason says how the car
+behaved ("Golden" as good as the best score seen, "Too Slow", "Unstable Control" and "Too
+Agressive" as bad as the worst). Scores of failed laps (above lap_sim.LAP_TIME_LIMIT) are
+capped: how far a failed lap got says little about how close its parameters are, and
+the cliff between failures and laps would dominate the fit. A Gaussian process over the schema ranges (scaled to
+[0, 1], log of the score) is fitted to them in NumPy, and the next batch maximizes the
+expected improvement over random and local candidates. Trials still running (proposed,
+not observed yet) enter the fit with their predicted score ("kriging believer"), so the
+batch spreads out and trials can run asynchronously: propose more whenever a car or
+worker is free, observe results in any order.
+
+    python auto_tune.py pure_pursuit --trials 60 --parallel 4      (lap_sim as the car)
+
+Trials run headless are recorded in the flag history with the reason "Auto-tune" and
+their metrics. In the UI, "Propose" fills the sliders with the next trial; the operator
+drives it and flags it, and the next proposal learns from that flag.
+"""
+
+import argparse
+import math
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from flag_history import TUNE_REASON, get_history
+from lap_sim import LAP_TIME_LIMIT, SimulatedLapEvaluator
+from param_schema import load_schema
+
+# Flag reasons without a score, as a quantile of the scores seen (0 best, 1 worst)
+REASON_QUANTILES = {"Golden": 0.0, "Too Slow": 0.75, "Unstable Control": 1.0, "Too Agressive": 1.0}
+
+HISTORY_LIMIT = 500
+LENGTH_SCALES = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6)
+NOISE = 1e-3
+
+
+def _erf(x):
+    # Abramowitz and Stegun 7.1.26, absolute error below 1.5e-7
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1 - poly * np.exp(-x * x))
+
+
+def expected_improvement(mean, std, best):
+    """
+    Expected improvement below best (minimization) of normal predictions.
+    """
+
+    std = np.maximum(std, 1e-9)
+    z = (best - mean) / std
+    return (best - mean) * 0.5 * (1 + _erf(z / math.sqrt(2))) + std * np.exp(-0.5 * z * z) / math.sqrt(2 * math.pi)
+
+
+class GaussianProcess:
+    """
+    Gaussian process with a squared exponential kernel on inputs in [0, 1]^d. One length
+    scale per input, picked from LENGTH_SCALES by marginal likelihood: the best common
+    one first, then one input at a time, so inputs that do not matter get a long one,
+    unless lengths are given.
+    """
+
+    def __init__(self, x, y, noise=NOISE, lengths=None):
+        self.x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.mean, self.scale = y.mean(), y.std() or 1.0
+        self.y = (y - self.mean) / self.scale
+        self.noise = noise
+        if lengths is not None:
+            _, self.lengths, self._chol, self._alpha = self._fit(np.asarray(lengths, dtype=float))
+            return
+        dims = self.x.shape[1]
+        best = max((self._fit(np.full(dims, length)) for length in LENGTH_SCALES), key=lambda fit: fit[0])
+        for dim in range(dims):
+            for length in LENGTH_SCALES:
+                if length == best[1][dim]:
+                    continue
+                lengths = best[1].copy()
+                lengths[dim] = length
+                fit = self._fit(lengths)
+                if fit[0] > best[0]:
+                    best = fit
+        _, self.lengths, self._chol, self._alpha = best
+
+    @staticmethod
+    def _kernel(a, b, lengths):
+        a, b = a / lengths, b / lengths
+        sq = (a * a).sum(1)[:, None] + (b * b).sum(1)[None, :] - 2 * a @ b.T
+        return np.exp(-0.5 * np.maximum(sq, 0))
+
+    def _fit(self, lengths):
+        k = self._kernel(self.x, self.x, lengths) + self.noise * np.eye(len(self.x))
+        try:
+            chol = np.linalg.cholesky(k)
+        except np.linalg.LinAlgError:
+            return -np.inf, lengths, None, None
+        alpha = np.linalg.solve(chol.T, np.linalg.solve(chol, self.y))
+        likelihood = -0.5 * self.y @ alpha - np.log(np.diag(chol)).sum()
+        return likelihood, lengths, chol, alpha
+
+    def predict(self, x):
+        """
+        Mean and standard deviation at the rows of x, in the units of y.
+        """
+
+        k = self._kernel(np.asarray(x, dtype=float), self.x, self.lengths)
+        mean = k @ self._alpha
+        v = np.linalg.solve(self._chol, k.T)
+        var = np.maximum(1 - (v * v).sum(0), 1e-12)
+        return self.mean + self.scale * mean, self.scale * np.sqrt(var)
+
+
+class AutoTuner:
+    """
+    Proposes configurations of a schema; see the module docstring. Not thread safe.
+    """
+
+    def __init__(self, schema, seed=None, candidates=2000, score_cap=LAP_TIME_LIMIT):
+        self.schema = schema
+        self.score_cap = score_cap
+        self.candidates = candidates
+        self.rng = np.random.default_rng(seed)
+        self.params = list(schema.params)
+        self.low = np.array([param.min for param in self.params], dtype=float)
+        self.high = np.array([param.max for param in self.params], dtype=float)
+        self._scored = []    # (x, log score)
+        self._judged = []    # (x, quantile) from flag reasons
+        self.pending = {}    # key -> x
+        self.observed = set()
+
+    def encode(self, params):
+        values = []
+        for param in self.params:
+            value = params.get(param.name)
+            if value is None:
+                value = param.default if param.default is not None else param.min
+            values.append(value)
+        return (np.array(values, dtype=float) - self.low) / (self.high - self.low)
+
+    def decode(self, x):
+        params = {}
+        for param, value in zip(self.params, self.low + np.clip(x, 0, 1) * (self.high - self.low)):
+            value = param.min + round((value - param.min) / param.step) * param.step
+            value = min(max(value, param.min), param.max)
+            params[param.name] = int(round(value)) if param.type == "int" else round(value, 10)
+        return self.schema.validate(params)
+
+    @staticmethod
+    def key(params):
+        return tuple(sorted(params.items()))
+
+    def observe(self, params, score=None, reason=None):
+        """
+        Add the outcome of params: a score (lower is better) or a flag reason of
+        REASON_QUANTILES. Ends the pending trial of params, if any.
+        """
+
+        self.pending.pop(self.key(params), None)
+        self.observed.add(self.key(params))
+        x = self.encode(params)
+        if score is not None:
+            self._scored.append((x, math.log(min(max(score, 1e-6), self.score_cap))))
+        elif reason in REASON_QUANTILES:
+            self._judged.append((x, REASON_QUANTILES[reason]))
+
+    def add_pending(self, params):
+        """
+        Count params as a running trial, unless it was observed already.
+        """
+
+        if self.key(params) not in self.observed:
+            self.pending[self.key(params)] = self.encode(params)
+
+    def load_history(self, history=None, limit=HISTORY_LIMIT, telemetry_store=None):
+        """
+        Observe the latest limit flags of the controller, scored by their metrics or else
+        by their best lap in telemetry_store (a telemetry.TelemetryStore); returns how
+        many were usable.
+        """
+
+        history = history or get_history()
+        laps = {}
+        if telemetry_store is not None:
+            laps = {row.record_id: row.best_lap for row in telemetry_store.rank(self.schema.name, limit) if row.best_lap is not None}
+        before = len(self)
+        for record in history.query(controller=self.schema.name, limit=limit).records:
+            score = (record.metrics or {}).get("score", laps.get(record.record_id))
+            self.observe({name: record.params.get(name) for name in self.schema.names}, score, record.flag_reason)
+        return len(self) - before
+
+    def __len__(self):
+        return len(self._scored) + len(self._judged)
+
+    def _observations(self):
+        xs = [x for x, _ in self._scored]
+        ys = [y for _, y in self._scored]
+        if ys:
+            low, high = min(ys), max(ys)
+        else:
+            low, high = 0.0, 1.0
+        for x, quantile in self._judged:
+            xs.append(x)
+            ys.append(low + quantile * (high - low))
+        return np.array(xs).reshape(-1, len(self.params)), np.array(ys)
+
+    def _candidates(self, x, y):
+        uniform = self.rng.random((self.candidates, len(self.params)))
+        if not len(y):
+            return uniform
+        # Local candidates around the best observations
+        best = x[np.argsort(y)[:5]]
+        local = best[self.rng.integers(len(best), size=self.candidates // 2)] + self.rng.normal(0, 0.05, (self.candidates // 2, len(self.params)))
+        return np.clip(np.vstack((uniform, local)), 0, 1)
+
+    def propose(self, n=1):
+        """
+        The next n configurations to try, registered as pending until observed.
+        """
+
+        x, y = self._observations()
+        # The length scales are searched once per batch, the fantasies reuse them.
+        base = GaussianProcess(x, y) if len(y) >= 2 else None
+        proposals = []
+        for _ in range(n):
+            if base is None:
+                candidate = self.rng.random(len(self.params))
+            else:
+                fantasies = np.array(list(self.pending.values())).reshape(-1, len(self.params))
+                model = base
+                if len(fantasies):
+                    model = GaussianProcess(np.vstack((x, fantasies)), np.concatenate((y, base.predict(fantasies)[0])), lengths=base.lengths)
+                candidates = self._candidates(x, y)
+                mean, std = model.predict(candidates)
+                candidate = candidates[np.argmax(expected_improvement(mean, std, y.min()))]
+            params = self.decode(candidate)
+            self.pending[self.key(params)] = self.encode(params)
+            proposals.append(params)
+        return proposals
+
+    def best(self):
+        """
+        (params, score) of the best scored observation, or None.
+        """
+
+        if not self._scored:
+            return None
+        x, y = min(self._scored, key=lambda item: item[1])
+        return self.decode(x), math.exp(y)
+
+
+def _evaluate(evaluator, controller, params):
+    return params, evaluator(controller, params)
+
+
+def tune(controller, trials=60, parallel=4, evaluator=None, history=None, record=True, seed=None, use_history=True):
+    """
+    Run trials asynchronously, at most parallel at a time, proposing a new one whenever
+    one completes, and yield (params, metrics) in completion order. With record, every
+    trial is appended to the flag history with TUNE_REASON.
+    """
+
+    evaluator = evaluator or SimulatedLapEvaluator()
+    schema = load_schema(controller)
+    tuner = AutoTuner(schema, seed=seed)
+    if record or use_history:
+        history = history or get_history()
+    if use_history:
+        tuner.load_history(history)
+    tune_id = time.strftime("%Y%m%d-%H%M%S")
+    submitted = 0
+
+    with ProcessPoolExecutor(max_workers=parallel) as executor:
+        pending = set()
+        while pending or submitted < trials:
+            count = min(parallel - len(pending), trials - submitted)
+            for params in tuner.propose(count) if count > 0 else []:
+                pending.add(executor.submit(_evaluate, evaluator, controller, params))
+                submitted += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                params, metrics = future.result()
+                tuner.observe(params, metrics["score"])
+                if record:
+                    history.append_many([(controller, params, TUNE_REASON, f"auto-tune {tune_id}", None)], metrics=[metrics])
+                yield params, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune a controller against lap_sim (or another evaluator).")
+    parser.add_argument("controller")
+    parser.add_argument("--trials", type=int, default=60)
+    parser.add_argument("--parallel", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--no-history", action="store_true", help="Neither read nor record the flag history")
+    args = parser.parse_args()
+
+    best = None
+    for i, (params, metrics) in enumerate(tune(args.controller, args.trials, args.parallel, record=not args.no_history,
+                                               seed=args.seed, use_history=not args.no_history)):
+        if best is None or metrics["score"] < best[0]:
+            best = (metrics["score"], params)
+        print(f"trial {i + 1:3d}  score {metrics['score']:8.3f}  best {best[0]:8.3f}  {params}")
+    print(f"best: score {best[0]:.3f}  {best[1]}")
+
+
+if __name__ == "__main__":
+    main()
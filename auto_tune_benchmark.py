@@ -0,0 +1,84 @@
+"""
+Convergence of the auto-tuner (auto_tune.py) against random search on the simulated
+controllers (lap_sim.py): the best lap score after a number of laps, median over seeds,
+and the laps each needs to reach the score random search ends with (its median best
+after all laps).
+
+Laps run in batches of --parallel, as cars or workers would: the tuner proposes a whole
+batch before seeing its results.
+
+Usage:
+    python auto_tune_benchmark.py [--laps 60] [--parallel 4] [--seeds 10]
+"""
+
+import argparse
+import statistics
+import time
+
+from auto_tune import AutoTuner
+from lap_sim import SimulatedLapEvaluator
+from param_schema import load_schema
+from param_sweep import random_search
+
+CHECKPOINTS = (8, 16, 32, 60)
+
+
+def best_so_far(scores):
+    best, curve = float("inf"), []
+    for score in scores:
+        best = min(best, score)
+        curve.append(best)
+    return curve
+
+
+def tuner_scores(schema, evaluator, laps, parallel, seed):
+    tuner = AutoTuner(schema, seed=seed)
+    scores = []
+    while len(scores) < laps:
+        for params in tuner.propose(min(parallel, laps - len(scores))):
+            score = evaluator(schema.name, params)["score"]
+            tuner.observe(params, score)
+            scores.append(score)
+    return scores
+
+
+def random_scores(schema, evaluator, laps, seed):
+    return [evaluator(schema.name, params)["score"] for params in random_search(schema, count=laps, seed=seed)]
+
+
+def laps_to_reach(curve, target):
+    return next((i + 1 for i, best in enumerate(curve) if best <= target), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--laps", type=int, default=60)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--seeds", type=int, default=10)
+    args = parser.parse_args()
+    evaluator = SimulatedLapEvaluator()
+    checkpoints = [laps for laps in CHECKPOINTS if laps <= args.laps]
+
+    header = " ".join(f"{f'{laps} laps':>9s}" for laps in checkpoints)
+    print(f"{'':13s} {'method':7s} {header}  laps to random's final score (median, runs reaching it)")
+    for controller in ("wall_follow", "gap_follow", "pure_pursuit"):
+        schema = load_schema(controller)
+        started = time.perf_counter()
+        curves = {
+            "tuner": [best_so_far(tuner_scores(schema, evaluator, args.laps, args.parallel, seed)) for seed in range(args.seeds)],
+            "random": [best_so_far(random_scores(schema, evaluator, args.laps, seed)) for seed in range(args.seeds)],
+        }
+        target = statistics.median(curve[-1] for curve in curves["random"])
+        for method, runs in curves.items():
+            medians = " ".join(f"{statistics.median(curve[laps - 1] for curve in runs):9.2f}" for laps in checkpoints)
+            # Runs that never got there count as more than args.laps.
+            reached = [laps_to_reach(curve, target) or float("inf") for curve in runs]
+            median = statistics.median_high(reached)
+            count = sum(laps <= args.laps for laps in reached)
+            to_target = f"{median:5.0f} ({count}/{len(runs)})" if median <= args.laps else f"{f'>{args.laps}':>5s} ({count}/{len(runs)})"
+            print(f"{controller:13s} {method:7s} {medians}  {to_target}")
+        print(f"{'':13s} ({time.perf_counter() - started:.0f} s, target score {target:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Multi-operator stress benchmark of one tuning server.
+
+Launches roboracer_ui.py in a subprocess (see param_client_benchmark.py), then:
+
+1. Readers alone: clients calling pure_pursuit_latest and pure_pursuit_set in a loop.
+2. The same readers while writer clients flag distinct pure_pursuit configurations as
+   fast as they can. Read latency should not follow the writes.
+
+Then checks correctness: every flag stored exactly once with a unique record id, and
+the src/ and install/ pure_pursuit_params.json both holding the latest flag in the
+history.
+
+Usage:
+    python concurrency_benchmark.py [--writers 8] [--flags 50] [--readers 8] [--concurrency 16]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from flag_history import FlagHistory
+from gradio_param_client import AsyncParamClient
+from param_client_benchmark import free_port, launch_server, percentile
+from param_schema import load_schema
+
+CONTROLLER = "pure_pursuit"
+
+
+def config(writer, n):
+    return {"throttle": 0.2, "kp": round(1 + writer * 0.1, 1), "kv": 1.0, "lookahead_distance": round(n % 50 / 10, 1)}
+
+
+async def reader(client, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.call(f"{CONTROLLER}_latest", "")
+        await client.set_params(CONTROLLER, config(0, 0))
+        latencies.append((time.perf_counter() - start) / 2)
+
+
+async def writer(client, index, flags, record_ids):
+    for n in range(flags):
+        record_ids.append(await client.flag(CONTROLLER, config(index, n), "Other", f"writer {index} flag {n}"))
+
+
+async def stress(url, writers, flags, readers, seconds):
+    async with AsyncParamClient(url, max_connections=writers + readers) as client:
+        stop = asyncio.Event()
+        idle = []
+        tasks = [asyncio.create_task(reader(client, stop, idle)) for _ in range(readers)]
+        await asyncio.sleep(seconds)
+        stop.set()
+        await asyncio.gather(*tasks)
+
+        stop = asyncio.Event()
+        loaded = []
+        record_ids = []
+        tasks = [asyncio.create_task(reader(client, stop, loaded)) for _ in range(readers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(writer(client, index, flags, record_ids) for index in range(writers)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*tasks)
+    return idle, loaded, record_ids, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--flags", type=int, default=50, help="Flags per writer")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=16, help="ROBORACER_QUEUE_CONCURRENCY of the server")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of the readers-only phase")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        package = load_schema(CONTROLLER).package
+        paths = [
+            os.path.join(directory, "ws", "src", package, "config", "pure_pursuit_params.json"),
+            os.path.join(directory, "ws", "install", package, "share", package, "config", "pure_pursuit_params.json"),
+        ]
+        for path in paths:
+            os.makedirs(os.path.dirname(path))
+
+        server, url = launch_server(directory, free_port(), ROBORACER_QUEUE_CONCURRENCY=str(args.concurrency))
+        try:
+            idle, loaded, record_ids, elapsed = asyncio.run(stress(url, args.writers, args.flags, args.readers, args.seconds))
+            time.sleep(0.5)
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"readers alone:        p50 {percentile(idle, 0.5) * 1000:6.1f} ms, p99 {percentile(idle, 0.99) * 1000:6.1f} ms ({len(idle)} reads)")
+        print(f"readers during flags: p50 {percentile(loaded, 0.5) * 1000:6.1f} ms, p99 {percentile(loaded, 0.99) * 1000:6.1f} ms ({len(loaded)} reads)")
+        print(f"{args.writers} writers: {len(record_ids)} flags in {elapsed:.2f} s ({len(record_ids) / elapsed:.0f} flags/s)")
+
+        history = FlagHistory(os.path.join(directory, "flag_history.sqlite3"))
+        stored = history.count(controller=CONTROLLER, reason="Other")
+        latest = history.latest(CONTROLLER)
+        history.close()
+        files = []
+        for path in paths:
+            with open(path) as f:
+                files.append(json.load(f))
+        consistent = all(data.get("flag_msg") == latest.flag_msg and {k: data[k] for k in latest.params} == latest.params for data in files)
+        sent = args.writers * args.flags
+        print(
+            f"correctness: sent {sent}, stored {stored}, unique record ids {len(set(record_ids))}, "
+            f"workspace files match the latest flag ({latest.flag_msg!r}): {consistent}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Hot reload of the <controller>_params.json files for the consuming nodes.
+
+Instead of re-reading the JSON on a timer, a node hands the files to a ConfigWatcher:
+
+    watcher = ConfigWatcher(config_paths("wall_follow"), on_params, schema="wall_follow")
+    watcher.start()
+
+On Linux the watcher blocks on inotify (through ctypes, no dependency) on the config
+directories, so a new file is picked up as soon as it is renamed into place (see
+param_writer.write_atomic) and an idle watcher costs no CPU. Elsewhere, or when inotify
+is not available, it falls back to polling the files' mtime, size and inode.
+
+A change is only delivered when the content actually changed: the watcher keeps the
+hash of every file and of the last delivered content, so rewrites of the same
+configuration and the src/ and install/ copies written by one flag reach the callback
+once. When the copies differ (e.g. at start-up, with an install/ copy older than an
+edit of the src/ one), the most recently modified one is delivered, and a copy older
+than the delivered configuration is never delivered after it. The content is parsed
+and validated against the controller's schema; callback(params) gets the typed params
+dict (flag_reason and flag_msg stripped). Invalid files are logged and skipped, the
+last good configuration stays in effect.
+
+    python config_watcher.py wall_follow    (reference consumer, prints every new configuration)
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from flag_history import FLAG_FIELDS
+from param_schema import load_schema
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 0.1
+
+# <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct("iIII")
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+
+class Inotify:
+    """
+    Minimal ctypes binding of inotify: watch directories, wait for the names of changed
+    entries.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._directories = {}
+
+    def add_watch(self, directory, mask=WATCH_MASK):
+        wd = self._add_watch(self.fd, os.fsencode(directory), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify_add_watch failed: {os.strerror(errno)}", directory)
+        self._directories[wd] = directory
+        return wd
+
+    def read(self, timeout=None):
+        """
+        Wait up to timeout for events; returns [(directory, name, mask)].
+        """
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+            offset += length
+            events.append((self._directories.get(wd), name, mask))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class ConfigWatcher:
+    """
+    Calls callback(params) from a background thread whenever the content of one of the
+    watched JSON files changes. backend is "auto", "inotify" or "poll".
+    """
+
+    def __init__(self, paths, callback, schema=None, backend="auto", poll_interval=DEFAULT_POLL_INTERVAL):
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.callback = callback
+        self.schema = load_schema(schema) if isinstance(schema, str) else schema
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self.skipped = 0
+        self.errors = 0
+        self.params = None
+        self._digests = {}
+        # Hash and mtime of the delivered content
+        self._digest = None
+        self._mtime = None
+        self._stats = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        if backend not in ("auto", "inotify", "poll"):
+            raise ValueError(f"Unknown backend {backend!r}")
+        if backend != "poll":
+            try:
+                self._inotify = Inotify()
+                for directory in sorted({os.path.dirname(path) for path in self.paths}):
+                    self._inotify.add_watch(directory)
+            except (OSError, AttributeError) as e:
+                if self._inotify is not None:
+                    self._inotify.close()
+                    self._inotify = None
+                if backend == "inotify":
+                    raise
+                logger.info("inotify not available (%s), polling every %.2f s", e, poll_interval)
+        self.backend = "inotify" if self._inotify else "poll"
+
+    def parse(self, payload):
+        """
+        The validated params of a file's content. Raises ValueError.
+        """
+
+        data = json.loads(payload)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        params = {key: value for key, value in data.items() if key not in FLAG_FIELDS}
+        return self.schema.validate(params) if self.schema else params
+
+    def check(self, paths):
+        """
+        Reload from paths (one path, or several that changed together): of those whose
+        content changed, the most recently modified valid one, unless the delivered
+        configuration is newer. Returns True when the callback was called.
+        """
+
+        if isinstance(paths, (str, os.PathLike)):
+            paths = [paths]
+        newest = None
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    payload = f.read()
+                    mtime = os.fstat(f.fileno()).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                self.errors += 1
+                logger.warning("Cannot read %s: %s", path, e)
+                continue
+
+            digest = hashlib.blake2b(payload, digest_size=16).digest()
+            if digest == self._digests.get(path) or digest == self._digest:
+                self._digests[path] = digest
+                self.skipped += 1
+                continue
+            self._digests[path] = digest
+            if self._mtime is not None and mtime < self._mtime:
+                self.skipped += 1
+                logger.info("Ignoring %s, older than the current configuration", path)
+                continue
+            try:
+                params = self.parse(payload)
+            except ValueError as e:
+                self.errors += 1
+                logger.warning("Ignoring invalid configuration %s: %s", path, e)
+                continue
+            if newest is None or mtime > newest[0]:
+                newest = (mtime, digest, params)
+
+        if newest is None:
+            return False
+        self._mtime, self._digest, params = newest
+        self.params = params
+        self.reloads += 1
+        try:
+            self.callback(params)
+        except Exception:
+            logger.exception("Config watcher callback failed")
+        return True
+
+    def _changed_stats(self):
+        changed = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            except FileNotFoundError:
+                key = None
+            if self._stats.get(path) != key:
+                self._stats[path] = key
+                if key is not None:
+                    changed.append(path)
+        return changed
+
+    def run(self):
+        """
+        Deliver the current configuration, then watch until stop().
+        """
+
+        self.check(self._changed_stats())
+        watched = {os.path.split(path): path for path in self.paths}
+        while not self._stop.is_set():
+            if self._inotify is None:
+                self._stop.wait(self.poll_interval)
+                self.check(self._changed_stats())
+                continue
+
+            # The timeout only bounds the reaction to stop().
+            events = self._inotify.read(timeout=0.5)
+            if any(mask & IN_Q_OVERFLOW for _, _, mask in events):
+                changed = self.paths
+            else:
+                changed = []
+                for directory, name, mask in events:
+                    path = watched.get((directory, name))
+                    if path and not mask & IN_DELETE and path not in changed:
+                        changed.append(path)
+            self.check(changed)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    from flagging import config_paths
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python config_watcher.py <controller>")
+    controller = sys.argv[1]
+    paths = config_paths(controller)
+
+    def on_params(params):
+        logger.info("%s parameters: %s", controller, params)
+
+    watcher = ConfigWatcher(paths, on_params, schema=controller)
+    logger.info("Watching %s (%s)", ", ".join(paths), watcher.backend)
+    with watcher:
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark of config_watcher.py against node-side polling.
+
+A consumer process watches the src/ and install/ copies of a params file while this
+process flags a new configuration (atomic writes of both copies) at random intervals.
+For each way of watching, the consumer reports its CPU time over the run and the delay
+between each write and the moment it had the new parameters:
+
+    inotify      ConfigWatcher, inotify backend
+    stat-10hz    ConfigWatcher, polling fallback (stat every 100 ms, read on change)
+    reread-10hz  what a node does today: re-read, parse and validate the file every 100 ms
+
+Usage:
+    python config_watcher_benchmark.py [--seconds 20] [--changes 40]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from config_watcher import ConfigWatcher
+from param_schema import load_schema
+from param_writer import write_atomic
+
+MODES = ["inotify", "stat-10hz", "reread-10hz"]
+
+
+def config(kp):
+    return json.dumps({"kp": kp, "kd": 0.1, "ki": 0.0, "lookahead_dist": 1.0, "throttle": None, "flag_reason": "Latest", "flag_msg": ""}).encode()
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def consumer(mode, paths, seconds, ready, results):
+    received = []
+
+    def on_params(params):
+        received.append((params["kp"], time.monotonic()))
+
+    start_cpu = cpu_seconds()
+    end = time.monotonic() + seconds
+    if mode == "reread-10hz":
+        schema = load_schema("wall_follow")
+        current = None
+        ready.set()
+        while time.monotonic() < end:
+            for path in paths:
+                with open(path, "rb") as f:
+                    data = json.load(f)
+                params = schema.validate({key: value for key, value in data.items() if key not in ("flag_reason", "flag_msg")})
+                if params != current:
+                    current = params
+                    on_params(params)
+            time.sleep(0.1)
+    else:
+        backend = "inotify" if mode == "inotify" else "poll"
+        with ConfigWatcher(paths, on_params, schema="wall_follow", backend=backend, poll_interval=0.1):
+            ready.set()
+            time.sleep(max(0.0, end - time.monotonic()))
+    results.put((cpu_seconds() - start_cpu, received))
+
+
+def run(mode, directory, seconds, changes):
+    paths = [os.path.join(directory, name, "wall_follow_params.json") for name in ("src", "install")]
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, config(0.0))
+
+    ready = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=consumer, args=(mode, paths, seconds, ready, results))
+    process.start()
+    ready.wait()
+    time.sleep(0.2)
+
+    written = {}
+    deadline = time.monotonic() + seconds - 1.0
+    for i in range(1, changes + 1):
+        time.sleep(random.uniform(0.5, 1.5) * (seconds - 1.5) / changes)
+        if time.monotonic() > deadline:
+            break
+        kp = round(i * 0.1, 1)
+        written[kp] = time.monotonic()
+        for path in paths:
+            write_atomic(path, config(kp))
+
+    cpu, received = results.get()
+    process.join()
+    latencies = [(at - written[kp]) * 1000 for kp, at in received if kp in written]
+    return cpu, len(written), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--changes", type=int, default=40)
+    args = parser.parse_args()
+
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as directory:
+            cpu, written, latencies = run(mode, directory, args.seconds, args.changes)
+        latencies.sort()
+        print(
+            f"{mode:12s} CPU {cpu / args.seconds * 60 * 1000:7.1f} ms per minute, "
+            f"{len(latencies)}/{written} changes seen, latency p50 {statistics.median(latencies):6.2f} ms, "
+            f"max {latencies[-1]:6.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Vectorized reference simulators of the three controllers, for instant parameter previews.
+
+Every simulator takes a batch of parameter sets (a list of params dicts) and evaluates
+all of them in one NumPy pass, with one array row per parameter set:
+
+    simulate_wall_follow   PID wall follower driving along a wall with a recess, using the
+                           two-beam distance estimate of the wall_follow node
+    gap_follow             disparity extender and gap selection on LiDAR scans
+    simulate_pure_pursuit  pure pursuit tracker on a waypoint track
+
+The scans and the track are synthetic by default (synthetic_scan(), synthetic_track());
+recorded ones can be passed in. preview() returns the plot data shown next to the
+sliders in the tuning UI.
+"""
+
+import math
+
+import numpy as np
+
+import lap_sim
+
+WHEELBASE = lap_sim.WHEELBASE
+MAX_STEER = lap_sim.MAX_STEER
+MAX_SPEED = lap_sim.MAX_SPEED
+
+# wall_follow
+DESIRED_DISTANCE = 1.0
+BEAM_GAP = math.radians(50)
+WALL_RECESS_X = 12.0
+WALL_RECESS_DEPTH = 0.8
+MAX_RANGE = 10.0
+
+# gap_follow
+SCAN_BEAMS = 1080
+SCAN_FOV = math.radians(270)
+DISPARITY_THRESHOLD = 0.3
+
+
+def _array(params_list, name, default=np.nan):
+    return np.array([default if params.get(name) is None else params[name] for params in params_list], dtype=float)
+
+
+def _speed(throttle, steer):
+    # Manual throttle, or the speed schedule of the node when throttle is not set (NaN).
+    angle = np.abs(steer)
+    scheduled = np.where(angle < math.radians(10), 0.6, np.where(angle < math.radians(20), 0.4, 0.2)) * MAX_SPEED
+    return np.where(np.isnan(throttle), scheduled, throttle * MAX_SPEED)
+
+
+def _wall_range(x, y, heading):
+    """
+    Range along a beam from (x, y) with absolute heading to the left wall: y = 0 before
+    WALL_RECESS_X and y = WALL_RECESS_DEPTH after it.
+    """
+
+    sin, cos = np.sin(heading), np.cos(heading)
+    safe_sin = np.where(sin > 1e-6, sin, np.nan)
+    near = -y / safe_sin
+    far = (WALL_RECESS_DEPTH - y) / safe_sin
+    hit_near = x + near * cos
+    ranges = np.where(hit_near < WALL_RECESS_X, near, far)
+    return np.nan_to_num(np.clip(ranges, 0, MAX_RANGE), nan=MAX_RANGE)
+
+
+def simulate_wall_follow(params_list, duration=8.0, dt=0.02, start_distance=0.4):
+    """
+    Drive every parameter set along the wall. Returns (t, distance) with distance the
+    distance to the wall, shape (len(params_list), len(t)).
+    """
+
+    kp, kd, ki = (_array(params_list, name) for name in ("kp", "kd", "ki"))
+    lookahead = _array(params_list, "lookahead_dist")
+    throttle = _array(params_list, "throttle")
+
+    batch = len(params_list)
+    steps = int(duration / dt)
+    x = np.zeros(batch)
+    y = np.full(batch, -start_distance)
+    psi = np.zeros(batch)
+    integral = np.zeros(batch)
+    previous = None
+    distance = np.empty((batch, steps))
+
+    for step in range(steps):
+        b = _wall_range(x, y, psi + math.pi / 2)
+        a = _wall_range(x, y, psi + math.pi / 2 - BEAM_GAP)
+        alpha = np.arctan2(a * math.cos(BEAM_GAP) - b, a * math.sin(BEAM_GAP))
+        future = b * np.cos(alpha) + lookahead * np.sin(alpha)
+        error = DESIRED_DISTANCE - future
+        derivative = np.zeros(batch) if previous is None else (error - previous) / dt
+        previous = error
+        integral += error * dt
+
+        steer = np.clip(-(kp * error + kd * derivative + ki * integral), -MAX_STEER, MAX_STEER)
+        speed = _speed(throttle, steer)
+        x += speed * np.cos(psi) * dt
+        y += speed * np.sin(psi) * dt
+        psi += speed * np.tan(steer) / WHEELBASE * dt
+        distance[:, step] = np.where(x < WALL_RECESS_X, 0.0, WALL_RECESS_DEPTH) - y
+
+    return np.arange(steps) * dt, distance
+
+
+def scan_angles(beams=SCAN_BEAMS, fov=SCAN_FOV):
+    return np.linspace(-fov / 2, fov / 2, beams)
+
+
+def synthetic_scan(beams=SCAN_BEAMS, obstacle=(1.6, 0.25, 0.25), half_width=1.2):
+    """
+    Scan of a corridor of the given half width with a round obstacle (x, y, radius).
+    Arrays of obstacles or widths (one per frame) give one scan per frame, (F, N).
+    """
+
+    angles = scan_angles(beams)
+    sin, cos = np.sin(angles), np.cos(angles)
+    half_width = np.asarray(half_width, dtype=float)[..., None]
+    with np.errstate(divide="ignore"):
+        walls = np.where(np.abs(sin) > 1e-6, half_width / np.abs(sin), np.inf)
+
+    ox, oy, radius = (np.asarray(value, dtype=float)[..., None] for value in obstacle)
+    projection = ox * cos + oy * sin
+    miss = (ox - projection * cos) ** 2 + (oy - projection * sin) ** 2
+    hit = (projection > 0) & (miss <= radius ** 2)
+    obstacle_ranges = np.where(hit, projection - np.sqrt(np.maximum(radius ** 2 - miss, 0)), np.inf)
+    return np.clip(np.minimum(walls, obstacle_ranges), 0, MAX_RANGE)
+
+
+def extend_disparities(ranges, extender):
+    """
+    Disparity extender on a batch of scans, ranges (B, N), extender (B,) in beams: at
+    every jump of more than DISPARITY_THRESHOLD between neighbouring beams, the closer
+    range is copied over extender beams on the far side.
+    """
+
+    ranges = np.asarray(ranges, dtype=float)
+    batch, beams = ranges.shape
+    extender = np.broadcast_to(np.asarray(extender, dtype=float), (batch,))
+
+    jumps = np.diff(ranges, axis=1)
+    rows, cols = np.nonzero(np.abs(jumps) > DISPARITY_THRESHOLD)
+    if rows.size == 0:
+        return ranges.copy()
+
+    # Pad the disparities of every row into (B, K) arrays.
+    counts = np.bincount(rows, minlength=batch)
+    width = counts.max()
+    slot = np.arange(rows.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    closer = np.full((batch, width), np.inf)
+    start = np.zeros((batch, width))
+    stop = np.full((batch, width), -1.0)
+
+    rising = jumps[rows, cols] > 0
+    closer[rows, slot] = np.where(rising, ranges[rows, cols], ranges[rows, cols + 1])
+    ext = extender[rows]
+    # Rising jump: the far side is to the right of cols, else to the left of cols + 1.
+    start[rows, slot] = np.where(rising, cols + 1, cols + 1 - ext)
+    stop[rows, slot] = np.where(rising, cols + ext, cols)
+
+    # One (B, N) pass per disparity slot keeps the memory at the size of the scans.
+    index = np.arange(beams)
+    extended = ranges.copy()
+    for k in range(width):
+        covered = (index >= start[:, k, None]) & (index <= stop[:, k, None])
+        np.minimum(extended, np.where(covered, closer[:, k, None], np.inf), out=extended)
+    return extended
+
+
+def select_gaps(ranges, min_gap, max_actionable_dist):
+    """
+    Pick the widest run of free beams (range above max_actionable_dist) of at least
+    min_gap beams in every scan. Returns (start, stop, target) beam indices, (B,) each;
+    rows without such a gap aim at their farthest beam and get start = stop = -1.
+    """
+
+    batch, beams = ranges.shape
+    free = ranges > np.asarray(max_actionable_dist, dtype=float).reshape(-1, 1)
+    edges = np.diff(np.pad(free.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+    lengths = stops - starts
+
+    min_gap = np.broadcast_to(np.asarray(min_gap, dtype=float), (batch,))
+    valid = lengths >= np.maximum(min_gap[start_rows], 1)
+    start_rows, starts, stops, lengths = start_rows[valid], starts[valid], stops[valid], lengths[valid]
+
+    gap_start = np.full(batch, -1)
+    gap_stop = np.full(batch, -1)
+    target = np.argmax(ranges, axis=1)
+    if start_rows.size:
+        order = np.lexsort((-lengths, start_rows))
+        first = order[np.r_[True, start_rows[order][1:] != start_rows[order][:-1]]]
+        rows = start_rows[first]
+        gap_start[rows] = starts[first]
+        gap_stop[rows] = stops[first] - 1
+        target[rows] = (gap_start[rows] + gap_stop[rows]) // 2
+    return gap_start, gap_stop, target
+
+
+def gap_follow(params_list, scan=None):
+    """
+    Run every parameter set on one scan. Returns (extended ranges (B, N), steering angle (B,)).
+    """
+
+    scan = synthetic_scan() if scan is None else np.asarray(scan, dtype=float)
+    ranges = np.broadcast_to(scan, (len(params_list), scan.shape[-1]))
+    extended = extend_disparities(ranges, _array(params_list, "disparity_extender"))
+    _, _, target = select_gaps(extended, _array(params_list, "window_half_size"), _array(params_list, "max_actionable_dist"))
+    return extended, scan_angles(scan.shape[-1])[target]
+
+
+def synthetic_track(spacing=0.1):
+    """
+    Waypoints (M, 2) of the lap_sim test track centerline.
+    """
+
+    points = [(0.0, 0.0)]
+    heading = 0.0
+    for length, curvature in lap_sim.TRACK:
+        for _ in range(int(round(length / spacing))):
+            heading += curvature * spacing
+            x, y = points[-1]
+            points.append((x + spacing * math.cos(heading), y + spacing * math.sin(heading)))
+    return np.array(points)
+
+
+def simulate_pure_pursuit(params_list, waypoints=None, duration=20.0, dt=0.05, window=40):
+    """
+    Track the waypoints with every parameter set. Returns (path (B, T, 2), cross track
+    error (B, T)). The nearest waypoint is searched in a window ahead of the previous one.
+    """
+
+    waypoints = synthetic_track() if waypoints is None else np.asarray(waypoints, dtype=float)
+    arc = np.r_[0.0, np.cumsum(np.hypot(*np.diff(waypoints, axis=0).T))]
+
+    kp, kv = _array(params_list, "kp"), _array(params_list, "kv")
+    throttle = _array(params_list, "throttle")
+    lookahead = np.maximum(_array(params_list, "lookahead_distance"), 0.3)
+
+    batch = len(params_list)
+    steps = int(duration / dt)
+    first = waypoints[1] - waypoints[0]
+    x = np.full(batch, waypoints[0, 0])
+    y = np.full(batch, waypoints[0, 1])
+    psi = np.full(batch, math.atan2(first[1], first[0]))
+    nearest = np.zeros(batch, dtype=int)
+    offsets = np.arange(window)
+    rows = np.arange(batch)
+    path = np.empty((batch, steps, 2))
+    error = np.empty((batch, steps))
+
+    for step in range(steps):
+        candidates = np.minimum(nearest[:, None] + offsets, len(waypoints) - 1)
+        dist = np.hypot(waypoints[candidates, 0] - x[:, None], waypoints[candidates, 1] - y[:, None])
+        best = dist.argmin(axis=1)
+        nearest = candidates[rows, best]
+        error[:, step] = dist[rows, best]
+
+        target = np.minimum(np.searchsorted(arc, arc[nearest] + lookahead), len(waypoints) - 1)
+        dx, dy = waypoints[target, 0] - x, waypoints[target, 1] - y
+        alpha = np.arctan2(dy, dx) - psi
+        curvature = kp * 2 * np.sin(alpha) / lookahead
+        steer = np.clip(np.arctan(WHEELBASE * curvature), -MAX_STEER, MAX_STEER)
+        speed = np.where(nearest >= len(waypoints) - 1, 0.0, throttle * MAX_SPEED / (1 + kv * np.abs(curvature)))
+
+        x = x + speed * np.cos(psi) * dt
+        y = y + speed * np.sin(psi) * dt
+        psi = psi + speed * np.tan(steer) / WHEELBASE * dt
+        path[:, step, 0] = x
+        path[:, step, 1] = y
+
+    return path, error
+
+
+# Plot type and axis titles of the preview of every controller.
+PREVIEWS = {
+    "wall_follow": ("line", "time (s)", "distance to wall (m)"),
+    "gap_follow": ("scatter", "x (m)", "y (m)"),
+    "pure_pursuit": ("scatter", "x (m)", "y (m)"),
+}
+
+
+def preview(controller, params_list, labels):
+    """
+    Plot data for a batch of parameter sets: columns x, y and config (the label of the
+    row's parameter set), as a dict of arrays.
+    """
+
+    labels = np.asarray(labels)
+    if controller == "wall_follow":
+        t, distance = simulate_wall_follow(params_list)
+        x = np.tile(t, len(params_list))
+        y = distance.ravel()
+        config = np.repeat(labels, len(t))
+    elif controller == "gap_follow":
+        extended, steer = gap_follow(params_list)
+        angles = scan_angles(extended.shape[1])
+        # Extended scans as points, plus a 2 m ray per parameter set towards its target.
+        ray = np.linspace(0, 2, 20)
+        x = np.concatenate([(extended * np.cos(angles)).ravel(), (np.cos(steer)[:, None] * ray).ravel()])
+        y = np.concatenate([(extended * np.sin(angles)).ravel(), (np.sin(steer)[:, None] * ray).ravel()])
+        config = np.concatenate([np.repeat(labels, len(angles)), np.repeat(labels, len(ray))])
+    elif controller == "pure_pursuit":
+        waypoints = synthetic_track()
+        path, _ = simulate_pure_pursuit(params_list, waypoints)
+        x = np.concatenate([waypoints[:, 0], path[:, :, 0].ravel()])
+        y = np.concatenate([waypoints[:, 1], path[:, :, 1].ravel()])
+        config = np.concatenate([np.full(len(waypoints), "track"), np.repeat(labels, path.shape[1])])
+    else:
+        raise KeyError(f"No simulator for controller {controller!r}")
+    return {"x": x, "y": y, "config": config}
@@ -0,0 +1,56 @@
+"""
+Benchmark of the vectorized controller simulators: a batch of random parameter sets in
+one array pass versus one simulator call per parameter set, and the latency of the
+preview shown next to the sliders (current sliders plus the examples).
+
+Usage:
+    python controller_sim_benchmark.py [--configs 256] [--seed 0]
+"""
+
+import argparse
+import time
+
+import controller_sim
+from param_schema import load_schema
+from param_sweep import random_search
+
+SIMULATORS = {
+    "wall_follow": controller_sim.simulate_wall_follow,
+    "gap_follow": controller_sim.gap_follow,
+    "pure_pursuit": controller_sim.simulate_pure_pursuit,
+}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for controller, simulate in SIMULATORS.items():
+        schema = load_schema(controller)
+        configs = list(random_search(schema, count=args.configs, seed=args.seed))
+
+        batched = timed(simulate, configs)
+        looped = sum(timed(simulate, [params]) for params in configs)
+
+        defaults = schema.defaults()
+        preview = [defaults] + [dict(defaults, **example) for example in schema.examples]
+        labels = ["current"] + [f"example {i}" for i in range(1, len(schema.examples) + 1)]
+        preview_time = min(timed(controller_sim.preview, controller, preview, labels) for _ in range(5))
+
+        print(
+            f"{controller:13s} {len(configs)} configs: batched {batched * 1000:8.1f} ms, "
+            f"per-config loop {looped * 1000:8.1f} ms ({looped / batched:5.1f}x), "
+            f"preview of {len(preview)} configs {preview_time * 1000:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
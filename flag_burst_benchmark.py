@@ -0,0 +1,116 @@
+"""
+Stress benchmark: high-rate flag bursts from several operators at once.
+
+1. The previous scheme, flagged_data_{int(time.time())}.json, at the target rate: every
+   flag in the same second overwrites the previous one.
+2. flagging.flag() from several processes (operators / scripted sweeps) sharing one
+   history database at the target combined rate. Every flag must be stored exactly once.
+3. flagging.flag_many() with a whole burst in a single call.
+
+Usage:
+    python flag_burst_benchmark.py [--rate 1000] [--seconds 5] [--processes 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from flag_history import FlagHistory
+from flagging import flag, flag_many
+from param_writer import ParamWriter
+
+
+def params(i):
+    return {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": round(i * 0.001, 3)}
+
+
+def paced(count, rate):
+    start = time.perf_counter()
+    for i in range(count):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield i
+
+
+def legacy_burst(directory, count, rate):
+    for i in paced(count, rate):
+        with open(f"{directory}/flagged_data_{int(time.time())}.json", "w") as f:
+            json.dump(params(i), f, indent=4)
+    return len(os.listdir(directory))
+
+
+def operator(db_path, paths, worker, count, rate, results):
+    history = FlagHistory(db_path)
+    writer = ParamWriter()
+    record_ids = []
+    start = time.perf_counter()
+    for i in paced(count, rate):
+        record_id, _ = flag("pure_pursuit", params(i), "Latest", f"worker {worker}", history=history, writer=writer, paths=paths)
+        record_ids.append(record_id)
+    writer.flush()
+    results.put((worker, time.perf_counter() - start, record_ids, writer.pop_errors()))
+    history.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=1000, help="Combined flags per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+    total = int(args.rate * args.seconds)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy_dir = os.path.join(directory, "legacy")
+        os.makedirs(legacy_dir)
+        kept = legacy_burst(legacy_dir, min(total, int(args.rate * 2)), args.rate)
+        sent = min(total, int(args.rate * 2))
+        print(f"legacy second-resolution files: {sent} flags -> {kept} files ({sent - kept} lost)")
+
+        db_path = os.path.join(directory, "flag_history.sqlite3")
+        config_dir = os.path.join(directory, "config")
+        os.makedirs(config_dir)
+        paths = [os.path.join(config_dir, "pure_pursuit_params.json")]
+        FlagHistory(db_path).close()
+
+        per_process = total // args.processes
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(target=operator, args=(db_path, paths, worker, per_process, args.rate / args.processes, results))
+            for worker in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        outcomes = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        record_ids = [record_id for outcome in outcomes for record_id in outcome[2]]
+        errors = [error for outcome in outcomes for error in outcome[3]]
+        history = FlagHistory(db_path)
+        stored = history.count(controller="pure_pursuit")
+        print(
+            f"flag() x {args.processes} processes: {len(record_ids)} flags in {elapsed:.2f} s "
+            f"({len(record_ids) / elapsed:.0f} flags/s), stored {stored}, "
+            f"unique ids {len(set(record_ids))}, lost {len(record_ids) - stored}, write errors {len(errors)}"
+        )
+
+        burst = [params(i) for i in range(int(args.rate))]
+        writer = ParamWriter()
+        start = time.perf_counter()
+        record_ids, future = flag_many("pure_pursuit", burst, "Other", "bulk", history=history, writer=writer, paths=paths)
+        future.result()
+        elapsed = time.perf_counter() - start
+        print(f"flag_many(): {len(burst)} flags in {elapsed * 1000:.1f} ms ({len(burst) / elapsed:.0f} flags/s), "
+              f"stored {history.count(controller='pure_pursuit', reason='Other')}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
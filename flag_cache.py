@@ -0,0 +1,197 @@
+"""
+In-memory view over the flag history: latest (golden) configuration per controller,
+diffs and rollback.
+
+    cache = get_cache()
+    golden = cache.latest_golden("gap_follow")      # dict lookup once warm
+    cache.diff(golden.record_id, other_record_id)   # {name: (old, new)}
+    cache.rollback(golden.record_id)                # flags it again as the latest config
+
+The latest flag of every (controller, reason) pair is looked up once from the history
+and then kept current as flags arrive: appends through the same FlagHistory reach the
+cache through a history listener, appends from other processes are picked up by sync(),
+which only reads the rows added since the last one it saw. Nothing is ever rebuilt by
+rescanning. Individual records are kept in an LRU of maxsize entries.
+"""
+
+import collections
+import threading
+import time
+
+from flag_history import SIMULATED_REASONS, get_history
+from flagging import flag
+
+GOLDEN = "Golden"
+ROLLBACK_REASON = "Latest"
+ANY_REASON = None
+
+
+def diff_params(old, new):
+    """
+    {name: (old value, new value)} for every parameter that differs, in the order of old
+    then new.
+    """
+
+    names = list(old) + [name for name in new if name not in old]
+    return {name: (old.get(name), new.get(name)) for name in names if old.get(name) != new.get(name)}
+
+
+def _newer(record, other):
+    # The later of two FlagRecords, either of which may be None.
+    if record is None or (other is not None and (other.flagged_at, other.id) > (record.flagged_at, record.id)):
+        return other
+    return record
+
+
+class FlagCache:
+    """
+    Thread safe cache over a FlagHistory. sync_interval bounds how often lookups check
+    the database for flags appended by other processes (None: only on sync()).
+    """
+
+    def __init__(self, history=None, maxsize=1024, sync_interval=1.0):
+        self.history = history or get_history()
+        self.maxsize = maxsize
+        self.sync_interval = sync_interval
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._latest = {}
+        # Lookups reading the database: key -> [readers, newest record appended meanwhile]
+        self._pending = {}
+        self._records = collections.OrderedDict()
+        self._last_id = self.history.max_id()
+        self._last_sync = time.monotonic()
+        self.history.add_listener(self._on_append)
+
+    def _remember(self, record):
+        self._records[record.record_id] = record
+        self._records.move_to_end(record.record_id)
+        while len(self._records) > self.maxsize:
+            self._records.popitem(last=False)
+
+    def _on_append(self, records):
+        with self._lock:
+            for record in records:
+                self._remember(record)
+                self._last_id = max(self._last_id, record.id)
+                keys = [(record.controller, record.flag_reason)]
+                if record.flag_reason not in SIMULATED_REASONS:
+                    # Simulated flags are never the latest configuration of the car.
+                    keys.append((record.controller, ANY_REASON))
+                for key in keys:
+                    # Only pairs already looked up are kept current; others load on first use.
+                    if key in self._latest:
+                        self._latest[key] = _newer(self._latest[key], record)
+                    if key in self._pending:
+                        self._pending[key][1] = _newer(self._pending[key][1], record)
+
+    def sync(self):
+        """
+        Apply the flags appended since the last one seen (by any process).
+        """
+
+        while True:
+            records = self.history.after(self._last_id)
+            if not records:
+                break
+            self._on_append(records)
+        self._last_sync = time.monotonic()
+
+    def _maybe_sync(self):
+        if self.sync_interval is not None and time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def latest(self, controller, reason=ANY_REASON):
+        """
+        The latest FlagRecord of controller (with reason, if given), or None.
+        """
+
+        self._maybe_sync()
+        key = (controller, reason)
+        with self._lock:
+            if key in self._latest:
+                self.hits += 1
+                return self._latest[key]
+            # An append may land while the lock is released; _on_append keeps it here.
+            self._pending.setdefault(key, [0, None])[0] += 1
+        try:
+            record = self.history.latest(controller, reason)
+        finally:
+            with self._lock:
+                pending = self._pending[key]
+                pending[0] -= 1
+                if not pending[0]:
+                    del self._pending[key]
+        with self._lock:
+            self.misses += 1
+            record = _newer(record, pending[1])
+            if key in self._latest:
+                record = _newer(self._latest[key], record)
+            self._latest[key] = record
+            if record is not None:
+                self._remember(record)
+            return record
+
+    def latest_golden(self, controller):
+        return self.latest(controller, GOLDEN)
+
+    def get(self, record_id):
+        """
+        The FlagRecord of record_id, or None.
+        """
+
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is not None:
+                self.hits += 1
+                self._records.move_to_end(record_id)
+                return record
+        record = self.history.get(record_id)
+        with self._lock:
+            self.misses += 1
+            if record is not None:
+                self._remember(record)
+        return record
+
+    def params(self, config):
+        """
+        The params of config: a record id, a FlagRecord or a params dict.
+        """
+
+        if isinstance(config, dict):
+            return config
+        record = config if hasattr(config, "params") else self.get(config)
+        if record is None:
+            raise KeyError(f"No flag {config!r} in the history")
+        return record.params
+
+    def diff(self, old, new):
+        return diff_params(self.params(old), self.params(new))
+
+    def rollback(self, record_id, flag_msg=None, **kwargs):
+        """
+        Flag the configuration of record_id again as the latest one, which rewrites the
+        workspace copies (see flagging.flag()). Returns (new record id, write future).
+        """
+
+        record = self.get(record_id)
+        if record is None:
+            raise KeyError(f"No flag {record_id!r} in the history")
+        message = flag_msg or f"Rollback to {record.record_id} ({record.flag_reason})"
+        return flag(record.controller, record.params, ROLLBACK_REASON, message, history=self.history, **kwargs)
+
+    def close(self):
+        self.history.remove_listener(self._on_append)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = FlagCache()
+        return _default_cache
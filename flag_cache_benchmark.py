@@ -0,0 +1,63 @@
+"""
+Benchmark of the flag cache (flag_cache.py) over a history of 100k flags: latest golden
+lookup (cache against the indexed history query), diff of two records, the cost the
+cache listener adds to appends, and sync() of flags appended by another process.
+
+Usage:
+    python flag_cache_benchmark.py [--records 100000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+from flag_cache import FlagCache
+from flag_history import FlagHistory
+from flag_history_benchmark import generate, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "flag_history.sqlite3")
+        history = FlagHistory(path)
+        history.append_many(list(generate(rng, args.records)))
+        start = 1.6e9 + args.records
+
+        def cold_lookup():
+            cache = FlagCache(history, sync_interval=None)
+            cache.latest_golden("gap_follow")
+            cache.close()
+
+        plain = timed(lambda: history.latest("gap_follow", "Golden"), 1000)
+        cold = timed(cold_lookup, 20)
+        cache = FlagCache(history, sync_interval=None)
+        warm = timed(lambda: cache.latest_golden("gap_follow"), 100000)
+        print(f"latest golden gap_follow: history query {plain * 1000:.1f} us, cache cold {cold * 1000:.1f} us, warm {warm * 1000:.2f} us")
+
+        golden = history.query("gap_follow", reason="Golden", limit=2).records
+        a, b = golden[0].record_id, golden[1].record_id
+        cache.get(a), cache.get(b)
+        print(f"diff of two records: {timed(lambda: cache.diff(a, b), 10000) * 1000:.2f} us")
+
+        batch = list(generate(rng, 1000, start))
+        other = FlagHistory(path)
+        without = timed(lambda: other.append_many(batch), 5)
+        with_cache = timed(lambda: history.append_many(batch), 5)
+        print(f"append 1000 flags: {without:.1f} ms without a cache listening, {with_cache:.1f} ms with the cache kept current")
+
+        other.append_many(list(generate(rng, 1000, start + 10000)))
+        print(f"sync() after 1000 flags from another process: {timed(cache.sync, 1):.1f} ms, then {timed(cache.sync, 100) * 1000:.0f} us when idle")
+        expected = history.latest("gap_follow", "Golden")
+        print(f"cache matches the history after sync: {cache.latest_golden('gap_follow') == expected}")
+        other.close()
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+"""
+Append-only, indexed store for flagged configurations.
+
+Every flag used to become its own flagged_data_{timestamp}.json file under
+roboracer_flagged_data/<controller>/, so any search meant listing the directory and
+parsing every file. Flags are now appended to one SQLite database instead:
+
+    flags         one row per flag (controller, time, reason, message, params as JSON)
+    flag_params   one row per numeric parameter, indexed on (name, value)
+
+Flags can carry metrics (a JSON object such as a simulated lap time) next to the params.
+Configurations that were only simulated (SIMULATED_REASONS, from param_sweep.py and
+auto_tune.py) are kept in the same table for analysis, but latest() and queries with
+simulated=False skip them, so they never become the configuration of the car.
+
+Queries filter on controller, reason, time range and parameter values through the
+indexes and return pages of FlagRecord, with a cursor for the next page.
+
+Listeners added with add_listener() are called with the FlagRecords of every append
+made through the handle; after() returns the flags appended since a given row id, e.g.
+by other processes.
+
+    python flag_history.py import roboracer_flagged_data
+    python flag_history.py query pure_pursuit --reason Golden --where "kp>2"
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from instrumentation import get_metrics
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PATH = os.environ.get("ROBORACER_FLAG_HISTORY", "roboracer_flagged_data/flag_history.sqlite3")
+
+FlagRecord = namedtuple("FlagRecord", ["id", "record_id", "controller", "flagged_at", "flag_reason", "flag_msg", "params", "metrics"])
+Page = namedtuple("Page", ["records", "next_cursor"])
+
+SWEEP_REASON = "Sweep"
+TUNE_REASON = "Auto-tune"
+SIMULATED_REASONS = (SWEEP_REASON, TUNE_REASON)
+# Literal SQL rather than parameters, so that the planner can use the partial index.
+_NOT_SIMULATED = "(flag_reason IS NULL OR flag_reason NOT IN ({}))".format(", ".join(f"'{reason}'" for reason in SIMULATED_REASONS))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS flags (
+    id INTEGER PRIMARY KEY,
+    controller TEXT NOT NULL,
+    flagged_at REAL NOT NULL,
+    flag_reason TEXT,
+    flag_msg TEXT,
+    params TEXT NOT NULL,
+    source TEXT UNIQUE,
+    record_id TEXT,
+    metrics TEXT
+);
+CREATE INDEX IF NOT EXISTS flags_controller_time ON flags (controller, flagged_at, id);
+CREATE INDEX IF NOT EXISTS flags_controller_reason_time ON flags (controller, flag_reason, flagged_at, id);
+CREATE INDEX IF NOT EXISTS flags_time ON flags (flagged_at, id);
+CREATE INDEX IF NOT EXISTS flags_controller_car_time ON flags (controller, flagged_at, id) WHERE {not_simulated};
+
+CREATE UNIQUE INDEX IF NOT EXISTS flags_record_id ON flags (record_id);
+
+CREATE TABLE IF NOT EXISTS flag_params (
+    flag_id INTEGER NOT NULL REFERENCES flags (id),
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (flag_id, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS flag_params_name_value ON flag_params (name, value, flag_id);
+
+CREATE TRIGGER IF NOT EXISTS flags_no_update BEFORE UPDATE ON flags
+BEGIN SELECT RAISE(ABORT, 'flag history is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS flags_no_delete BEFORE DELETE ON flags
+BEGIN SELECT RAISE(ABORT, 'flag history is append-only'); END;
+""".replace("{not_simulated}", _NOT_SIMULATED)
+
+FLAG_FIELDS = ("flag_reason", "flag_msg")
+OPERATORS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "=", "==": "=", "!=": "!="}
+_CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|=)\s*(\S+)\s*$")
+
+
+_node = random.getrandbits(32)
+_record_lock = threading.Lock()
+_last_ns = 0
+_sequence = 0
+
+
+def new_record_id(ns=None):
+    """
+    Collision free, time sortable id for a flag: "<unix ns>-<process node>-<sequence>".
+
+    Nanosecond times are forced to increase within a process, the random per process node
+    separates concurrent UIs and scripts, and the sequence keeps ids unique even for
+    records imported with the same timestamp.
+    """
+
+    global _last_ns, _sequence
+    with _record_lock:
+        if ns is None:
+            ns = max(time.time_ns(), _last_ns + 1)
+            _last_ns = ns
+        _sequence = (_sequence + 1) & 0xFFFFFF
+        sequence = _sequence
+    return f"{ns:019d}-{_node:08x}-{sequence:06x}"
+
+
+def numeric_value(value):
+    """
+    The indexed value of a parameter: floats and numeric strings (the op_* textboxes) as
+    float, everything else as None.
+    """
+
+    if isinstance(value, bool) or value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_condition(text):
+    """
+    Parse "kp>2" into ("kp", ">", 2.0).
+    """
+
+    match = _CONDITION.match(text)
+    if not match:
+        raise ValueError(f"Invalid parameter condition: {text!r}")
+    name, op, value = match.groups()
+    return name, OPERATORS[op], float(value)
+
+
+class FlagHistory:
+    """
+    Thread safe handle on the history database. Appends go through one connection behind
+    a lock; reads use a connection per thread and never wait on that lock. The database
+    runs in WAL mode, so reads (here or in other processes) do not wait on a running
+    append either.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(flags)")}
+        for column in ("record_id", "metrics"):
+            if columns and column not in columns:
+                self._conn.execute(f"ALTER TABLE flags ADD COLUMN {column} TEXT")
+        self._conn.executescript(SCHEMA)
+        self._local = threading.local()
+        self._readers = []
+        self._listeners = []
+
+    def add_listener(self, listener):
+        """
+        Call listener(records) with the new FlagRecords after every append_many() commit.
+        """
+
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    @contextlib.contextmanager
+    def _reader(self):
+        if self.path == ":memory:":
+            # An in-memory database only exists on its one connection.
+            with self._lock:
+                yield self._conn
+            return
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+            with self._lock:
+                self._readers.append(conn)
+        yield conn
+
+    def close(self):
+        with self._lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers = []
+            self._conn.close()
+
+    def append(self, controller, params, flag_reason=None, flag_msg=None, flagged_at=None):
+        """
+        Append one flag and return its record id.
+        """
+
+        return self.append_many([(controller, params, flag_reason, flag_msg, flagged_at)])[0]
+
+    @get_metrics().timed("io.history_append")
+    def append_many(self, entries, sources=None, metrics=None):
+        """
+        Append (controller, params, flag_reason, flag_msg, flagged_at) entries in a single
+        transaction (one commit for the whole batch) and return their record ids. Entries
+        whose source is already stored are skipped and get None as record id.
+        metrics optionally gives a metrics dict (or None) per entry.
+        """
+
+        ids = []
+        records = []
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                for index, (controller, params, flag_reason, flag_msg, flagged_at) in enumerate(entries):
+                    source = sources[index] if sources else None
+                    entry_metrics = metrics[index] if metrics else None
+                    if flagged_at is None:
+                        record_id = new_record_id()
+                        flagged_at = int(record_id.partition("-")[0]) / 1e9
+                    else:
+                        record_id = new_record_id(int(flagged_at * 1e9))
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO flags (controller, flagged_at, flag_reason, flag_msg, params, source, record_id, metrics) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (controller, flagged_at, flag_reason, flag_msg, json.dumps(params, separators=(",", ":")), source, record_id,
+                         None if entry_metrics is None else json.dumps(entry_metrics, separators=(",", ":"))),
+                    )
+                    if cursor.rowcount == 0:
+                        ids.append(None)
+                        continue
+                    flag_id = cursor.lastrowid
+                    if self._listeners:
+                        records.append(FlagRecord(flag_id, record_id, controller, flagged_at, flag_reason, flag_msg, dict(params), entry_metrics))
+                    cursor.executemany(
+                        "INSERT INTO flag_params (flag_id, name, value) VALUES (?, ?, ?)",
+                        [(flag_id, name, numeric_value(value)) for name, value in params.items()],
+                    )
+                    ids.append(record_id)
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+        if records:
+            for listener in list(self._listeners):
+                try:
+                    listener(records)
+                except Exception:
+                    logger.exception("Flag history listener failed")
+        return ids
+
+    def get(self, record_id):
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT id, record_id, controller, flagged_at, flag_reason, flag_msg, params, metrics FROM flags WHERE record_id = ?",
+                (record_id,),
+            ).fetchone()
+        return None if row is None else self._record(row)
+
+    def query(self, controller=None, reason=None, since=None, until=None, where=(), limit=50, cursor=None, simulated=True):
+        """
+        Return a Page of flags, newest first.
+
+        where is a list of (name, op, value) conditions on numeric parameters, e.g.
+        [("kp", ">", 2.0)] or the strings accepted by parse_condition(). Pass the returned
+        next_cursor as cursor to fetch the following page; it is None on the last page.
+        simulated=False leaves out the flags of SIMULATED_REASONS.
+        """
+
+        sql, args = self._filters(controller, reason, since, until, where, simulated)
+        if cursor is not None:
+            cursor_time, cursor_id = cursor.split(":")
+            sql.append("(flagged_at < ? OR (flagged_at = ? AND id < ?))")
+            args += [float(cursor_time), float(cursor_time), int(cursor_id)]
+
+        statement = "SELECT id, record_id, controller, flagged_at, flag_reason, flag_msg, params, metrics FROM flags"
+        if sql:
+            statement += " WHERE " + " AND ".join(sql)
+        statement += " ORDER BY flagged_at DESC, id DESC LIMIT ?"
+        args.append(limit + 1)
+
+        with self._reader() as conn:
+            rows = conn.execute(statement, args).fetchall()
+
+        records = [self._record(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = records[-1]
+            next_cursor = f"{last.flagged_at!r}:{last.id}"
+        return Page(records, next_cursor)
+
+    def max_id(self):
+        """
+        The highest row id, 0 when empty (flags are not appended in flagged_at order).
+        """
+
+        with self._reader() as conn:
+            return conn.execute("SELECT MAX(id) FROM flags").fetchone()[0] or 0
+
+    def after(self, flag_id, limit=1000):
+        """
+        Flags with a row id above flag_id, oldest first (at most limit).
+        """
+
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT id, record_id, controller, flagged_at, flag_reason, flag_msg, params, metrics FROM flags "
+                "WHERE id > ? ORDER BY id LIMIT ?",
+                (flag_id, limit),
+            ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def count(self, controller=None, reason=None, since=None, until=None, where=(), simulated=True):
+        sql, args = self._filters(controller, reason, since, until, where, simulated)
+        statement = "SELECT COUNT(*) FROM flags"
+        if sql:
+            statement += " WHERE " + " AND ".join(sql)
+        with self._reader() as conn:
+            return conn.execute(statement, args).fetchone()[0]
+
+    def latest(self, controller, reason=None):
+        """
+        The newest flag of controller, with reason when given. Without a reason, the
+        simulated flags (SIMULATED_REASONS) are left out: this is the configuration of the car.
+        """
+
+        page = self.query(controller=controller, reason=reason, limit=1, simulated=reason is not None)
+        return page.records[0] if page.records else None
+
+    def _filters(self, controller, reason, since, until, where, simulated=True):
+        sql, args = [], []
+        if controller is not None:
+            sql.append("controller = ?")
+            args.append(controller)
+        if reason is not None:
+            sql.append("flag_reason = ?")
+            args.append(reason)
+        if not simulated:
+            sql.append(_NOT_SIMULATED)
+        if since is not None:
+            sql.append("flagged_at >= ?")
+            args.append(since)
+        if until is not None:
+            sql.append("flagged_at < ?")
+            args.append(until)
+        for condition in where:
+            name, op, value = parse_condition(condition) if isinstance(condition, str) else condition
+            if op not in OPERATORS.values():
+                raise ValueError(f"Invalid operator: {op!r}")
+            sql.append(f"EXISTS (SELECT 1 FROM flag_params WHERE flag_id = flags.id AND name = ? AND value {op} ?)")
+            args += [name, value]
+        return sql, args
+
+    @staticmethod
+    def _record(row):
+        flag_id, record_id, controller, flagged_at, flag_reason, flag_msg, params, metrics = row
+        return FlagRecord(flag_id, record_id, controller, flagged_at, flag_reason, flag_msg, json.loads(params),
+                          None if metrics is None else json.loads(metrics))
+
+
+def import_flag_directory(history, root="roboracer_flagged_data", batch_size=1000):
+    """
+    One-shot import of the legacy roboracer_flagged_data/<controller>/flagged_data_*.json
+    files. The file path is stored as the flag source, so running it twice does not
+    duplicate flags. Returns the number of imported flags.
+    """
+
+    imported = 0
+    entries, sources = [], []
+
+    def flush():
+        nonlocal imported
+        imported += sum(1 for record_id in history.append_many(entries, sources) if record_id is not None)
+        entries.clear()
+        sources.clear()
+
+    for controller in sorted(os.listdir(root)):
+        directory = os.path.join(root, controller)
+        if not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as it:
+            for entry in it:
+                match = re.match(r"^flagged_data_(\d+)\.json$", entry.name)
+                if not match:
+                    continue
+                try:
+                    with open(entry.path) as f:
+                        data = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                params = {key: value for key, value in data.items() if key not in FLAG_FIELDS}
+                entries.append((controller, params, data.get("flag_reason"), data.get("flag_msg"), float(match.group(1))))
+                sources.append(os.path.join(controller, entry.name))
+                if len(entries) >= batch_size:
+                    flush()
+    flush()
+    return imported
+
+
+_default_history = None
+_default_history_lock = threading.Lock()
+
+
+def get_history():
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = FlagHistory()
+        return _default_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and import the flag history.")
+    parser.add_argument("--db", default=HISTORY_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="Import legacy flagged_data_*.json directories")
+    import_parser.add_argument("root", nargs="?", default="roboracer_flagged_data")
+
+    query_parser = commands.add_parser("query", help="List flags, newest first")
+    query_parser.add_argument("controller", nargs="?")
+    query_parser.add_argument("--reason")
+    query_parser.add_argument("--where", action="append", default=[], help='Parameter condition such as "kp>2"')
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--cursor")
+
+    args = parser.parse_args()
+    history = FlagHistory(args.db)
+
+    if args.command == "import":
+        print(f"Imported {import_flag_directory(history, args.root)} flags into {args.db}")
+        return
+
+    page = history.query(args.controller, args.reason, where=args.where, limit=args.limit, cursor=args.cursor)
+    for record in page.records:
+        flagged_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.flagged_at))
+        print(f"{record.record_id or record.id}  {flagged_at}  {record.controller:<13} {record.flag_reason or '':<16} {json.dumps(record.params)}")
+    if page.next_cursor:
+        print(f"Next page: --cursor {page.next_cursor}")
+
+
+if __name__ == "__main__":
+    main()
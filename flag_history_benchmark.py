@@ -0,0 +1,107 @@
+"""
+Benchmark: flag history query latency at 100k flags.
+
+Fills a temporary history database with synthetic flags for the three controllers and
+times the queries the tuning workflow needs, against a scan over the same flags stored
+as one JSON file per flag (the previous roboracer_flagged_data layout).
+
+Usage:
+    python flag_history_benchmark.py [--records 100000] [--scan-records 10000]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from flag_history import FlagHistory
+
+REASONS = ["Latest", "Golden", "Unstable Control", "Too Slow", "Too Agressive", "Other"]
+
+
+def random_params(rng, controller):
+    if controller == "wall_follow":
+        return {"throttle": round(rng.uniform(-1, 1), 2), "lookahead_dist": round(rng.uniform(0, 10), 1),
+                "kp": round(rng.uniform(0, 10), 1), "kd": round(rng.uniform(0, 10), 1), "ki": round(rng.uniform(0, 5), 3)}
+    if controller == "gap_follow":
+        return {"throttle": round(rng.uniform(-1, 1), 2), "window_half_size": rng.randint(0, 500),
+                "disparity_extender": rng.randint(0, 500), "max_actionable_dist": round(rng.uniform(0, 10), 1)}
+    return {"throttle": round(rng.uniform(-1, 1), 2), "kp": round(rng.uniform(0, 5), 1),
+            "kv": round(rng.uniform(0, 5), 1), "lookahead_distance": round(rng.uniform(0, 10), 1)}
+
+
+def generate(rng, count, start=1.6e9):
+    controllers = ["wall_follow", "gap_follow", "pure_pursuit"]
+    for i in range(count):
+        controller = controllers[i % 3]
+        yield controller, random_params(rng, controller), rng.choice(REASONS), "", start + i
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def scan_golden_kp(directory):
+    matches = []
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            data = json.load(f)
+        if data["flag_reason"] == "Golden" and float(data["kp"]) > 2:
+            matches.append(data)
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--scan-records", type=int, default=10000, help="Flags written as JSON files for the scan baseline")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        history = FlagHistory(os.path.join(directory, "flag_history.sqlite3"))
+
+        entries = list(generate(rng, args.records))
+        start = time.perf_counter()
+        for i in range(0, len(entries), 5000):
+            history.append_many(entries[i:i + 5000])
+        print(f"insert {args.records} flags: {time.perf_counter() - start:.2f} s")
+
+        start = time.perf_counter()
+        history.append("pure_pursuit", random_params(rng, "pure_pursuit"), "Latest", "")
+        print(f"append one flag: {(time.perf_counter() - start) * 1000:.3f} ms")
+
+        queries = {
+            "latest golden gap_follow": lambda: history.latest("gap_follow", "Golden"),
+            "golden pure_pursuit kp>2 (page 50)": lambda: history.query("pure_pursuit", "Golden", where=["kp>2"]),
+            "count golden pure_pursuit kp>2": lambda: history.count("pure_pursuit", "Golden", where=["kp>2"]),
+            "wall_follow 2<kp<2.5 ki<0.1": lambda: history.query("wall_follow", where=["kp>2", "kp<2.5", "ki<0.1"]),
+            "last hour, all controllers": lambda: history.query(since=1.6e9 + args.records - 3600),
+        }
+        page = history.query("pure_pursuit", "Golden", where=["kp>2"])
+        queries["golden pure_pursuit kp>2 (page 2)"] = lambda: history.query(
+            "pure_pursuit", "Golden", where=["kp>2"], cursor=page.next_cursor)
+
+        for name, fn in queries.items():
+            print(f"{name:<40} {timed(fn, 20):8.3f} ms")
+        history.close()
+
+        scan_dir = os.path.join(directory, "pure_pursuit")
+        os.makedirs(scan_dir)
+        for i, (_, params, reason, msg, flagged_at) in enumerate(generate(rng, args.scan_records)):
+            params = random_params(rng, "pure_pursuit")
+            with open(os.path.join(scan_dir, f"flagged_data_{int(flagged_at)}.json"), "w") as f:
+                json.dump(dict(params, flag_reason=reason, flag_msg=msg), f, indent=4)
+        print(f"{f'directory scan golden kp>2 ({args.scan_records} files)':<40} {timed(lambda: scan_golden_kp(scan_dir), 3):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
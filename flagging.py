@@ -0,0 +1,105 @@
+"""
+Flagging shared by the tuning UIs and scripted callers (sweeps, automation).
+
+A flag appends the configuration to the flag history and rewrites the
+<controller>_params.json copies in the roboracer-ws src/ and install/ config
+directories, which the ros2 nodes read.
+
+flag_many() flags N configurations of one controller in a single call: all of them are
+appended in one history transaction, and only the last one is written to the workspace,
+with one directory sync per config directory.
+
+Flags of one controller are serialized: the history append and the submission of the
+workspace write happen under a per-controller lock, so concurrent flags (several
+operators on one server) reach the files in the same order as the history and the
+*_params.json files always hold the latest flag in the history.
+
+With ROBORACER_BINARY_SNAPSHOTS=1 a binary snapshot (see param_snapshot.py) of the
+latest configuration is also written next to every JSON copy, as <controller>_params.bin.
+"""
+
+import os
+import threading
+
+from flag_history import get_history
+from param_schema import load_schema
+from param_snapshot import encode
+from param_writer import combine, default_writer
+
+WORKSPACE_DIR = os.environ.get("ROBORACER_WS", "../roboracer-ws")
+BINARY_SNAPSHOTS = os.environ.get("ROBORACER_BINARY_SNAPSHOTS", "0") == "1"
+
+_controller_locks = {}
+_controller_locks_lock = threading.Lock()
+
+
+def controller_lock(controller):
+    """
+    The lock serializing the flags of controller in this process.
+    """
+
+    with _controller_locks_lock:
+        if controller not in _controller_locks:
+            _controller_locks[controller] = threading.Lock()
+        return _controller_locks[controller]
+
+
+def config_dirs(controller, workspace=None):
+    """
+    The config directories of the controller's package (from its schema) in workspace
+    (default WORKSPACE_DIR): before and after colcon build.
+    """
+
+    workspace = workspace or WORKSPACE_DIR
+    package = load_schema(controller).package
+    return [
+        f"{workspace}/src/{package}/config",
+        f"{workspace}/install/{package}/share/{package}/config",
+    ]
+
+
+def config_paths(controller, workspace=None):
+    params_file = load_schema(controller).params_file
+    return [f"{directory}/{params_file}" for directory in config_dirs(controller, workspace)]
+
+
+def snapshot_paths(paths):
+    return [os.path.splitext(path)[0] + ".bin" for path in paths]
+
+
+def flag_many(controller, configs, flag_reason="Latest", flag_msg="", history=None, writer=None, paths=None, snapshots=None):
+    """
+    Flag every params dict in configs for controller.
+
+    Returns (record_ids, future): the history record id of every config, and the
+    ParamWriter future of the workspace write. Raises if the history append fails;
+    workspace write errors are reported through the future. snapshots (default
+    BINARY_SNAPSHOTS) also writes the binary snapshots, and the future then fails if
+    either the JSON or the snapshot write fails.
+    """
+
+    configs = list(configs)
+    if not configs:
+        return [], None
+    history = history or get_history()
+    writer = writer or default_writer
+    paths = config_paths(controller) if paths is None else paths
+    snapshots = BINARY_SNAPSHOTS if snapshots is None else snapshots
+
+    # Nodes only ever need the latest configuration.
+    flagged_data = dict(configs[-1], flag_reason=flag_reason, flag_msg=flag_msg)
+    with controller_lock(controller):
+        record_ids = history.append_many([(controller, params, flag_reason, flag_msg, None) for params in configs])
+        future = writer.submit(paths, flagged_data) if paths else None
+        if snapshots and paths:
+            future = combine([future, writer.submit_bytes(snapshot_paths(paths), encode(controller, configs[-1]))])
+    return record_ids, future
+
+
+def flag(controller, params, flag_reason="Latest", flag_msg="", **kwargs):
+    """
+    Flag a single configuration, returns (record_id, future).
+    """
+
+    record_ids, future = flag_many(controller, [params], flag_reason, flag_msg, **kwargs)
+    return record_ids[0], future
@@ -0,0 +1,476 @@
+"""
+Fleet mode: pushing a configuration to several cars at once, acknowledged by every car.
+
+The cars are listed in the fleet registry (ROBORACER_FLEET, default
+roboracer_fleet.json):
+
+    {"cars": [{"name": "car1", "host": "10.0.0.11", "port": 47870}, ...]}
+
+Every car runs an agent (`python fleet.py agent`, also the stand-in car of tests and
+benchmarks) which validates a received configuration against the controller's schema,
+pushes it to the local node over the parameter stream (param_stream.py), writes the
+<controller>_params.json copies of the car's own workspace (ROBORACER_WS on the car, see
+flagging.config_paths()) and acknowledges it once they are on disk.
+
+FleetPublisher.push() sends one configuration, or a variant per car, to every target from
+one asyncio UDP socket and waits for all the acks concurrently: a car that does not ack
+within the timeout gets the same datagram again, up to RETRIES times, the wait doubling
+every time. Datagrams carry the param_stream.py header (publisher session and a sequence
+number per push and car), so an agent applies a retried push once and acks it again.
+Pushing to 20 cars takes about as long as pushing to the slowest one.
+
+Agents listen on 127.0.0.1 by default. Listening on any other address (--host 0.0.0.0 to
+be reached from the laptop) requires a shared key, ROBORACER_FLEET_KEY, set to the same
+value on the cars and on the publisher: every push and ack then ends with an HMAC-SHA256
+tag of the datagram, and the agent ignores pushes without a valid one. The key
+authenticates the publisher; it does not encrypt the parameters. Against replays of
+captured pushes, an agent rejects pushes sent more than MAX_PUSH_AGE seconds ago (or
+ahead, so the clocks of the cars and the laptop must agree to that) and pushes sent
+before the latest one it applied.
+
+    python fleet.py add car1 10.0.0.11 --port 47870
+    ROBORACER_FLEET_KEY=... python fleet.py agent car1 --host 0.0.0.0 --port 47870 --ws ~/roboracer-ws        (on the car)
+    python fleet.py push pure_pursuit --reason Golden     (the latest Golden flag, to every car)
+    python fleet.py list
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import math
+import os
+import random
+import socket
+import threading
+import time
+
+from flag_history import get_history
+from flagging import config_dirs, config_paths
+from param_schema import FLAG_REASONS, load_schema
+from param_stream import HEADER, MAX_DATAGRAM, PROTOCOL_VERSION, get_publisher
+from param_writer import default_writer, write_atomic
+
+logger = logging.getLogger(__name__)
+
+FLEET_PATH = os.environ.get("ROBORACER_FLEET", "roboracer_fleet.json")
+FLEET_KEY = os.environ.get("ROBORACER_FLEET_KEY", "").encode("utf-8") or None
+
+DEFAULT_AGENT_HOST = "127.0.0.1"
+DEFAULT_AGENT_PORT = 47870
+PUSH_MAGIC = b"RRFP"
+ACK_MAGIC = b"RRFA"
+TAG_SIZE = hashlib.sha256().digest_size
+
+# Seconds to wait for the first ack (doubled on every retry), and retries per car
+ACK_TIMEOUT = 0.2
+RETRIES = 3
+# Age (seconds, by the header timestamp) past which an agent rejects a push; above the
+# 3 s a push takes to exhaust its retries
+MAX_PUSH_AGE = 10.0
+WRITE_TIMEOUT = 10
+
+Car = collections.namedtuple("Car", "name host port")
+CarResult = collections.namedtuple("CarResult", "car status attempts latency_ms error sequence")
+
+# Statuses of CarResult: the car acked ...
+APPLIED = "applied"          # ... and wrote the configuration
+SUPERSEDED = "superseded"    # ... but holds a newer push of the same controller already
+REJECTED = "rejected"        # ... with an error (invalid parameters, write failure)
+# ... or not:
+TIMEOUT = "timeout"          # no ack after every retry
+UNREACHABLE = "unreachable"  # the datagram could not be sent
+
+
+def _tag(key, data):
+    return hmac.new(key, data, hashlib.sha256).digest()
+
+
+def encode(magic, session, sequence, body, key=None, sent_at=None):
+    """
+    A fleet datagram, ending with the HMAC tag of key when given. sent_at defaults to now.
+    """
+
+    payload = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    sent_at = time.time() if sent_at is None else sent_at
+    datagram = HEADER.pack(magic, PROTOCOL_VERSION, session, sequence, sent_at) + payload
+    if key:
+        datagram += _tag(key, datagram)
+    if len(datagram) > MAX_DATAGRAM:
+        raise ValueError(f"Fleet message too large ({len(datagram)} bytes)")
+    return datagram
+
+
+def decode(datagram, magic, key=None):
+    """
+    (session, sequence, sent_at, body) of a fleet datagram. Raises ValueError on other
+    data, and with key, on datagrams without a valid tag.
+    """
+
+    if key:
+        datagram, tag = datagram[:-TAG_SIZE], datagram[-TAG_SIZE:]
+        if not hmac.compare_digest(tag, _tag(key, datagram)):
+            raise ValueError("Fleet message not signed with the fleet key")
+    if len(datagram) < HEADER.size:
+        raise ValueError("Datagram shorter than the message header")
+    found, version, session, sequence, sent_at = HEADER.unpack_from(datagram)
+    if found != magic or version != PROTOCOL_VERSION:
+        raise ValueError("Not a fleet message of this version")
+    return session, sequence, sent_at, json.loads(datagram[HEADER.size:])
+
+
+def is_loopback(host):
+    """
+    Whether host only reaches this machine ("" and 0.0.0.0 are every interface).
+    """
+
+    try:
+        return bool(host) and ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+class FleetRegistry:
+    """
+    The cars of the fleet, stored in a JSON file. Thread safe.
+    """
+
+    def __init__(self, path=FLEET_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def cars(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return []
+        return [Car(car["name"], car["host"], int(car.get("port", DEFAULT_AGENT_PORT))) for car in data.get("cars", [])]
+
+    def get(self, name):
+        return next((car for car in self.cars() if car.name == name), None)
+
+    def add(self, name, host, port=DEFAULT_AGENT_PORT):
+        """
+        Add a car, or change the address of the car called name.
+        """
+
+        with self._lock:
+            cars = [car for car in self.cars() if car.name != name] + [Car(name, host, int(port))]
+            self._save(cars)
+        return cars[-1]
+
+    def remove(self, name):
+        with self._lock:
+            cars = self.cars()
+            self._save([car for car in cars if car.name != name])
+        return any(car.name == name for car in cars)
+
+    def _save(self, cars):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        data = {"cars": [car._asdict() for car in cars]}
+        write_atomic(self.path, json.dumps(data, indent=4).encode("utf-8"))
+
+
+class _AckProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, session, key=None):
+        self.session = session
+        self.key = key
+        self.waiters = {}
+
+    def datagram_received(self, data, addr):
+        try:
+            session, sequence, _, body = decode(data, ACK_MAGIC, self.key)
+        except ValueError:
+            return
+        waiter = self.waiters.get(sequence)
+        if session == self.session and waiter is not None and not waiter.done():
+            waiter.set_result(body)
+
+
+class FleetPublisher:
+    """
+    Pushes configurations to cars concurrently, see the module docstring. The result of
+    the latest push to every car is kept in status. key (default ROBORACER_FLEET_KEY)
+    signs the pushes and checks the acks.
+    """
+
+    def __init__(self, timeout=ACK_TIMEOUT, retries=RETRIES, key=FLEET_KEY):
+        self.timeout = timeout
+        self.retries = retries
+        self.key = key
+        self.session = random.getrandbits(32)
+        self.status = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _next_sequence(self):
+        with self._lock:
+            self._sequence += 1
+            return self._sequence
+
+    async def push(self, cars, controller, params=None, variants=None, flag_reason=None, flag_msg="", record_id=None):
+        """
+        Push params, or variants[car.name] where given, to every car of cars (cars without
+        either are skipped) and return a CarResult per car once all have acked or timed
+        out. The configurations are validated first (ValueError).
+        """
+
+        schema = load_schema(controller)
+        variants = variants or {}
+        targets = []
+        for car in cars:
+            car_params = variants.get(car.name, params)
+            if car_params is not None:
+                targets.append((car, schema.validate(car_params)))
+        if not targets:
+            return []
+
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(lambda: _AckProtocol(self.session, self.key), local_addr=("0.0.0.0", 0))
+        try:
+            results = await asyncio.gather(*(
+                self._push_car(transport, protocol, car, {
+                    "car": car.name, "controller": controller, "params": car_params,
+                    "flag_reason": flag_reason, "flag_msg": flag_msg, "record_id": record_id,
+                })
+                for car, car_params in targets
+            ))
+        finally:
+            transport.close()
+        for result in results:
+            self.status[result.car] = result
+        return results
+
+    async def _push_car(self, transport, protocol, car, body):
+        sequence = self._next_sequence()
+        datagram = encode(PUSH_MAGIC, self.session, sequence, body, self.key)
+        waiter = asyncio.get_running_loop().create_future()
+        protocol.waiters[sequence] = waiter
+        start = time.perf_counter()
+        timeout = self.timeout
+        try:
+            for attempt in range(1, self.retries + 2):
+                try:
+                    transport.sendto(datagram, (car.host, car.port))
+                except OSError as e:
+                    return CarResult(car.name, UNREACHABLE, attempt, None, str(e), sequence)
+                try:
+                    ack = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+                except asyncio.TimeoutError:
+                    timeout *= 2
+                    continue
+                latency_ms = (time.perf_counter() - start) * 1000
+                return CarResult(car.name, ack.get("status", REJECTED), attempt, latency_ms, ack.get("error"), sequence)
+            return CarResult(car.name, TIMEOUT, self.retries + 1, None, f"No ack after {self.retries + 1} attempts", sequence)
+        finally:
+            protocol.waiters.pop(sequence, None)
+
+
+class FleetAgent:
+    """
+    The car side: applies pushed configurations to workspace (default WORKSPACE_DIR of
+    flagging.py) and acks them. delay (seconds per push) and drop (probability of
+    ignoring a datagram) simulate a slow car and a lossy link. key (default
+    ROBORACER_FLEET_KEY) is required to listen on anything but a loopback address.
+    Pushes sent more than max_age seconds ago, or before the latest applied push of
+    their controller, are not applied.
+    """
+
+    def __init__(self, name, host=DEFAULT_AGENT_HOST, port=DEFAULT_AGENT_PORT, workspace=None, writer=None, delay=0.0, drop=0.0,
+                 seed=None, key=FLEET_KEY, max_age=MAX_PUSH_AGE):
+        if not key and not is_loopback(host):
+            raise ValueError(f"Listening on {host or 'every interface'} requires a fleet key (ROBORACER_FLEET_KEY)")
+        self.name = name
+        self.key = key
+        self.max_age = max_age
+        self.workspace = workspace
+        self.writer = writer or default_writer
+        self.delay = delay
+        self.drop = drop
+        self.rng = random.Random(seed)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((host, port))
+        self.address = self._sock.getsockname()
+        # controller -> (sent_at, session, sequence) of the latest applied push
+        self._latest = {}
+
+    def handle(self, datagram):
+        """
+        The ack of a push datagram, or None for anything else.
+        """
+
+        try:
+            session, sequence, sent_at, body = decode(datagram, PUSH_MAGIC, self.key)
+        except ValueError as e:
+            logger.debug("%s: ignoring datagram: %s", self.name, e)
+            return None
+        controller = body.get("controller")
+        latest_sent_at, latest_session, latest_sequence = self._latest.get(controller, (-math.inf, None, 0))
+        if session == latest_session and sequence == latest_sequence:
+            # A retry of the latest push is acked again.
+            return encode(ACK_MAGIC, session, sequence, {"car": self.name, "status": APPLIED}, self.key)
+        if (session == latest_session and sequence < latest_sequence) or (session != latest_session and sent_at < latest_sent_at):
+            return encode(ACK_MAGIC, session, sequence, {"car": self.name, "status": SUPERSEDED}, self.key)
+        age = time.time() - sent_at
+        if not abs(age) <= self.max_age:
+            error = f"Push sent {age:.1f} s ago, past {self.max_age:g} s (replayed, or the clocks disagree)"
+            logger.warning("%s: push %d rejected: %s", self.name, sequence, error)
+            return encode(ACK_MAGIC, session, sequence, {"car": self.name, "status": REJECTED, "error": error}, self.key)
+
+        try:
+            params = load_schema(controller).validate(body.get("params") or {})
+            if self.delay:
+                time.sleep(self.delay)
+            get_publisher().publish(controller, params)
+            for directory in config_dirs(controller, self.workspace):
+                os.makedirs(directory, exist_ok=True)
+            data = dict(params, flag_reason=body.get("flag_reason"), flag_msg=body.get("flag_msg"))
+            self.writer.submit(config_paths(controller, self.workspace), data).result(WRITE_TIMEOUT)
+        except Exception as e:
+            logger.warning("%s: push %d rejected: %s", self.name, sequence, e)
+            return encode(ACK_MAGIC, session, sequence, {"car": self.name, "status": REJECTED, "error": str(e)}, self.key)
+        self._latest[controller] = (sent_at, session, sequence)
+        return encode(ACK_MAGIC, session, sequence, {"car": self.name, "status": APPLIED}, self.key)
+
+    def serve(self, stop_event=None):
+        """
+        Handle pushes until stop_event is set.
+        """
+
+        self._sock.settimeout(0.2)
+        while stop_event is None or not stop_event.is_set():
+            try:
+                datagram, address = self._sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            if self.drop and self.rng.random() < self.drop:
+                continue
+            ack = self.handle(datagram)
+            if ack is not None:
+                self._sock.sendto(ack, address)
+
+    def close(self):
+        self._sock.close()
+
+
+_registry = None
+_publisher = None
+_default_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _default_lock:
+        if _registry is None:
+            _registry = FleetRegistry()
+        return _registry
+
+
+def get_fleet_publisher():
+    global _publisher
+    with _default_lock:
+        if _publisher is None:
+            _publisher = FleetPublisher()
+        return _publisher
+
+
+def print_results(results):
+    for result in results:
+        latency = f"{result.latency_ms:8.1f} ms" if result.latency_ms is not None else f"{'-':>11s}"
+        print(f"{result.car:16s} {result.status:12s} {latency}  attempts {result.attempts}  {result.error or ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Push configurations to a fleet of cars.")
+    parser.add_argument("--fleet", default=FLEET_PATH, help="Fleet registry file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="List the cars")
+
+    add = commands.add_parser("add", help="Add a car, or change its address")
+    add.add_argument("name")
+    add.add_argument("host")
+    add.add_argument("--port", type=int, default=DEFAULT_AGENT_PORT)
+
+    remove = commands.add_parser("remove", help="Remove a car")
+    remove.add_argument("name")
+
+    push = commands.add_parser("push", help="Push the latest flag of a controller to the cars")
+    push.add_argument("controller")
+    push.add_argument("--reason", choices=FLAG_REASONS, help="The latest flag with this reason")
+    push.add_argument("--cars", help="Comma separated car names (default: every car)")
+    push.add_argument("--timeout", type=float, default=ACK_TIMEOUT)
+    push.add_argument("--retries", type=int, default=RETRIES)
+
+    agent = commands.add_parser("agent", help="Run a car agent (or several stand-in cars on consecutive ports)")
+    agent.add_argument("name")
+    agent.add_argument("--host", default=DEFAULT_AGENT_HOST, help="Address to listen on; any but loopback requires ROBORACER_FLEET_KEY")
+    agent.add_argument("--port", type=int, default=DEFAULT_AGENT_PORT)
+    agent.add_argument("--ws", help="Workspace of the car (default ROBORACER_WS)")
+    agent.add_argument("--count", type=int, default=1, help="Stand-in cars <name>-1 ... <name>-<count>, with workspaces <ws>/<car>")
+    agent.add_argument("--register", action="store_true", help="Add the agents to the registry")
+    agent.add_argument("--delay-ms", type=float, default=0.0, help="Simulated time to apply a push")
+    agent.add_argument("--drop", type=float, default=0.0, help="Probability of ignoring a datagram")
+
+    args = parser.parse_args()
+    registry = FleetRegistry(args.fleet)
+
+    if args.command == "list":
+        for car in registry.cars():
+            print(f"{car.name:16s} {car.host}:{car.port}")
+    elif args.command == "add":
+        car = registry.add(args.name, args.host, args.port)
+        print(f"{car.name} at {car.host}:{car.port}")
+    elif args.command == "remove":
+        if not registry.remove(args.name):
+            raise SystemExit(f"No car {args.name!r} in {args.fleet}")
+    elif args.command == "push":
+        record = get_history().latest(args.controller, args.reason)
+        if record is None:
+            raise SystemExit(f"No flag of {args.controller}" + (f" with reason {args.reason}" if args.reason else ""))
+        cars = registry.cars()
+        if args.cars:
+            names = args.cars.split(",")
+            cars = [car for car in cars if car.name in names]
+        if not cars:
+            raise SystemExit(f"No cars to push to in {args.fleet}")
+        publisher = FleetPublisher(args.timeout, args.retries)
+        results = asyncio.run(publisher.push(cars, args.controller, record.params, flag_reason=record.flag_reason,
+                                             flag_msg=record.flag_msg, record_id=record.record_id))
+        print(f"Flag {record.record_id} ({record.flag_reason}) of {args.controller}:")
+        print_results(results)
+        if any(result.status != APPLIED for result in results):
+            raise SystemExit(1)
+    else:
+        stop = threading.Event()
+        agents = []
+        for i in range(args.count):
+            name = args.name if args.count == 1 else f"{args.name}-{i + 1}"
+            workspace = args.ws if args.count == 1 else os.path.join(args.ws or "roboracer-fleet", name)
+            try:
+                agents.append(FleetAgent(name, args.host, args.port + i, workspace, delay=args.delay_ms / 1000, drop=args.drop))
+            except ValueError as e:
+                raise SystemExit(str(e))
+            if args.register:
+                registry.add(name, "127.0.0.1" if args.host == "0.0.0.0" else args.host, agents[-1].address[1])
+        threads = [threading.Thread(target=agent.serve, args=(stop,), daemon=True) for agent in agents]
+        for thread in threads:
+            thread.start()
+        print(f"{len(agents)} agent(s) on ports {agents[0].address[1]}-{agents[-1].address[1]}", flush=True)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            stop.set()
+
+
+if __name__ == "__main__":
+    main()
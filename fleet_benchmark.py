@@ -0,0 +1,99 @@
+"""
+Benchmark of fleet pushes (fleet.py): one configuration pushed to 1 to 20 simulated cars
+at once, against pushing to the cars one after the other.
+
+Every car is a stand-in agent process (`python fleet.py agent`) with its own workspace,
+taking --delay-ms to apply a push before it writes its files and acks. A push is timed
+from the call to the last ack; every push is a new configuration, so every car writes
+it. --drop makes the agents ignore that share of the datagrams, to show the cost of
+retries.
+
+Usage:
+    python fleet_benchmark.py [--cars 20] [--pushes 20] [--delay-ms 5] [--drop 0]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fleet import APPLIED, Car, FleetPublisher
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTROLLER = "pure_pursuit"
+
+
+def start_agents(count, base_port, directory, delay_ms, drop):
+    env = dict(os.environ, PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               ROBORACER_FLAG_HISTORY=os.path.join(directory, "flag_history.sqlite3"))
+    processes = []
+    for i in range(count):
+        name = f"car-{i + 1}"
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(REPO_DIR, "fleet.py"), "agent", name, "--host", "127.0.0.1", "--port", str(base_port + i),
+             "--ws", os.path.join(directory, name), "--delay-ms", str(delay_ms), "--drop", str(drop)],
+            env=env, cwd=directory, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        ))
+    for process in processes:
+        # The agent prints its ports once it listens.
+        if not process.stdout.readline():
+            raise RuntimeError("An agent did not start")
+    return processes, [Car(f"car-{i + 1}", "127.0.0.1", base_port + i) for i in range(count)]
+
+
+async def timed_push(publisher, cars, kp):
+    start = time.perf_counter()
+    results = await publisher.push(cars, CONTROLLER, {"throttle": 0.15, "kp": kp, "kv": 1.0, "lookahead_distance": 1.2})
+    elapsed = time.perf_counter() - start
+    if any(result.status != APPLIED for result in results):
+        failed = [f"{result.car}: {result.status}" for result in results if result.status != APPLIED]
+        raise RuntimeError(f"Push not applied on {', '.join(failed)}")
+    return elapsed, sum(result.attempts - 1 for result in results)
+
+
+async def run(cars, pushes):
+    publisher = FleetPublisher()
+    kp = 0.0
+    sizes = sorted({1, 5, 10, len(cars)} & set(range(1, len(cars) + 1)))
+    print(f"{'cars':>5s} {'concurrent (ms)':>16s} {'one by one (ms)':>16s} {'retries':>8s}   median of {pushes} pushes")
+    for size in sizes:
+        concurrent, sequential, retries = [], [], 0
+        for _ in range(pushes):
+            kp = round((kp + 0.1) % 5, 1)
+            elapsed, retried = await timed_push(publisher, cars[:size], kp)
+            concurrent.append(elapsed)
+            retries += retried
+            start = time.perf_counter()
+            for car in cars[:size]:
+                _, retried = await timed_push(publisher, [car], kp)
+                retries += retried
+            sequential.append(time.perf_counter() - start)
+        print(f"{size:5d} {statistics.median(concurrent) * 1000:16.1f} {statistics.median(sequential) * 1000:16.1f} {retries:8d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cars", type=int, default=20)
+    parser.add_argument("--pushes", type=int, default=20)
+    parser.add_argument("--delay-ms", type=float, default=5.0)
+    parser.add_argument("--drop", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=48300, help="Port of the first agent")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        processes, cars = start_agents(args.cars, args.port, directory, args.delay_ms, args.drop)
+        try:
+            asyncio.run(run(cars, args.pushes))
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,537 @@
+"""
+Speed and curvature scheduled gains, compiled to uniform lookup tables.
+
+A gain schedule replaces the single value of some gains of a controller (the
+"scheduled" parameters of its schema, e.g. kp, kd and ki of wall_follow) by breakpoint
+tables over the speed of the car (m/s) and the absolute curvature of the path (1/m).
+The gain at (speed, curvature) is the bilinear interpolation of the surrounding
+breakpoints, clamped at the ends of the table. Breakpoints need not be evenly spaced.
+
+GainSchedule is the editable form, saved as <controller>_gains.json next to every
+<controller>_params.json copy. Looking a gain up in it searches the breakpoints of both
+axes on every control tick; compile() resamples it once on a uniform grid instead, a
+GainTable, saved next to it as <controller>_gains.bin (little endian):
+
+    header  magic "RRGT", format version (u16), gain count (u16), speed nodes (u16),
+            curvature nodes (u16), first speed, speed step, first curvature and
+            curvature step (float64), body crc32 (u32)
+    body    gain names (16 bytes each, NUL padded), then (version 2) the float64 nodes
+            of every axis with a step of 0, speeds first, then the float32 gains
+            [speed node][curvature node][gain]
+
+A lookup is then two multiplications for the cell and a blend of the gains at its four
+corners, whatever the size of the table. The grid step is the largest one that puts
+every breakpoint on a node (to QUANTUM), so the table reproduces the schedule exactly.
+Breakpoints such as 1.3 and 4 m/s need a fine step, though: an axis that takes more
+than MAX_NODES nodes, or the axis with the most nodes while the table is larger than
+MAX_TABLE_BYTES, keeps its breakpoints as nodes instead (version 2). Its cell is then
+found through a uniform index of bins no wider than half the closest breakpoints, so
+the lookup stays exact and constant time, a few comparisons slower. GainTable.error is
+the largest deviation from the schedule (the float32 rounding).
+
+Speeds and curvatures beyond the table, infinities included, are clamped to its ends;
+NaN gives the gains of the first node.
+
+    python gain_schedule.py compile wall_follow path/to/wall_follow_gains.json
+    python gain_schedule.py lookup path/to/wall_follow_gains.bin 4.5 0.3
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from flagging import config_paths
+from lap_sim import MAX_SPEED
+from param_schema import load_schema
+from param_writer import default_writer
+
+MAGIC = b"RRGT"
+# Version 1 has uniform axes only, which nodes reading it expect.
+VERSION = 1
+INDEXED_VERSION = 2
+HEADER = struct.Struct("<4sHHHH4dI")
+NAME_SIZE = 16
+
+QUANTUM = 1e-3
+MAX_NODES = 256
+MAX_TABLE_BYTES = 16 * 1024
+MAX_INDEX_BINS = 4096
+
+# Breakpoints of a new schedule: the speed range of the car, and curvatures up to
+# full steering lock (about 1.4 1/m).
+DEFAULT_SPEEDS = [0.0, MAX_SPEED / 4, MAX_SPEED / 2, MAX_SPEED * 3 / 4, MAX_SPEED]
+DEFAULT_CURVATURES = [0.0, 0.5, 1.0, 1.5]
+
+
+class GainTableError(ValueError):
+    pass
+
+
+def _breakpoints(axis, values):
+    values = [float(value) for value in values]
+    if not values:
+        raise ValueError(f"No {axis} breakpoints")
+    if not all(math.isfinite(value) and value >= 0 for value in values):
+        raise ValueError(f"{axis.capitalize()} breakpoints must be non-negative numbers")
+    if any(b <= a for a, b in zip(values, values[1:])):
+        raise ValueError(f"{axis.capitalize()} breakpoints must be increasing")
+    return values
+
+
+def _segment(breakpoints, x):
+    # Linear search of the segment holding x, the way a hand written lookup walks the table.
+    last = len(breakpoints) - 1
+    if last == 0 or not x > breakpoints[0]:
+        return 0, 0.0
+    for i in range(last):
+        if x < breakpoints[i + 1]:
+            return i, (x - breakpoints[i]) / (breakpoints[i + 1] - breakpoints[i])
+    return last - 1, 1.0
+
+
+def _cells(breakpoints, x):
+    # Vectorized _segment: lower and upper breakpoint and the fraction between them.
+    breakpoints = np.asarray(breakpoints)
+    if len(breakpoints) == 1:
+        lower = np.zeros(np.shape(x), dtype=np.intp)
+        return lower, lower, np.zeros(np.shape(x))
+    x = np.fmax(x, breakpoints[0])  # NaN too
+    lower = np.clip(np.searchsorted(breakpoints, x, side="right") - 1, 0, len(breakpoints) - 2)
+    fraction = np.clip((x - breakpoints[lower]) / (breakpoints[lower + 1] - breakpoints[lower]), 0.0, 1.0)
+    return lower, lower + 1, fraction
+
+
+def _grid(breakpoints, max_nodes):
+    # Nodes of the coarsest uniform grid through every breakpoint, or None when there is
+    # none of at most max_nodes nodes.
+    first, span = breakpoints[0], breakpoints[-1] - breakpoints[0]
+    if span == 0:
+        return np.array([first, first + 1.0])
+    offsets = [round((value - first) / QUANTUM) for value in breakpoints]
+    step = 0
+    for offset in offsets:
+        step = math.gcd(step, offset)
+    nodes = offsets[-1] // step + 1
+    on_grid = all(abs(offset * QUANTUM - (value - first)) < 1e-9 for offset, value in zip(offsets, breakpoints))
+    if not on_grid or nodes > max_nodes:
+        return None
+    return first + span / (nodes - 1) * np.arange(nodes)
+
+
+def _uniform_step(nodes):
+    # The step of evenly spaced nodes, or None. A Python float: lookup() is several
+    # times slower on NumPy scalars.
+    step = float(nodes[-1] - nodes[0]) / (len(nodes) - 1)
+    tolerance = 1e-9 * max(1.0, abs(nodes[-1]))
+    return step if np.allclose(nodes, nodes[0] + step * np.arange(len(nodes)), rtol=0, atol=tolerance) else None
+
+
+class GainSchedule:
+    """
+    Breakpoint tables of the scheduled gains of a controller: gains[name][i][j] is the
+    gain at speeds[i] and curvatures[j].
+    """
+
+    def __init__(self, controller, speeds, curvatures, gains):
+        schema = load_schema(controller)
+        if not schema.scheduled:
+            raise ValueError(f"{controller} has no scheduled gains")
+        self.controller = controller
+        self.names = list(schema.scheduled)
+        self.speeds = _breakpoints("speed", speeds)
+        self.curvatures = _breakpoints("curvature", curvatures)
+
+        unknown = set(gains) - set(self.names)
+        if unknown:
+            raise ValueError(f"Gains of {controller} not scheduled: {', '.join(sorted(unknown))}")
+        params = {param.name: param for param in schema.params}
+        self.gains = {}
+        for name in self.names:
+            if name not in gains:
+                raise ValueError(f"No table for {name}")
+            table = [[float(value) for value in row] for row in gains[name]]
+            if len(table) != len(self.speeds) or any(len(row) != len(self.curvatures) for row in table):
+                raise ValueError(f"The {name} table must have {len(self.speeds)} rows (speeds) of {len(self.curvatures)} gains (curvatures)")
+            param = params[name]
+            if not all(param.min <= value <= param.max for row in table for value in row):
+                raise ValueError(f"{name} must be between {param.min} and {param.max}")
+            self.gains[name] = table
+        self._values = np.array([self.gains[name] for name in self.names], dtype=float).transpose(1, 2, 0)
+
+    def __repr__(self):
+        return f"GainSchedule({self.controller!r}, {self.names}, {len(self.speeds)} x {len(self.curvatures)} breakpoints)"
+
+    @classmethod
+    def from_params(cls, controller, params, speeds=None, curvatures=None):
+        """
+        A flat schedule: every scheduled gain at its value in params (default when missing).
+        """
+
+        schema = load_schema(controller)
+        params = dict(schema.defaults(), **params)
+        speeds = DEFAULT_SPEEDS if speeds is None else speeds
+        curvatures = DEFAULT_CURVATURES if curvatures is None else curvatures
+        gains = {name: [[params[name]] * len(curvatures) for _ in speeds] for name in schema.scheduled}
+        return cls(controller, speeds, curvatures, gains)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["controller"], data["speeds"], data["curvatures"], data["gains"])
+
+    def to_dict(self):
+        return {"controller": self.controller, "speeds": self.speeds, "curvatures": self.curvatures, "gains": self.gains}
+
+    @classmethod
+    def from_rows(cls, controller, rows):
+        """
+        A schedule from rows of (speed, curvature, gain, ...), gains in the order of the
+        schema's scheduled parameters; there must be one row per speed and curvature.
+        """
+
+        rows = [[float(value) for value in row] for row in rows]
+        speeds = sorted({row[0] for row in rows})
+        curvatures = sorted({row[1] for row in rows})
+        cells = {(row[0], row[1]): row[2:] for row in rows}
+        if len(cells) != len(rows):
+            raise ValueError("Some speed and curvature appear twice")
+        if len(cells) != len(speeds) * len(curvatures):
+            raise ValueError(f"Expected a row for each of the {len(speeds)} speeds and {len(curvatures)} curvatures")
+        names = load_schema(controller).scheduled
+        if any(len(gains) != len(names) for gains in cells.values()):
+            raise ValueError(f"Expected a value for each of {', '.join(names)}")
+        gains = {name: [[cells[speed, curvature][k] for curvature in curvatures] for speed in speeds] for k, name in enumerate(names)}
+        return cls(controller, speeds, curvatures, gains)
+
+    def rows(self):
+        return [[speed, curvature] + [self.gains[name][i][j] for name in self.names]
+                for i, speed in enumerate(self.speeds) for j, curvature in enumerate(self.curvatures)]
+
+    def regrid(self, speeds, curvatures):
+        """
+        The schedule on other breakpoints, with the gains this one gives there.
+        """
+
+        speeds, curvatures = _breakpoints("speed", speeds), _breakpoints("curvature", curvatures)
+        grid_speeds, grid_curvatures = np.meshgrid(speeds, curvatures, indexing="ij")
+        values = self.lookup_many(grid_speeds.ravel(), grid_curvatures.ravel()).reshape(len(speeds), len(curvatures), -1)
+        return GainSchedule(self.controller, speeds, curvatures, {name: values[:, :, k].tolist() for k, name in enumerate(self.names)})
+
+    def lookup(self, speed, curvature):
+        """
+        The gains at speed and curvature, in names order, by searching the breakpoints.
+        """
+
+        i, fx = _segment(self.speeds, speed)
+        j, fy = _segment(self.curvatures, abs(curvature))
+        k, l = min(i + 1, len(self.speeds) - 1), min(j + 1, len(self.curvatures) - 1)
+        return tuple((1 - fx) * ((1 - fy) * table[i][j] + fy * table[i][l]) + fx * ((1 - fy) * table[k][j] + fy * table[k][l])
+                     for table in (self.gains[name] for name in self.names))
+
+    def lookup_many(self, speeds, curvatures):
+        """
+        The gains of a batch of speeds and curvatures, an (n, gains) array.
+        """
+
+        i, k, fx = _cells(self.speeds, np.asarray(speeds, dtype=float))
+        j, l, fy = _cells(self.curvatures, np.abs(np.asarray(curvatures, dtype=float)))
+        fx, fy, values = fx[:, None], fy[:, None], self._values
+        return (1 - fx) * ((1 - fy) * values[i, j] + fy * values[i, l]) + fx * ((1 - fy) * values[k, j] + fy * values[k, l])
+
+    def compile(self, max_nodes=MAX_NODES, max_bytes=MAX_TABLE_BYTES):
+        """
+        The GainTable of this schedule, with its largest deviation from it as error.
+        Axes of more than max_nodes uniform nodes, and the largest ones while the gains
+        take more than max_bytes, keep their breakpoints as nodes.
+        """
+
+        axes = []
+        for breakpoints in (self.speeds, self.curvatures):
+            nodes = _grid(breakpoints, max_nodes)
+            axes.append(np.array(breakpoints) if nodes is None else nodes)
+        while 4 * len(self.names) * len(axes[0]) * len(axes[1]) > max_bytes:
+            shrinkable = [k for k, breakpoints in enumerate((self.speeds, self.curvatures)) if 2 <= len(breakpoints) < len(axes[k])]
+            if not shrinkable:
+                break
+            k = max(shrinkable, key=lambda k: len(axes[k]))
+            axes[k] = np.array((self.speeds, self.curvatures)[k])
+        speeds, curvatures = axes
+        grid_speeds, grid_curvatures = np.meshgrid(speeds, curvatures, indexing="ij")
+        values = self.lookup_many(grid_speeds.ravel(), grid_curvatures.ravel()).reshape(len(speeds), len(curvatures), len(self.names))
+        table = GainTable(self.names, speeds, curvatures, values)
+
+        # Between nodes and breakpoints both are bilinear, so the deviation peaks at
+        # either or halfway between them.
+        def samples(breakpoints, nodes):
+            points = np.unique(np.concatenate([breakpoints, nodes]))
+            return np.concatenate([points, (points[1:] + points[:-1]) / 2])
+
+        check_speeds, check_curvatures = np.meshgrid(samples(self.speeds, speeds), samples(self.curvatures, curvatures), indexing="ij")
+        check_speeds, check_curvatures = check_speeds.ravel(), check_curvatures.ravel()
+        table.error = float(np.abs(table.lookup_many(check_speeds, check_curvatures) - self.lookup_many(check_speeds, check_curvatures)).max())
+        return table
+
+
+class GainTable:
+    """
+    A compiled gain schedule: the gains on a speed x curvature grid in one flat float32
+    array, looked up in constant time. speeds and curvatures are the nodes of the grid,
+    evenly spaced or (an indexed axis) the breakpoints of the schedule.
+    """
+
+    def __init__(self, names, speeds, curvatures, values, error=0.0):
+        self.names = tuple(names)
+        self.values = np.ascontiguousarray(values, dtype="<f4")
+        self.speed_nodes, self.curvature_nodes, count = self.values.shape
+        if count != len(self.names):
+            raise GainTableError(f"{count} gains for {len(self.names)} names")
+        if min(self.speed_nodes, self.curvature_nodes) < 2:
+            raise GainTableError("A gain table needs two nodes per axis")
+        self.speeds, self.curvatures = np.asarray(speeds, dtype=float), np.asarray(curvatures, dtype=float)
+        if (len(self.speeds), len(self.curvatures)) != (self.speed_nodes, self.curvature_nodes):
+            raise GainTableError("The nodes do not match the shape of the gains")
+        if not all(np.all(np.isfinite(nodes)) and np.all(np.diff(nodes) > 0) for nodes in (self.speeds, self.curvatures)):
+            raise GainTableError("The nodes of a gain table must be increasing numbers")
+        # A step of 0 marks an indexed axis.
+        self.speed0, self.speed_step = float(self.speeds[0]), _uniform_step(self.speeds) or 0.0
+        self.curvature0, self.curvature_step = float(self.curvatures[0]), _uniform_step(self.curvatures) or 0.0
+        self.error = error
+
+        # lookup() blends c0 + fx * (cx + cxy * fy) + fy * cy per gain, from Python floats
+        # (indexing NumPy arrays one element at a time is several times slower). The
+        # last row and column are repeated, so the nodes at the far ends of the table
+        # are cells too, and the tuples of a cell are made on its first lookup.
+        padded = np.pad(self.values.astype(float), ((0, 1), (0, 1), (0, 0)), mode="edge")
+        c0 = padded[:-1, :-1]
+        cx, cy = padded[1:, :-1] - c0, padded[:-1, 1:] - c0
+        cxy = padded[1:, 1:] - padded[1:, :-1] - padded[:-1, 1:] + c0
+        self._coefficients = np.stack([c0, cx, cy, cxy], axis=-1).reshape(-1, count, 4)
+        self._cells = [None] * len(self._coefficients)
+        if self.uniform:
+            self._inv_speed_step = 1.0 / self.speed_step
+            self._inv_curvature_step = 1.0 / self.curvature_step
+            self._last_speed = float(self.speed_nodes - 1)
+            self._last_curvature = float(self.curvature_nodes - 1)
+        else:
+            self._speed_index = self._index(self.speeds)
+            self._curvature_index = self._index(self.curvatures)
+            self.lookup = self._lookup_indexed
+
+    def __repr__(self):
+        kind = "nodes" if self.uniform else "nodes (indexed)"
+        return f"GainTable({list(self.names)}, {self.speed_nodes} x {self.curvature_nodes} {kind}, {self.nbytes} bytes)"
+
+    @property
+    def uniform(self):
+        return bool(self.speed_step and self.curvature_step)
+
+    @property
+    def nbytes(self):
+        indexed = (0 if self.speed_step else self.speed_nodes) + (0 if self.curvature_step else self.curvature_nodes)
+        return HEADER.size + NAME_SIZE * len(self.names) + 8 * indexed + self.values.nbytes
+
+    @staticmethod
+    def _index(nodes):
+        # (nodes, first, last, 1 / bin width, lower node of every bin, 1 / segment widths)
+        # of an axis: a bin holds at most one node unless the nodes are closer than
+        # MAX_INDEX_BINS allows, and the lookup steps over the nodes of its bin.
+        span = nodes[-1] - nodes[0]
+        width = max(float(np.diff(nodes).min()) / 2, span / MAX_INDEX_BINS)
+        bins = nodes[0] + width * np.arange(int(span / width) + 2)
+        lower = np.clip(np.searchsorted(nodes, bins, side="right") - 1, 0, len(nodes) - 2)
+        return (nodes.tolist(), float(nodes[0]), float(nodes[-1]), 1.0 / width, lower.tolist(), (1.0 / np.diff(nodes)).tolist())
+
+    def lookup(self, speed, curvature):
+        """
+        The gains at speed and curvature, in names order.
+        """
+
+        x = (speed - self.speed0) * self._inv_speed_step
+        if not x > 0.0:  # NaN too
+            x = 0.0
+        elif x > self._last_speed:
+            x = self._last_speed
+        y = (abs(curvature) - self.curvature0) * self._inv_curvature_step
+        if not y > 0.0:
+            y = 0.0
+        elif y > self._last_curvature:
+            y = self._last_curvature
+        i, j = int(x), int(y)
+        fx, fy = x - i, y - j
+
+        index = i * self.curvature_nodes + j
+        cell = self._cells[index]
+        if cell is None:
+            cell = self._cells[index] = tuple(map(tuple, self._coefficients[index].tolist()))
+        return tuple([c0 + fx * (cx + cxy * fy) + fy * cy for c0, cx, cy, cxy in cell])
+
+    def _lookup_indexed(self, speed, curvature):
+        # lookup() of a table with indexed axes (uniform ones are indexed the same way).
+        nodes, first, last, inv_width, lower, inv_segments = self._speed_index
+        if not speed > first:
+            speed = first
+        elif speed > last:
+            speed = last
+        i = lower[int((speed - first) * inv_width)]
+        while i < len(inv_segments) - 1 and speed > nodes[i + 1]:
+            i += 1
+        fx = (speed - nodes[i]) * inv_segments[i]
+
+        nodes, first, last, inv_width, lower, inv_segments = self._curvature_index
+        curvature = abs(curvature)
+        if not curvature > first:
+            curvature = first
+        elif curvature > last:
+            curvature = last
+        j = lower[int((curvature - first) * inv_width)]
+        while j < len(inv_segments) - 1 and curvature > nodes[j + 1]:
+            j += 1
+        fy = (curvature - nodes[j]) * inv_segments[j]
+
+        index = i * self.curvature_nodes + j
+        cell = self._cells[index]
+        if cell is None:
+            cell = self._cells[index] = tuple(map(tuple, self._coefficients[index].tolist()))
+        return tuple([c0 + fx * (cx + cxy * fy) + fy * cy for c0, cx, cy, cxy in cell])
+
+    def lookup_many(self, speeds, curvatures):
+        """
+        The gains of a batch of speeds and curvatures, an (n, gains) array.
+        """
+
+        speeds, curvatures = np.asarray(speeds, dtype=float), np.abs(np.asarray(curvatures, dtype=float))
+        if self.uniform:
+            # fmax / fmin rather than clip, which keeps NaN.
+            x = np.fmin(np.fmax((speeds - self.speed0) * self._inv_speed_step, 0), self._last_speed)
+            y = np.fmin(np.fmax((curvatures - self.curvature0) * self._inv_curvature_step, 0), self._last_curvature)
+            i = np.minimum(x.astype(np.intp), self.speed_nodes - 2)
+            j = np.minimum(y.astype(np.intp), self.curvature_nodes - 2)
+            fx, fy = (x - i)[:, None], (y - j)[:, None]
+            k, l = i + 1, j + 1
+        else:
+            i, k, fx = _cells(self.speeds, speeds)
+            j, l, fy = _cells(self.curvatures, curvatures)
+            fx, fy = fx[:, None], fy[:, None]
+        values = self.values
+        return (1 - fx) * ((1 - fy) * values[i, j] + fy * values[i, l]) + fx * ((1 - fy) * values[k, j] + fy * values[k, l])
+
+    def to_bytes(self):
+        names = b""
+        for name in self.names:
+            encoded = name.encode("ascii")
+            if len(encoded) > NAME_SIZE:
+                raise GainTableError(f"Gain name {name!r} longer than {NAME_SIZE} bytes")
+            names += encoded.ljust(NAME_SIZE, b"\0")
+        indexed = [nodes for nodes, step in ((self.speeds, self.speed_step), (self.curvatures, self.curvature_step)) if not step]
+        body = names + b"".join(nodes.astype("<f8").tobytes() for nodes in indexed) + self.values.tobytes()
+        return HEADER.pack(MAGIC, INDEXED_VERSION if indexed else VERSION, len(self.names), self.speed_nodes, self.curvature_nodes,
+                           self.speed0, self.speed_step, self.curvature0, self.curvature_step, zlib.crc32(body)) + body
+
+    @classmethod
+    def from_bytes(cls, buffer):
+        """
+        The GainTable in buffer, after checking it. Raises GainTableError.
+        """
+
+        if len(buffer) < HEADER.size:
+            raise GainTableError("Gain table too short")
+        magic, version, count, speed_nodes, curvature_nodes, speed0, speed_step, curvature0, curvature_step, crc = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise GainTableError("Not a gain table")
+        if version not in (VERSION, INDEXED_VERSION):
+            raise GainTableError(f"Unsupported gain table version {version}")
+        axes = [(speed0, speed_step, speed_nodes), (curvature0, curvature_step, curvature_nodes)]
+        indexed = [nodes for _, step, nodes in axes if not step]
+        if indexed and version == VERSION:
+            raise GainTableError("Gain table with a step of 0")
+        body = memoryview(buffer)[HEADER.size:]
+        if len(body) != NAME_SIZE * count + 8 * sum(indexed) + 4 * count * speed_nodes * curvature_nodes:
+            raise GainTableError(f"Gain table of {len(buffer)} bytes does not match its header")
+        if zlib.crc32(body) != crc:
+            raise GainTableError("Gain table checksum mismatch")
+        names = [bytes(body[k * NAME_SIZE:(k + 1) * NAME_SIZE]).rstrip(b"\0").decode("ascii") for k in range(count)]
+        offset = NAME_SIZE * count
+        nodes = []
+        for first, step, size in axes:
+            if step:
+                nodes.append(first + step * np.arange(size))
+            else:
+                nodes.append(np.frombuffer(body, dtype="<f8", count=size, offset=offset).astype(float))
+                offset += 8 * size
+        values = np.frombuffer(body, dtype="<f4", offset=offset).reshape(speed_nodes, curvature_nodes, count)
+        return cls(names, nodes[0], nodes[1], values)
+
+
+def schedule_paths(controller, workspace=None):
+    """
+    <controller>_gains.json next to every <controller>_params.json copy.
+    """
+
+    return [os.path.join(os.path.dirname(path), f"{controller}_gains.json") for path in config_paths(controller, workspace)]
+
+
+def table_paths(paths):
+    return [os.path.splitext(path)[0] + ".bin" for path in paths]
+
+
+def write_schedule(schedule, table=None, writer=None, paths=None):
+    """
+    Queue schedule and its compiled table for writing next to the params files.
+    Returns the ParamWriter future of the write.
+    """
+
+    writer = writer or default_writer
+    paths = schedule_paths(schedule.controller) if paths is None else paths
+    table = table or schedule.compile()
+    writer.submit(paths, schedule.to_dict())
+    # Queued after the JSON, the returned future completes after both.
+    return writer.submit_bytes(table_paths(paths), table.to_bytes())
+
+
+def load_schedule(path):
+    with open(path) as f:
+        return GainSchedule.from_dict(json.load(f))
+
+
+def load_table(path):
+    with open(path, "rb") as f:
+        return GainTable.from_bytes(f.read())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and inspect gain schedules.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser("compile", help="Compile a <controller>_gains.json into its .bin table")
+    compile_parser.add_argument("controller")
+    compile_parser.add_argument("path", nargs="?", help="Default: the src/ copy in the workspace")
+    compile_parser.add_argument("--max-nodes", type=int, default=MAX_NODES)
+    compile_parser.add_argument("--max-bytes", type=int, default=MAX_TABLE_BYTES)
+
+    lookup = commands.add_parser("lookup", help="Gains of a compiled table at a speed and curvature")
+    lookup.add_argument("path")
+    lookup.add_argument("speed", type=float)
+    lookup.add_argument("curvature", type=float)
+
+    args = parser.parse_args()
+    if args.command == "compile":
+        path = args.path or schedule_paths(args.controller)[0]
+        schedule = load_schedule(path)
+        if schedule.controller != args.controller:
+            parser.error(f"{path} is a schedule of {schedule.controller}")
+        table = schedule.compile(args.max_nodes, args.max_bytes)
+        out = table_paths([path])[0]
+        default_writer.submit_bytes([out], table.to_bytes()).result()
+        print(f"Wrote {table} to {out}, largest deviation {table.error:.3g}")
+        return
+
+    table = load_table(args.path)
+    print(", ".join(f"{name}={value:.4g}" for name, value in zip(table.names, table.lookup(args.speed, args.curvature))))
+
+
+if __name__ == "__main__":
+    main()
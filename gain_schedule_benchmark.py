@@ -0,0 +1,140 @@
+"""
+Benchmark of gain schedule lookups (gain_schedule.py): the per-tick cost of the compiled
+table against searching the breakpoint tables.
+
+For a typical schedule (9 speeds x 6 curvatures) and a fine one (--speeds x
+--curvatures unevenly spaced breakpoints, at least 0.05 m/s and 0.01 1/m apart), one
+tick looks up the three wall_follow gains at a speed and curvature:
+
+    compile     time to compile the schedule, size of the table and its largest
+                deviation from the schedule (the fine one is too large for a uniform
+                grid, so its table indexes the breakpoints)
+    per tick    shortest of 3 passes, one lookup at a time as the node's control loop would, through the
+                table (after a first pass over the ticks, as the cells of the table are
+                set up on their first lookup), a linear search of the breakpoints and a
+                binary search (bisect); the gains are checked to be the same
+    batched     lookups of every tick in one NumPy call
+    lap         a simulated pure_pursuit lap (lap_sim.py) with the gains scheduled on
+                every step, per step (shortest of 5 laps)
+
+Usage:
+    python gain_schedule_benchmark.py [--ticks 100000] [--speeds 40] [--curvatures 30]
+"""
+
+import argparse
+import bisect
+import time
+
+import numpy as np
+
+from gain_schedule import GainSchedule
+from lap_sim import simulate_lap
+
+TYPICAL_SPEEDS = [0, 1, 2, 3, 4, 5, 6, 8, 10]
+TYPICAL_CURVATURES = [0, 0.1, 0.2, 0.4, 0.8, 1.5]
+REPEATS = 3
+PURE_PURSUIT = {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}
+
+
+def bisect_lookup(schedule):
+    # Piecewise lookup with a binary search of each axis.
+    speeds, curvatures = schedule.speeds, schedule.curvatures
+    tables = [schedule.gains[name] for name in schedule.names]
+
+    def segment(breakpoints, x):
+        if len(breakpoints) == 1 or x <= breakpoints[0]:
+            return 0, 0, 0.0
+        if x >= breakpoints[-1]:
+            return len(breakpoints) - 2, len(breakpoints) - 1, 1.0
+        i = bisect.bisect_right(breakpoints, x) - 1
+        return i, i + 1, (x - breakpoints[i]) / (breakpoints[i + 1] - breakpoints[i])
+
+    def lookup(speed, curvature):
+        i, k, fx = segment(speeds, speed)
+        j, l, fy = segment(curvatures, abs(curvature))
+        return tuple((1 - fx) * ((1 - fy) * table[i][j] + fy * table[i][l]) + fx * ((1 - fy) * table[k][j] + fy * table[k][l])
+                     for table in tables)
+
+    return lookup
+
+
+def random_breakpoints(rng, count, resolution, last):
+    # Unevenly spaced breakpoints from 0 to last, on multiples of resolution.
+    inner = np.sort(rng.choice(np.arange(1, round(last / resolution)), count - 2, replace=False)) * resolution
+    return [0.0] + inner.round(3).tolist() + [last]
+
+
+def random_schedule(rng, speeds, curvatures):
+    shape = (len(speeds), len(curvatures))
+    gains = {"kp": rng.uniform(0.2, 3, shape).tolist(), "kd": rng.uniform(0, 1, shape).tolist(), "ki": rng.uniform(0, 0.1, shape).tolist()}
+    return GainSchedule("wall_follow", speeds, curvatures, gains)
+
+
+def per_tick(lookup, speeds, curvatures, repeats=REPEATS):
+    # Shortest of several passes: the noise of the machine only ever adds time.
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        gains = [lookup(speed, curvature) for speed, curvature in zip(speeds, curvatures)]
+        best = min(best, time.perf_counter() - start)
+    return best / len(speeds), np.array(gains)
+
+
+def timed(fn, *args, repeats=1):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=100000)
+    parser.add_argument("--speeds", type=int, default=40, help="Speed breakpoints of the fine schedule")
+    parser.add_argument("--curvatures", type=int, default=30, help="Curvature breakpoints of the fine schedule")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    # Ticks a little outside the tables too, where the gains are clamped.
+    speeds = rng.uniform(0, 11, args.ticks).tolist()
+    curvatures = rng.uniform(-1.6, 1.6, args.ticks).tolist()
+    schedules = {
+        "typical": random_schedule(rng, TYPICAL_SPEEDS, TYPICAL_CURVATURES),
+        "fine": random_schedule(rng, random_breakpoints(rng, args.speeds, 0.05, 10.0), random_breakpoints(rng, args.curvatures, 0.01, 1.5)),
+    }
+
+    for label, schedule in schedules.items():
+        print(f"{label}: {len(schedule.speeds)} x {len(schedule.curvatures)} breakpoints")
+        table, compile_s = timed(schedule.compile)
+        print(f"  compile: {compile_s * 1000:.1f} ms, {table.speed_nodes} x {table.curvature_nodes} {'nodes' if table.uniform else 'indexed nodes'}, "
+              f"{table.nbytes / 1024:.1f} kB, largest deviation {table.error:.2g}")
+
+        first_tick, _ = per_tick(table.lookup, speeds, curvatures, repeats=1)
+        table_tick, table_gains = per_tick(table.lookup, speeds, curvatures)
+        linear_tick, linear_gains = per_tick(schedule.lookup, speeds, curvatures)
+        bisect_tick, bisect_gains = per_tick(bisect_lookup(schedule), speeds, curvatures)
+        same = max(np.abs(table_gains - linear_gains).max(), np.abs(bisect_gains - linear_gains).max())
+        print(f"  per tick: table {table_tick * 1e9:6.0f} ns   linear search {linear_tick * 1e9:6.0f} ns ({linear_tick / table_tick:.1f}x)"
+              f"   bisect {bisect_tick * 1e9:6.0f} ns ({bisect_tick / table_tick:.1f}x), largest difference {same:.2g}"
+              f"   (first pass through the table {first_tick * 1e9:.0f} ns)")
+
+        speed_array, curvature_array = np.array(speeds), np.array(curvatures)
+        _, table_batch = timed(table.lookup_many, speed_array, curvature_array, repeats=REPEATS)
+        _, search_batch = timed(schedule.lookup_many, speed_array, curvature_array, repeats=REPEATS)
+        print(f"  batched: table {table_batch / args.ticks * 1e9:6.1f} ns   searchsorted {search_batch / args.ticks * 1e9:6.1f} ns per tick")
+
+    schedule = GainSchedule.from_params("pure_pursuit", PURE_PURSUIT).regrid(schedules["fine"].speeds, schedules["fine"].curvatures)
+    steps = []
+    simulate_lap("pure_pursuit", PURE_PURSUIT, on_step=lambda *step: steps.append(step))
+    results = []
+    for gains in (None, schedule.compile(), schedule):
+        _, lap_s = timed(simulate_lap, "pure_pursuit", PURE_PURSUIT, None, gains, repeats=5)
+        results.append(lap_s / len(steps))
+    print(f"lap ({len(steps)} steps, fine breakpoints): no schedule {results[0] * 1e6:.1f} us, "
+          f"table {results[1] * 1e6:.1f} us, linear search {results[2] * 1e6:.1f} us per step")
+
+
+if __name__ == "__main__":
+    main()
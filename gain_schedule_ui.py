@@ -0,0 +1,160 @@
+"""
+Gain schedule editor of the Wall Follow and Pure Pursuit tabs (declared in their schemas).
+
+Extends the sliders of the scheduled gains into breakpoint tables over speed and
+curvature (see gain_schedule.py): "From Sliders" starts a flat schedule at the slider
+values, "Apply Breakpoints" moves the table to new breakpoints keeping the gains it
+gives there, and "Compile and Save" writes <controller>_gains.json and the compiled
+<controller>_gains.bin next to the *_params.json copies. The plot shows the compiled
+gains against speed at every curvature breakpoint, and the status compares a simulated
+lap (lap_sim.py) with the schedule against the sliders alone.
+"""
+
+import os
+import re
+
+import gradio as gr
+import numpy as np
+import pandas as pd
+
+from gain_schedule import GainSchedule, load_schedule, schedule_paths, table_paths, write_schedule
+from lap_sim import simulate_lap
+from param_ui import collect_params, write_group
+
+AXES = ["speed (m/s)", "curvature (1/m)"]
+PLOT_SPEEDS = 50
+WRITE_TIMEOUT = 10
+
+
+def parse_breakpoints(text):
+    """
+    Comma or space separated breakpoints, sorted.
+    """
+
+    try:
+        return sorted({float(value) for value in re.split(r"[,\s]+", text.strip()) if value})
+    except ValueError:
+        raise ValueError(f"Breakpoints must be numbers, got {text!r}") from None
+
+
+def format_breakpoints(values):
+    return ", ".join(f"{value:g}" for value in values)
+
+
+def initial_schedule(schema):
+    """
+    The saved schedule of the controller, or a flat one at the defaults.
+    """
+
+    path = schedule_paths(schema.name)[0]
+    if os.path.exists(path):
+        try:
+            return load_schedule(path)
+        except (OSError, ValueError, KeyError):
+            pass
+    return GainSchedule.from_params(schema.name, schema.defaults())
+
+
+def schedule_frame(schedule):
+    return pd.DataFrame(schedule.rows(), columns=AXES + schedule.names)
+
+
+def frame_schedule(schema, frame):
+    try:
+        return GainSchedule.from_rows(schema.name, frame.to_numpy().tolist())
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid gain schedule: {e}") from None
+
+
+def schedule_preview(schema, schedule, params=None):
+    """
+    This function compiles schedule and returns its status line and the plot of the
+    compiled gains, with the simulated laps of params when given.
+    """
+
+    table = schedule.compile()
+    speeds = np.linspace(0, schedule.speeds[-1], PLOT_SPEEDS)
+    frames = []
+    for curvature in schedule.curvatures:
+        gains = table.lookup_many(speeds, np.full(PLOT_SPEEDS, curvature))
+        for k, name in enumerate(table.names):
+            frames.append(pd.DataFrame({"speed (m/s)": speeds, "gain": gains[:, k], "series": f"{name} at {curvature:g} 1/m"}))
+
+    status = f"{table.speed_nodes} x {table.curvature_nodes} {'grid' if table.uniform else 'grid, breakpoints indexed'}, {table.nbytes} bytes"
+    status += ", exact" if table.error < 1e-6 else f", largest deviation {table.error:.3g}"
+    if params is None:
+        return status, pd.concat(frames)
+    scheduled, flat = simulate_lap(schema.name, params, gains=table), simulate_lap(schema.name, params)
+
+    def lap(result):
+        return f"{result['lap_time']:.2f} s" if result["completed"] else f"{result['failure']} at {result['progress']:.0%}"
+
+    return f"{status}; simulated lap {lap(scheduled)} with the schedule, {lap(flat)} with the sliders", pd.concat(frames)
+
+
+def build_gain_schedule_panel(schema, inputs):
+    """
+    This function builds the gain schedule editor inside the current controller UI.
+    """
+
+    schedule = initial_schedule(schema)
+    initial_status, initial_plot = schedule_preview(schema, schedule, schema.defaults())
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Gain Schedule")
+            with gr.Row():
+                speeds = gr.Textbox(label="Speed breakpoints (m/s)", value=format_breakpoints(schedule.speeds))
+                curvatures = gr.Textbox(label="Curvature breakpoints (1/m)", value=format_breakpoints(schedule.curvatures))
+            with gr.Row():
+                sliders_button = gr.Button("From Sliders")
+                regrid_button = gr.Button("Apply Breakpoints")
+                save_button = gr.Button("Compile and Save", variant="primary")
+            table = gr.Dataframe(value=schedule_frame(schedule), headers=AXES + schedule.names, datatype="number", interactive=True,
+                                 label=f"{', '.join(schedule.names)} by speed and curvature, interpolated in between")
+            status = gr.Textbox(label="Compiled Schedule", value=initial_status, interactive=False)
+            plot = gr.LinePlot(value=initial_plot, x="speed (m/s)", y="gain", color="series", label="Compiled gains", height=400)
+
+    def from_sliders(speed_text, curvature_text, *values):
+        try:
+            params = schema.validate(collect_params(schema, values))
+            schedule = GainSchedule.from_params(schema.name, params, parse_breakpoints(speed_text), parse_breakpoints(curvature_text))
+        except ValueError as e:
+            raise gr.Error(str(e))
+        return schedule_frame(schedule)
+
+    def regrid(speed_text, curvature_text, frame):
+        try:
+            schedule = frame_schedule(schema, frame).regrid(parse_breakpoints(speed_text), parse_breakpoints(curvature_text))
+        except ValueError as e:
+            raise gr.Error(str(e))
+        return schedule_frame(schedule)
+
+    def preview(frame, *values):
+        try:
+            schedule = frame_schedule(schema, frame)
+        except ValueError as e:
+            return str(e), gr.skip()
+        try:
+            params = schema.validate(collect_params(schema, values))
+        except ValueError:
+            params = None
+        return schedule_preview(schema, schedule, params)
+
+    def save(frame):
+        try:
+            schedule = frame_schedule(schema, frame)
+        except ValueError as e:
+            raise gr.Error(str(e))
+        table = schedule.compile()
+        paths = schedule_paths(schema.name)
+        try:
+            write_schedule(schedule, table, paths=paths).result(timeout=WRITE_TIMEOUT)
+        except Exception as e:
+            return f"Error saving the gain schedule: {e}"
+        return f"Saved {table} to:\n" + "\n".join(paths + table_paths(paths))
+
+    sliders_button.click(fn=from_sliders, inputs=[speeds, curvatures] + inputs, outputs=table, queue=False)
+    regrid_button.click(fn=regrid, inputs=[speeds, curvatures, table], outputs=table, queue=False)
+    table.change(fn=preview, inputs=[table] + inputs, outputs=[status, plot], queue=False, show_progress="hidden", trigger_mode="always_last")
+    save_button.click(fn=save, inputs=table, outputs=status, **write_group(schema))
@@ -1,6 +1,211 @@
-from gradio_client import Client
+"""
+Client for the API endpoints of the tuning server (param_ui.build_api()), for automation
+scripts.
 
-client = Client("http://localhost:7860") 
+    with ParamClient("http://localhost:7860") as client:
+        params = client.set_params("wall_follow", kp=1.2, kd=0.1, ki=0.0, lookahead_dist=1.0)
+        record_id = client.flag("wall_follow", params, flag_reason="Golden")
+        record_ids = client.flag_many("pure_pursuit", configs, flag_reason="Other")
 
+Parameters are validated and typed against the controller's schema before they are sent
+(ValueError), server side errors raise ParamClientError. Calls go through Gradio's REST
+API (POST /gradio_api/call/<api_name>, then the result stream) over one pool of
+keep-alive connections, shared by every thread using the client.
 
-client.view_api()
\ No newline at end of file
+submit() only posts a call and returns a Call handle, so a script can queue many calls
+before collecting the results (pipeline() does both); flag_many() flags a whole batch
+in one request and one history transaction. AsyncParamClient is the asyncio variant.
+
+    python gradio_param_client.py [url]    (prints the API of the server)
+"""
+
+import asyncio
+import collections
+import json
+import os
+import sys
+
+import httpx
+
+from param_schema import load_schema
+
+DEFAULT_URL = os.environ.get("ROBORACER_UI_URL", "http://localhost:7860")
+
+Call = collections.namedtuple("Call", "api_name event_id")
+
+
+class ParamClientError(Exception):
+    pass
+
+
+def _params(controller, params, values):
+    params = dict(params or {}, **values)
+    return load_schema(controller).validate(params)
+
+
+def _set_request(controller, params, values):
+    return f"{controller}_set", [_params(controller, params, values)]
+
+
+def _flag_request(controller, params, flag_reason, flag_msg, values):
+    return f"{controller}_flag_params", [_params(controller, params, values), flag_reason, flag_msg]
+
+
+def _flag_many_request(controller, configs, flag_reason, flag_msg):
+    return f"{controller}_flag_many", [[_params(controller, params, {}) for params in configs], flag_reason, flag_msg]
+
+
+def _event_id(response):
+    if response.status_code != 200:
+        raise ParamClientError(f"{response.request.url}: HTTP {response.status_code} {response.text}")
+    return response.json()["event_id"]
+
+
+def _output(call, response):
+    """
+    The output of a finished call from its event stream.
+    """
+
+    if response.status_code != 200:
+        raise ParamClientError(f"{call.api_name}: HTTP {response.status_code} {response.text}")
+    event = data = None
+    for line in response.text.splitlines():
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:") and event in ("complete", "error"):
+            data = json.loads(line[len("data:"):])
+            break
+    if event == "complete":
+        return data[0] if len(data) == 1 else data
+    message = data.get("error") if isinstance(data, dict) else data
+    raise ParamClientError(f"{call.api_name}: {message or 'call failed'}")
+
+
+def _http_options(url, max_connections, timeout):
+    return {
+        "base_url": url.rstrip("/") + "/gradio_api",
+        "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        "timeout": timeout,
+    }
+
+
+class ParamClient:
+    """
+    Blocking client; safe to share between threads.
+    """
+
+    def __init__(self, url=DEFAULT_URL, max_connections=16, timeout=30.0):
+        self.url = url
+        self._http = httpx.Client(**_http_options(url, max_connections, timeout))
+
+    def submit(self, api_name, *data):
+        """
+        Post a call without waiting for its result.
+        """
+
+        response = self._http.post(f"/call/{api_name}", json={"data": list(data)})
+        return Call(api_name, _event_id(response))
+
+    def result(self, call):
+        return _output(call, self._http.get(f"/call/{call.api_name}/{call.event_id}"))
+
+    def call(self, api_name, *data):
+        return self.result(self.submit(api_name, *data))
+
+    def pipeline(self, requests):
+        """
+        Submit every (api_name, data) request, then collect the results in order.
+        """
+
+        calls = [self.submit(api_name, *data) for api_name, data in requests]
+        return [self.result(call) for call in calls]
+
+    def set_params(self, controller, params=None, **values):
+        """
+        Push params to the running node; returns the typed params.
+        """
+
+        api_name, data = _set_request(controller, params, values)
+        return self.call(api_name, *data)
+
+    def flag(self, controller, params=None, flag_reason="Latest", flag_msg="", **values):
+        """
+        Flag params; returns the flag history record id.
+        """
+
+        api_name, data = _flag_request(controller, params, flag_reason, flag_msg, values)
+        return self.call(api_name, *data)
+
+    def flag_many(self, controller, configs, flag_reason="Latest", flag_msg=""):
+        """
+        Flag a batch of params dicts in one request; returns their record ids.
+        """
+
+        api_name, data = _flag_many_request(controller, configs, flag_reason, flag_msg)
+        return self.call(api_name, *data)
+
+    def view_api(self):
+        response = self._http.get("/info")
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self._http.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncParamClient:
+    """
+    asyncio variant of ParamClient; run calls concurrently with asyncio.gather().
+    """
+
+    def __init__(self, url=DEFAULT_URL, max_connections=16, timeout=30.0):
+        self.url = url
+        self._http = httpx.AsyncClient(**_http_options(url, max_connections, timeout))
+
+    async def submit(self, api_name, *data):
+        response = await self._http.post(f"/call/{api_name}", json={"data": list(data)})
+        return Call(api_name, _event_id(response))
+
+    async def result(self, call):
+        return _output(call, await self._http.get(f"/call/{call.api_name}/{call.event_id}"))
+
+    async def call(self, api_name, *data):
+        return await self.result(await self.submit(api_name, *data))
+
+    async def pipeline(self, requests):
+        calls = await asyncio.gather(*(self.submit(api_name, *data) for api_name, data in requests))
+        return await asyncio.gather(*(self.result(call) for call in calls))
+
+    async def set_params(self, controller, params=None, **values):
+        api_name, data = _set_request(controller, params, values)
+        return await self.call(api_name, *data)
+
+    async def flag(self, controller, params=None, flag_reason="Latest", flag_msg="", **values):
+        api_name, data = _flag_request(controller, params, flag_reason, flag_msg, values)
+        return await self.call(api_name, *data)
+
+    async def flag_many(self, controller, configs, flag_reason="Latest", flag_msg=""):
+        api_name, data = _flag_many_request(controller, configs, flag_reason, flag_msg)
+        return await self.call(api_name, *data)
+
+    async def close(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+if __name__ == "__main__":
+    with ParamClient(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_URL) as client:
+        for name, endpoint in client.view_api()["named_endpoints"].items():
+            parameters = ", ".join(parameter["parameter_name"] or parameter["label"] for parameter in endpoint["parameters"])
+            print(f"{name}({parameters})")
@@ -0,0 +1,340 @@
+"""
+Latency instrumentation: timers, counters and histograms for the UI event handlers and
+the I/O they trigger, a local metrics endpoint and optional cProfile capture.
+
+    metrics = get_metrics()
+    with metrics.timer("io.write_atomic"):
+        ...
+    metrics.snapshot()    # {name: {"count", "mean", "p50", "p95", "p99", "max"}}, in ms
+
+Histograms have fixed log-spaced buckets (BUCKETS_PER_DECADE from 1 us to 1000 s), so
+each one takes the same memory however many events it records, and recording is a
+log10 and an increment. Quantiles are interpolated within a bucket (about 12 % wide).
+
+instrument_demo() times every event of a Gradio app, including the controls of tabs
+rendered later (see roboracer_ui.py):
+    queue.<handler>      wait in the Gradio queue before running
+    event.<handler>      preprocessing, the handler and postprocessing
+    handler.<handler>    the handler function alone
+The I/O steps are timed where they happen: io.write_atomic, io.fsync_dir,
+io.writer_batch (one pass of the background writer), io.flag_to_disk (from submit()
+to the file renamed and synced), io.history_append and io.stream_publish.
+
+ROBORACER_METRICS_PORT serves GET /metrics (Prometheus text format) and /metrics.json on
+127.0.0.1; the UIs also have the "metrics" API endpoint and an on-page panel.
+ROBORACER_PROFILE=<directory> runs every handler call under cProfile and writes
+<directory>/<handler>-<time>.prof (read it with pstats or snakeviz).
+
+Only the standard library is used, so the writer and the history can import this, and
+the endpoint and profiler modules are only imported once used, to keep the import cheap
+for roboracer_params.py.
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = os.environ.get("ROBORACER_METRICS_PORT")
+PROFILE_DIR = os.environ.get("ROBORACER_PROFILE")
+
+BUCKETS_PER_DECADE = 20
+MIN_SECONDS = 1e-6
+BUCKETS = 9 * BUCKETS_PER_DECADE
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed log-spaced buckets. Thread safe.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (BUCKETS + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        if seconds <= MIN_SECONDS:
+            index = 0
+        else:
+            index = min(int(math.log10(seconds / MIN_SECONDS) * BUCKETS_PER_DECADE) + 1, BUCKETS)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """
+        Estimated q quantile in seconds (0 when empty).
+        """
+
+        with self._lock:
+            counts, count, largest = list(self.counts), self.count, self.max
+        if not count:
+            return 0.0
+        target = q * count
+        seen = 0
+        for index, bucket in enumerate(counts):
+            if bucket and seen + bucket >= target:
+                if index == 0:
+                    return min(MIN_SECONDS, largest)
+                low = MIN_SECONDS * 10 ** ((index - 1) / BUCKETS_PER_DECADE)
+                high = MIN_SECONDS * 10 ** (index / BUCKETS_PER_DECADE)
+                # Geometric interpolation within the bucket, never above the largest value.
+                return min(low * (high / low) ** ((target - seen) / bucket), largest)
+            seen += bucket
+        return largest
+
+
+class _Timer:
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Named histograms and counters.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram())
+        return histogram
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def timer(self, name):
+        """
+        Context manager timing its block into the histogram name.
+        """
+
+        return _Timer(self, name)
+
+    def timed(self, name):
+        """
+        Decorator timing every call of a function into the histogram name.
+        """
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        """
+        {name: {"count", "mean", "p50", "p95", "p99", "max"}} with times in ms, and
+        {name: {"count"}} for counters.
+        """
+
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        result = {}
+        for name, histogram in sorted(histograms.items()):
+            count = histogram.count
+            stats = {"count": count, "mean": histogram.sum / count * 1000 if count else 0.0}
+            for q in QUANTILES:
+                stats[f"p{round(q * 100)}"] = histogram.quantile(q) * 1000
+            stats["max"] = histogram.max * 1000
+            result[name] = stats
+        for name, count in sorted(counters.items()):
+            result[name] = {"count": count}
+        return result
+
+    def prometheus(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = ["# TYPE roboracer_latency_seconds summary"]
+        for name, histogram in histograms:
+            for q in QUANTILES:
+                lines.append(f'roboracer_latency_seconds{{name="{name}",quantile="{q}"}} {histogram.quantile(q):.9g}')
+            lines.append(f'roboracer_latency_seconds_sum{{name="{name}"}} {histogram.sum:.9g}')
+            lines.append(f'roboracer_latency_seconds_count{{name="{name}"}} {histogram.count}')
+        lines.append("# TYPE roboracer_events_total counter")
+        for name, count in counters:
+            lines.append(f'roboracer_events_total{{name="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+_default_metrics = Metrics()
+
+
+def get_metrics():
+    return _default_metrics
+
+
+def _profiled(fn, name, *args, **kwargs):
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(fn, *args, **kwargs)
+    finally:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        safe_name = "".join(c if c.isalnum() or c in "_-" else "_" for c in name)
+        profile.dump_stats(os.path.join(PROFILE_DIR, f"{safe_name}-{time.time_ns()}.prof"))
+
+
+def instrument_handler(fn, name, metrics=None):
+    """
+    fn timed into handler.<name>, and profiled with ROBORACER_PROFILE. Generator
+    functions are returned as they are (their time is in event.<name>).
+    """
+
+    import inspect
+
+    metrics = metrics or get_metrics()
+    if inspect.isgeneratorfunction(fn) or inspect.isasyncgenfunction(fn):
+        return fn
+    key = f"handler.{name}"
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with metrics.timer(key):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with metrics.timer(key):
+            if PROFILE_DIR:
+                return _profiled(fn, name, *args, **kwargs)
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def handler_name(block_fn):
+    """
+    The function name of an event, so the change events of every slider share one
+    histogram; lambdas go by their api_name.
+    """
+
+    name = block_fn.name
+    if not name or name == "<lambda>":
+        name = block_fn.api_name or "lambda"
+    return str(name)
+
+
+def instrument_demo(demo, metrics=None):
+    """
+    Time every event of a Gradio Blocks app (see the module docstring) and start the
+    metrics endpoint when ROBORACER_METRICS_PORT is set. Returns demo.
+    """
+
+    metrics = metrics or get_metrics()
+    process_api = demo.process_api
+
+    async def timed_process_api(block_fn, *args, **kwargs):
+        fn = demo.fns[block_fn] if isinstance(block_fn, int) else block_fn
+        name = handler_name(fn)
+        if fn.fn is not None and not getattr(fn, "_instrumented", False):
+            fn.fn = instrument_handler(fn.fn, name, metrics)
+            fn._instrumented = True
+        queue = getattr(demo, "_queue", None)
+        event_id = kwargs.get("event_id")
+        event = queue.event_ids_to_events.get(event_id) if queue is not None and event_id else None
+        if event is not None:
+            metrics.observe(f"queue.{name}", time.monotonic() - event.enqueue_time)
+        with metrics.timer(f"event.{name}"):
+            return await process_api(block_fn, *args, **kwargs)
+
+    demo.process_api = timed_process_api
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT), metrics)
+    return demo
+
+
+def _handler_class(metrics):
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = metrics.prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(metrics.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, metrics=None, host="127.0.0.1"):
+    """
+    Serve the metrics over HTTP from a background thread (once per process).
+    """
+
+    global _server
+    with _server_lock:
+        if _server is None:
+            from http.server import ThreadingHTTPServer
+
+            try:
+                _server = ThreadingHTTPServer((host, port), _handler_class(metrics or get_metrics()))
+            except OSError as e:
+                logger.warning("Metrics endpoint not started: %s", e)
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+            logger.info("Metrics on http://%s:%d/metrics", host, port)
+        return _server
@@ -0,0 +1,85 @@
+"""
+Benchmark of the instrumentation (instrumentation.py): the cost of a timer and of an
+instrumented handler call, and where the time of "Set Parameters" and "Flag this
+configuration" goes, from the event to the files on disk, in the Wall Follow app run
+in-process (events are called directly, so there is no queue.* wait).
+
+Usage:
+    python instrumentation_benchmark.py [--flags 200]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import timeit
+
+
+def per_call_ns(fn, number=200000):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flags", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The app reads its paths from the environment on import.
+        os.environ.update(
+            ROBORACER_WS=os.path.join(directory, "ws"),
+            ROBORACER_FLAG_HISTORY=os.path.join(directory, "flag_history.sqlite3"),
+            ROBORACER_TELEMETRY_DB=os.path.join(directory, "telemetry.sqlite3"),
+            ROBORACER_TELEMETRY="127.0.0.1:0",
+        )
+        os.chdir(directory)
+
+        from gradio.state_holder import SessionState
+
+        import param_ui
+        from flagging import config_dirs
+        from instrumentation import Metrics, get_metrics, instrument_handler
+        from param_schema import load_schema
+        from param_writer import default_writer
+
+        metrics = Metrics()
+        timer = metrics.timer
+        plain = lambda: None  # noqa: E731
+        instrumented = instrument_handler(plain, "noop", metrics)
+
+        def timed_block():
+            with timer("block"):
+                pass
+
+        print(f"timer: {per_call_ns(timed_block):.0f} ns per timed block; handler call {per_call_ns(plain):.0f} ns plain, "
+              f"{per_call_ns(instrumented):.0f} ns instrumented")
+
+        schema = load_schema("wall_follow")
+        for config_dir in config_dirs(schema.name):
+            os.makedirs(config_dir, exist_ok=True)
+        demo = param_ui.build_demo(schema)
+        get_metrics().reset()
+        state = SessionState(demo)
+        events = {fn.api_name: fn for fn in demo.fns.values()}
+        values = param_ui.example_row(schema, schema.defaults())
+
+        async def run():
+            for i in range(args.flags):
+                result = await demo.process_api(block_fn=events[f"{schema.name}_set_params"], inputs=values, state=state)
+                params = result["data"][-1]
+                await demo.process_api(block_fn=events[f"{schema.name}_flag"], inputs=[params, "Latest", f"flag {i}"], state=state)
+
+        asyncio.run(run())
+        default_writer.flush()
+
+        print(f"\n{args.flags} x Set Parameters + Flag this configuration:")
+        print(f"{'timer':42s} {'count':>6s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+        for name, stats in get_metrics().snapshot().items():
+            if "p50" in stats:
+                print(f"{name:42s} {stats['count']:6d} {stats['p50']:8.3f} {stats['p95']:8.3f} {stats['p99']:8.3f}")
+            else:
+                print(f"{name:42s} {stats['count']:6d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Simulated lap: a local stand-in for running the car, used to score parameter sets.
+
+A kinematic bicycle drives one lap of a closed test track (straights, hairpins and a
+chicane) in Frenet coordinates, steered by a simplified model of each controller:
+
+    wall_follow   PID on the lateral error projected lookahead_dist ahead
+    gap_follow    steers at the free gap max_actionable_dist ahead; a small
+                  disparity_extender cuts corners, a large window_half_size lags
+    pure_pursuit  pure pursuit on the centerline, speed reduced by kv in turns
+
+The lap fails when the car leaves the track or exceeds the grip limit. This is not a
+physics model of the car, only a cheap, deterministic signal for sweeps and tuners.
+"""
+
+import math
+
+WHEELBASE = 0.33
+MAX_STEER = 0.42
+MAX_SPEED = 10.0
+TRACK_HALF_WIDTH = 0.9
+MAX_LATERAL_ACCEL = 9.0
+DT = 0.02
+LAP_TIME_LIMIT = 120.0
+
+# (length in m, curvature in 1/m)
+TRACK = [
+    (15.0, 0.0),
+    (math.pi * 3.0, 1 / 3.0),
+    (8.0, 0.0),
+    (math.pi / 2 * 2.0, -1 / 2.0),
+    (math.pi / 2 * 2.0, 1 / 2.0),
+    (10.0, 0.0),
+    (math.pi * 3.0, 1 / 3.0),
+]
+TRACK_LENGTH = sum(length for length, _ in TRACK)
+
+
+def curvature_at(s):
+    s %= TRACK_LENGTH
+    for length, curvature in TRACK:
+        if s < length:
+            return curvature
+        s -= length
+    return TRACK[-1][1]
+
+
+def _scheduled_speed(steer):
+    # Speed schedule of the nodes when throttle is not set manually.
+    angle = abs(steer)
+    if angle < math.radians(10):
+        return 0.6 * MAX_SPEED
+    if angle < math.radians(20):
+        return 0.4 * MAX_SPEED
+    return 0.2 * MAX_SPEED
+
+
+class _WallFollow:
+
+    def __init__(self, params):
+        self.throttle = params.get("throttle")
+        self.lookahead = params["lookahead_dist"]
+        self.kp, self.kd, self.ki = params["kp"], params["kd"], params["ki"]
+        self.integral = 0.0
+        self.previous = None
+
+    def control(self, e, psi, kappa):
+        error = e + self.lookahead * math.sin(psi)
+        derivative = 0.0 if self.previous is None else (error - self.previous) / DT
+        self.previous = error
+        self.integral += error * DT
+        steer = -(self.kp * error + self.kd * derivative + self.ki * self.integral)
+        return steer, None
+
+
+class _GapFollow:
+
+    def __init__(self, params):
+        self.throttle = params.get("throttle")
+        self.lookahead = max(0.3, params["max_actionable_dist"])
+        self.corner_cut = 1.0 - min(1.0, params["disparity_extender"] / 100.0)
+        self.smoothing = 1.0 / (1.0 + params["window_half_size"] / 20.0)
+        self.steer = 0.0
+
+    def control(self, e, psi, kappa):
+        target = self.corner_cut * kappa * self.lookahead ** 2
+        alpha = math.atan2(target - e, self.lookahead) - psi
+        desired = math.atan(2 * WHEELBASE * math.sin(alpha) / self.lookahead)
+        self.steer += self.smoothing * (desired - self.steer)
+        return self.steer, None
+
+
+class _PurePursuit:
+
+    def __init__(self, params):
+        self.throttle = params["throttle"]
+        self.lookahead = max(0.3, params["lookahead_distance"])
+        self.kp, self.kv = params["kp"], params["kv"]
+
+    def control(self, e, psi, kappa):
+        # Centerline point lookahead ahead, in the car frame (second order in kappa)
+        alpha = math.atan2(kappa * self.lookahead ** 2 / 2 - e, self.lookahead) - psi
+        curvature = self.kp * 2 * math.sin(alpha) / self.lookahead
+        speed = self.throttle * MAX_SPEED / (1 + self.kv * abs(curvature))
+        return math.atan(WHEELBASE * curvature), speed
+
+
+CONTROLLERS = {"wall_follow": _WallFollow, "gap_follow": _GapFollow, "pure_pursuit": _PurePursuit}
+
+
+def simulate_lap(controller, params, on_step=None, gains=None):
+    """
+    Drive one lap and return metrics: lap_time (None if the lap failed), completed,
+    progress (fraction of the lap), max_error and score (lower is better).
+    on_step(t, s, e, speed, steer) is called after every step, e.g. to stream telemetry.
+    gains (a gain_schedule.GainTable or GainSchedule) sets the scheduled gains on every
+    step from the speed and the track curvature.
+    """
+
+    model = CONTROLLERS[controller](params)
+    s = e = psi = 0.0
+    t = max_error = speed = 0.0
+    failure = None
+
+    while s < TRACK_LENGTH:
+        if t >= LAP_TIME_LIMIT:
+            failure = "timeout"
+            break
+        kappa = curvature_at(s)
+        if gains is not None:
+            # Scheduled on the speed of the previous step, as the node would.
+            for name, value in zip(gains.names, gains.lookup(speed, kappa)):
+                setattr(model, name, value)
+        steer, speed = model.control(e, psi, kappa)
+        steer = max(-MAX_STEER, min(MAX_STEER, steer))
+        if speed is None:
+            speed = _scheduled_speed(steer) if model.throttle is None else model.throttle * MAX_SPEED
+
+        if speed <= 0:
+            failure = "stalled"
+            break
+        if speed * speed * abs(math.tan(steer)) / WHEELBASE > MAX_LATERAL_ACCEL:
+            failure = "lost grip"
+            break
+
+        ds = speed * math.cos(psi) / (1 - kappa * e)
+        s += ds * DT
+        e += speed * math.sin(psi) * DT
+        psi += (speed * math.tan(steer) / WHEELBASE - kappa * ds) * DT
+        t += DT
+        if on_step is not None:
+            on_step(t, s, e, speed, steer)
+
+        max_error = max(max_error, abs(e))
+        if abs(e) > TRACK_HALF_WIDTH:
+            failure = "off track"
+            break
+
+    progress = min(1.0, s / TRACK_LENGTH)
+    completed = failure is None
+    return {
+        "lap_time": round(t, 3) if completed else None,
+        "completed": completed,
+        "failure": failure,
+        "progress": round(progress, 4),
+        "max_error": round(max_error, 4),
+        # Failed laps rank behind every completed lap, further laps first.
+        "score": round(t if completed else LAP_TIME_LIMIT * (2 - progress), 3),
+    }
+
+
+class SimulatedLapEvaluator:
+    """
+    Evaluator for param_sweep: evaluator(controller, params) -> metrics with a "score".
+    """
+
+    def __call__(self, controller, params):
+        return simulate_lap(controller, params)
@@ -0,0 +1,101 @@
+"""
+Rate limited, coalescing forwarder for live slider updates.
+
+In live mode every Slider.change event of the tuning UI lands here instead of going
+through the "Set Parameters" round trip. Updates are coalesced per parameter: only the
+latest value of each parameter is kept, and the current parameter set is sent at most
+max_rate_hz times per second. Values superseded before a send are dropped.
+
+The first change after an idle period is sent immediately, so a single slider click
+does not wait for the rate limit.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RATE_HZ = float(os.environ.get("ROBORACER_LIVE_RATE_HZ", 20))
+
+
+class Coalescer:
+    """
+    Calls sink(params) with the full, current parameter set whenever something changed,
+    at most max_rate_hz times per second, from a background thread.
+    """
+
+    def __init__(self, sink, max_rate_hz=DEFAULT_MAX_RATE_HZ, initial=None):
+        if max_rate_hz <= 0:
+            raise ValueError("max_rate_hz must be positive")
+        self.sink = sink
+        self.interval = 1.0 / max_rate_hz
+        self.sent = 0
+        self.dropped = 0
+        self._state = dict(initial or {})
+        self._pending = {}
+        self._last_sent = float("-inf")
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+
+    @property
+    def params(self):
+        """
+        The parameter set sent last, with the pending values applied.
+        """
+
+        with self._cond:
+            return dict(self._state, **self._pending)
+
+    def update(self, name, value):
+        self.update_many({name: value})
+
+    def update_many(self, values):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Coalescer is closed")
+            self.dropped += sum(1 for name in values if name in self._pending)
+            self._pending.update(values)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-update", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def close(self, timeout=None):
+        """
+        Send whatever is still pending and stop the background thread.
+        """
+
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+
+                wait = self._last_sent + self.interval - time.monotonic()
+                if wait > 0 and not self._closed:
+                    self._cond.wait(wait)
+                    continue
+
+                self._state.update(self._pending)
+                self._pending = {}
+                params = dict(self._state)
+                self._last_sent = time.monotonic()
+                self.sent += 1
+
+            try:
+                self.sink(params)
+            except Exception:
+                # A failing sink must not stop live updates for the rest of the session.
+                logger.exception("Error sending live parameter update")
@@ -0,0 +1,86 @@
+"""
+Benchmark: one multi-controller server against the three per-controller scripts.
+
+Starts every server as its own process (from a scratch working directory, so the
+roboracer-ws paths are created there) and reports the cold start time until the server
+answers /config, and the resident memory once it does.
+
+Usage:
+    python multi_server_benchmark.py [--port 7900]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS = ["wall_follow_params_set.py", "gap_follow_params_set.py", "pure_pursuit_params_set.py"]
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def cold_start(script, port, cwd, timeout=120):
+    env = dict(
+        os.environ,
+        GRADIO_SERVER_PORT=str(port),
+        GRADIO_ANALYTICS_ENABLED="False",
+        PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    )
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, script)],
+        cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"{script} exited with {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/config", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start, rss_mb(process.pid)
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.05)
+        raise RuntimeError(f"{script} did not start within {timeout} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=7900)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.path.join(directory, "ui")
+        os.makedirs(cwd)
+
+        total_time = total_rss = 0.0
+        for offset, script in enumerate(SCRIPTS):
+            elapsed, rss = cold_start(script, args.port + offset, cwd)
+            total_time += elapsed
+            total_rss += rss
+            print(f"{script:<32} cold start {elapsed:6.2f} s   rss {rss:7.1f} MB")
+        print(f"{'three separate servers':<32} cold start {total_time:6.2f} s   rss {total_rss:7.1f} MB")
+
+        elapsed, rss = cold_start("roboracer_ui.py", args.port + len(SCRIPTS), cwd)
+        print(f"{'roboracer_ui.py (all tabs)':<32} cold start {elapsed:6.2f} s   rss {rss:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
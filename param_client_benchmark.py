@@ -0,0 +1,124 @@
+"""
+Load test of the tuning server's API through gradio_param_client.py.
+
+Launches roboracer_ui.py on a free port in a subprocess (with a temporary workspace and
+flag history), then for 1 to 64 concurrent clients (asyncio tasks sharing one
+AsyncParamClient connection pool) calls set_params in a loop and reports requests per
+second and p50 / p99 latency. Finally compares flagging a batch one call at a time with
+a single flag_many call.
+
+Usage:
+    python param_client_benchmark.py [--seconds 5] [--clients 1,2,4,8,16,32,64] [--batch 200]
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from gradio_param_client import AsyncParamClient
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(directory, port, **env_overrides):
+    env = dict(
+        os.environ,
+        **env_overrides,
+        ROBORACER_WS=os.path.join(directory, "ws"),
+        ROBORACER_FLAG_HISTORY=os.path.join(directory, "flag_history.sqlite3"),
+        GRADIO_ANALYTICS_ENABLED="False",
+    )
+    code = f"import roboracer_ui; roboracer_ui.build_demo().launch(server_port={port}, quiet=True)"
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, "-c", code], cwd=directory, env=dict(env, PYTHONPATH=script_dir),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/gradio_api/info", timeout=1).status_code == 200:
+                return server, url
+        except httpx.HTTPError:
+            pass
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("Server did not start")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def load(url, clients, seconds):
+    latencies = []
+    end = time.perf_counter() + seconds
+
+    async def worker(client, i):
+        n = 0
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            await client.set_params("pure_pursuit", throttle=0.2, kp=1.0, kv=1.0, lookahead_distance=round((i * 1000 + n) % 50 / 10, 1))
+            latencies.append(time.perf_counter() - start)
+            n += 1
+
+    async with AsyncParamClient(url, max_connections=clients) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client, i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, latencies
+
+
+async def batching(url, batch):
+    configs = [{"throttle": 0.2, "kp": 1.0, "kv": 1.0, "lookahead_distance": round(i % 50 / 10, 1)} for i in range(batch)]
+    async with AsyncParamClient(url, max_connections=16) as client:
+        start = time.perf_counter()
+        await client.pipeline([("pure_pursuit_flag_params", [params, "Other", "single"]) for params in configs])
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await client.flag_many("pure_pursuit", configs, "Other", "batch")
+        many = time.perf_counter() - start
+    return single, many
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--clients", default="1,2,4,8,16,32,64")
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        server, url = launch_server(directory, free_port())
+        try:
+            for clients in (int(value) for value in args.clients.split(",")):
+                rps, latencies = asyncio.run(load(url, clients, args.seconds))
+                print(
+                    f"{clients:3d} clients: {rps:7.1f} req/s, p50 {percentile(latencies, 0.5) * 1000:7.1f} ms, "
+                    f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+                )
+            single, many = asyncio.run(batching(url, args.batch))
+            print(f"flag {args.batch} configs: one call each (pipelined) {single * 1000:.0f} ms, flag_many {many * 1000:.0f} ms")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
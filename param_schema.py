@@ -0,0 +1,179 @@
+"""
+Declarative parameter schemas for the controllers.
+
+Each controller is described once in schemas/<controller>.json: its ros2 package and
+every parameter with name, label, type, range, step and default. The tuning UI
+(param_ui.py), validation, serialization and the flag / stream outputs are all generated
+from it, so adding a controller means adding a schema file.
+
+    {
+        "name": "wall_follow",
+        "title": "Wall Follow",
+        "package": "wall_follow_ui_control",
+        "params": [
+            {"name": "kp", "label": "Proportional Gain (Kp)", "type": "float",
+             "min": 0, "max": 10, "step": 0.1, "default": 0.8},
+            ...
+        ]
+    }
+
+An "optional" parameter can be switched off in the UI and is then stored as null, like
+the manual throttle of wall_follow and gap_follow. "info" is an optional help text.
+
+"panels" lists extra UI panels of the controller as "module:function" (for example the
+scan log preview of gap_follow); param_ui.py calls function(schema, inputs) after the
+common controls.
+
+"scheduled" lists the float gains that can be scheduled over speed and curvature (see
+gain_schedule.py), e.g. ["kp", "kd", "ki"] for wall_follow.
+"""
+
+import json
+import math
+import os
+from functools import lru_cache
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schemas")
+
+FLAG_REASONS = ["Latest", "Golden", "Unstable Control", "Too Slow", "Too Agressive", "Other"]
+
+TYPES = {"float": float, "int": int}
+
+
+class Param:
+
+    def __init__(self, name, label, type, min, max, step, default, optional=False, info=None):
+        if type not in TYPES:
+            raise ValueError(f"Unknown type {type!r} for parameter {name!r}")
+        if not min <= default <= max:
+            raise ValueError(f"Default of parameter {name!r} outside [{min}, {max}]")
+        self.name = name
+        self.label = label
+        self.type = type
+        self.min = min
+        self.max = max
+        self.step = step
+        self.default = TYPES[type](default)
+        self.optional = optional
+        self.info = info
+
+    def __repr__(self):
+        return f"Param({self.name!r}, {self.type}, [{self.min}, {self.max}])"
+
+
+class ControllerSchema:
+
+    def __init__(self, name, title, package, params, description=(), examples=(), order=100, params_file=None, panels=(), scheduled=()):
+        self.name = name
+        self.title = title
+        self.package = package
+        self.params = [param if isinstance(param, Param) else Param(**param) for param in params]
+        self.description = list(description)
+        self.examples = list(examples)
+        self.order = order
+        self.params_file = params_file or f"{name}_params.json"
+        self.panels = list(panels)
+        self.names = [param.name for param in self.params]
+        self.scheduled = list(scheduled)
+        types = {param.name: param.type for param in self.params}
+        for name in self.scheduled:
+            if types.get(name) != "float":
+                raise ValueError(f"Scheduled gain {name!r} is not a float parameter of {self.name}")
+        self._validators = [self._compile(param) for param in self.params]
+        self._validator_of = dict(self._validators)
+
+    def __repr__(self):
+        return f"ControllerSchema({self.name!r}, {self.names})"
+
+    @staticmethod
+    def _compile(param):
+        # Resolved once per schema instead of on every request.
+        name, minimum, maximum, optional = param.name, param.min, param.max, param.optional
+        is_int = param.type == "int"
+
+        def validate(value):
+            if value is None or value == "":
+                if optional:
+                    return None
+                raise ValueError(f"{name} is required")
+            if isinstance(value, bool):
+                raise ValueError(f"{name} must be a number, got {value!r}")
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"{name} must be a number, got {value!r}") from None
+            if math.isnan(number) or not minimum <= number <= maximum:
+                raise ValueError(f"{name} must be between {minimum} and {maximum}, got {value!r}")
+            if is_int:
+                if number != int(number):
+                    raise ValueError(f"{name} must be an integer, got {value!r}")
+                return int(number)
+            return number
+
+        return name, validate
+
+    def defaults(self):
+        return {param.name: param.default for param in self.params}
+
+    def validate(self, values):
+        """
+        Return the typed params dict, in schema order, for values (a dict).
+        Raises ValueError on missing, unknown or out of range parameters.
+        """
+
+        unknown = set(values) - set(self.names)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {self.name}: {', '.join(sorted(unknown))}")
+        params = {}
+        for name, validate in self._validators:
+            params[name] = validate(values.get(name))
+        return params
+
+    def validate_param(self, name, value):
+        """
+        The typed value of a single parameter. Raises ValueError like validate().
+        """
+
+        if name not in self._validator_of:
+            raise ValueError(f"Unknown parameter for {self.name}: {name}")
+        return self._validator_of[name](value)
+
+    def dumps(self, params, indent=None):
+        """
+        Serialize params (plus any extra keys such as flag_reason) to JSON.
+        """
+
+        if indent is None:
+            return json.dumps(params, separators=(",", ":"))
+        return json.dumps(params, indent=indent)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@lru_cache(maxsize=None)
+def load_schema(name):
+    """
+    Load schemas/<name>.json.
+    """
+
+    path = os.path.join(SCHEMA_DIR, f"{name}.json")
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise KeyError(f"No parameter schema for controller {name!r} in {SCHEMA_DIR}") from None
+    schema = ControllerSchema.from_dict(data)
+    if schema.name != name:
+        raise ValueError(f"{path} declares controller {schema.name!r}")
+    return schema
+
+
+def list_schemas():
+    """
+    All controller schemas, in UI order.
+    """
+
+    names = [entry[:-len(".json")] for entry in os.listdir(SCHEMA_DIR) if entry.endswith(".json")]
+    return sorted((load_schema(name) for name in names), key=lambda schema: (schema.order, schema.name))
@@ -0,0 +1,69 @@
+"""
+Benchmark of the binary parameter snapshots (param_snapshot.py) against the JSON files
+written today (json.dumps(..., indent=4)), for the default params of every controller:
+bytes on disk, encode time, decode time from memory (decoding includes validation for
+JSON, the checks of the header and crc for snapshots), and a reload from the file as a
+node does it (open + read + parse for JSON, a mapped SnapshotReader for snapshots).
+
+Usage:
+    python param_snapshot_benchmark.py [--number 20000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import timeit
+
+from param_schema import load_schema
+from param_snapshot import SnapshotReader, get_format
+from param_writer import write_atomic
+
+
+def per_call_us(fn, number):
+    return min(timeit.repeat(fn, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'':13s} {'bytes':>11s} {'encode us':>13s} {'decode us':>13s} {'file reload us':>15s}")
+    with tempfile.TemporaryDirectory() as directory:
+        for controller in ("wall_follow", "gap_follow", "pure_pursuit"):
+            schema = load_schema(controller)
+            snapshot = get_format(controller)
+            params = schema.defaults()
+            flagged_data = dict(params, flag_reason="Latest", flag_msg="")
+
+            text = json.dumps(flagged_data, indent=4).encode()
+            binary = snapshot.encode(params)
+            json_path = os.path.join(directory, f"{controller}_params.json")
+            bin_path = os.path.join(directory, f"{controller}_params.bin")
+            write_atomic(json_path, text)
+            write_atomic(bin_path, binary)
+
+            def json_decode():
+                data = json.loads(text)
+                schema.validate({key: value for key, value in data.items() if key in schema.names})
+
+            def json_reload():
+                with open(json_path, "rb") as f:
+                    data = json.loads(f.read())
+                schema.validate({key: value for key, value in data.items() if key in schema.names})
+
+            reader = SnapshotReader(bin_path, controller)
+            results = [
+                (len(text), len(binary)),
+                (per_call_us(lambda: json.dumps(flagged_data, indent=4).encode(), args.number), per_call_us(lambda: snapshot.encode(params), args.number)),
+                (per_call_us(json_decode, args.number), per_call_us(lambda: snapshot.decode(binary), args.number)),
+                (per_call_us(json_reload, args.number), per_call_us(reader.read, args.number)),
+            ]
+            reader.close()
+            print(f"{controller:13s} " + " ".join(f"{j:>6g} / {b:<6g}" if isinstance(j, int) else f"{j:5.2f} / {b:5.2f}  " for j, b in results))
+    print("(JSON / snapshot)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Live parameter stream from the tuning UI to the running controller nodes.
+
+The JSON files written by flag_configuration only reach a node when it re-reads them.
+This module pushes the same parameters over a local UDP socket as soon as they are set,
+so a subscriber on the car receives them within milliseconds.
+
+Every datagram is a fixed header followed by a JSON body:
+
+    magic (4s) | protocol version (B) | session (I) | sequence (Q) | sent_at (d)
+    {"controller": "wall_follow", "params": {...}}
+
+The sequence number is the version of the parameters and grows with every message of a
+publisher session. Subscribers drop messages older than the newest one they have
+applied, so a reordered or duplicated datagram never rolls a parameter back.
+
+Run `python param_stream.py` to start a stand-in subscriber which prints every update.
+"""
+
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+
+from instrumentation import get_metrics
+
+MAGIC = b"RRPS"
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("!4sBIQd")
+MAX_DATAGRAM = 65507
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47860
+
+ParamMessage = namedtuple("ParamMessage", ["controller", "params", "session", "sequence", "sent_at", "received_at"])
+
+
+def default_address():
+    """
+    Subscriber address from ROBORACER_PARAM_STREAM ("host:port"), or the local default.
+    """
+
+    value = os.environ.get("ROBORACER_PARAM_STREAM")
+    if not value:
+        return (DEFAULT_HOST, DEFAULT_PORT)
+    host, _, port = value.rpartition(":")
+    return (host or DEFAULT_HOST, int(port))
+
+
+def encode_message(controller, params, session, sequence, sent_at=None):
+    if sent_at is None:
+        sent_at = time.time()
+    body = json.dumps({"controller": controller, "params": params}, separators=(",", ":")).encode("utf-8")
+    datagram = HEADER.pack(MAGIC, PROTOCOL_VERSION, session, sequence, sent_at) + body
+    if len(datagram) > MAX_DATAGRAM:
+        raise ValueError(f"Parameter message too large ({len(datagram)} bytes)")
+    return datagram
+
+
+def decode_message(datagram, received_at=None):
+    """
+    Decode a datagram into a ParamMessage. Raises ValueError on foreign or newer protocol data.
+    """
+
+    if len(datagram) < HEADER.size:
+        raise ValueError("Datagram shorter than the message header")
+    magic, version, session, sequence, sent_at = HEADER.unpack_from(datagram)
+    if magic != MAGIC:
+        raise ValueError("Not a parameter stream message")
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported parameter stream version {version}")
+    body = json.loads(datagram[HEADER.size:])
+    if received_at is None:
+        received_at = time.time()
+    return ParamMessage(body["controller"], body["params"], session, sequence, sent_at, received_at)
+
+
+class ParamPublisher:
+    """
+    Fire-and-forget UDP publisher. publish() never blocks on the subscriber.
+    """
+
+    def __init__(self, addresses=None):
+        self.addresses = list(addresses) if addresses else [default_address()]
+        self.session = random.getrandbits(32)
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+
+    @get_metrics().timed("io.stream_publish")
+    def publish(self, controller, params):
+        """
+        Send params to every subscriber address and return the sequence number used.
+        """
+
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        datagram = encode_message(controller, params, self.session, sequence)
+        for address in self.addresses:
+            try:
+                self._sock.sendto(datagram, address)
+            except OSError:
+                # No subscriber or a full socket buffer must never break the UI.
+                pass
+        return sequence
+
+    def close(self):
+        self._sock.close()
+
+
+class ParamSubscriber:
+    """
+    Stand-in for the subscriber side of a controller node.
+
+    receive() returns the next message that is newer than the last one applied for its
+    controller, or None on timeout.
+    """
+
+    def __init__(self, host=None, port=None):
+        default_host, default_port = default_address()
+        self.address = (host or default_host, default_port if port is None else port)
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(self.address)
+        self.address = self._sock.getsockname()
+        self._latest = {}
+
+    def receive(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if deadline is None:
+                self._sock.settimeout(None)
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._sock.settimeout(remaining)
+            try:
+                datagram = self._sock.recv(MAX_DATAGRAM)
+            except socket.timeout:
+                return None
+            try:
+                message = decode_message(datagram)
+            except ValueError:
+                continue
+
+            session, sequence = self._latest.get(message.controller, (None, 0))
+            if session == message.session and message.sequence <= sequence:
+                continue
+            self._latest[message.controller] = (message.session, message.sequence)
+            return message
+
+    def serve(self, callback, stop_event=None):
+        """
+        Call callback(message) for every accepted message until stop_event is set.
+        """
+
+        while stop_event is None or not stop_event.is_set():
+            message = self.receive(timeout=0.2)
+            if message is not None:
+                callback(message)
+
+    def close(self):
+        self._sock.close()
+
+
+_default_publisher = None
+
+
+def get_publisher():
+    global _default_publisher
+    if _default_publisher is None:
+        _default_publisher = ParamPublisher()
+    return _default_publisher
+
+
+if __name__ == "__main__":
+    subscriber = ParamSubscriber()
+    print(f"Listening for parameters on {subscriber.address[0]}:{subscriber.address[1]}")
+
+    def print_message(message):
+        latency_ms = (message.received_at - message.sent_at) * 1000
+        print(f"[{message.controller} v{message.sequence}] {json.dumps(message.params)} ({latency_ms:.2f} ms)")
+
+    try:
+        subscriber.serve(print_message)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,117 @@
+"""
+Benchmark: latency from "Set Parameters" to the parameters reaching a node.
+
+Compares the UDP parameter stream (param_stream.py) with the current file path, where
+flag_configuration writes *_params.json and the node notices the change by re-reading
+the file on a timer.
+
+Usage:
+    python param_stream_benchmark.py [--iterations 200] [--poll-hz 10]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from param_stream import ParamPublisher, ParamSubscriber
+from param_writer import ParamWriter
+
+PARAMS = {"throttle": 0.1, "lookahead_dist": 0.8, "kp": 0.8, "kd": 0.0, "ki": 0.0}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name, latencies):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    print(
+        f"{name:<28} n={len(latencies_ms):<5} "
+        f"mean={statistics.mean(latencies_ms):8.3f} ms  "
+        f"p50={percentile(latencies_ms, 50):8.3f} ms  "
+        f"p99={percentile(latencies_ms, 99):8.3f} ms"
+    )
+
+
+def bench_stream(iterations):
+    subscriber = ParamSubscriber(host="127.0.0.1", port=0)
+    publisher = ParamPublisher([subscriber.address])
+    latencies = []
+    try:
+        for i in range(iterations):
+            params = dict(PARAMS, kp=i)
+            start = time.perf_counter()
+            publisher.publish("wall_follow", params)
+            message = subscriber.receive(timeout=1.0)
+            if message is not None:
+                latencies.append(time.perf_counter() - start)
+    finally:
+        publisher.close()
+        subscriber.close()
+    return latencies
+
+
+def bench_file_poll(iterations, poll_hz):
+    """
+    Write through ParamWriter and detect the change like a node polling the file at poll_hz.
+    """
+
+    writer = ParamWriter()
+    received = {}
+    stop = threading.Event()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "wall_follow_params.json")
+        writer.submit([path], dict(PARAMS, kp=-1)).result()
+
+        def poll():
+            last = None
+            while not stop.is_set():
+                with open(path, "rb") as f:
+                    content = f.read()
+                if content != last:
+                    last = content
+                    received[json.loads(content)["kp"]] = time.perf_counter()
+                stop.wait(1.0 / poll_hz)
+
+        poller = threading.Thread(target=poll, daemon=True)
+        poller.start()
+        time.sleep(0.1)
+
+        latencies = []
+        for i in range(iterations):
+            # Clicks are not aligned with the node's timer.
+            time.sleep(random.uniform(0, 1.0 / poll_hz))
+            start = time.perf_counter()
+            writer.submit([path], dict(PARAMS, kp=i))
+            deadline = start + 2.0
+            while i not in received and time.perf_counter() < deadline:
+                time.sleep(0.0005)
+            if i in received:
+                latencies.append(received[i] - start)
+
+        stop.set()
+        poller.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--poll-hz", type=float, default=10.0, help="Rate at which the node re-reads the JSON file")
+    args = parser.parse_args()
+
+    report("udp stream", bench_stream(args.iterations))
+    # The polling path is bounded by the poll period, a few dozen samples are enough.
+    report(f"json file @ {args.poll_hz:g} Hz poll", bench_file_poll(min(args.iterations, 50), args.poll_hz))
+
+
+if __name__ == "__main__":
+    main()
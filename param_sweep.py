@@ -0,0 +1,231 @@
+"""
+Headless parameter sweeps over a controller's schema.
+
+Configurations are generated lazily (grid or random search over the schema ranges, or
+narrower ranges given per parameter), scored by a pluggable evaluator on a process pool
+and streamed into the flag history as they complete, with their metrics and the
+flag_reason "Sweep".
+
+An evaluator is any picklable callable evaluator(controller, params) returning a metrics
+dict with a "score" (lower is better). lap_sim.SimulatedLapEvaluator is the local
+stand-in for running the car.
+
+    python param_sweep.py pure_pursuit --grid kp=0.5:3:0.25 --grid kv=0:2:0.5 --random 2000
+"""
+
+import argparse
+import importlib
+import itertools
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from flag_history import SWEEP_REASON, get_history
+from lap_sim import SimulatedLapEvaluator
+from param_schema import load_schema
+
+
+def frange(start, stop, step):
+    """
+    Values from start to stop (inclusive, within rounding) in steps of step.
+    """
+
+    count = int((stop - start) / step + 1e-9) + 1
+    return [round(start + i * step, 10) for i in range(max(count, 0))]
+
+
+def parse_range(text):
+    """
+    Parse "name=start:stop:step" or "name=v1,v2,v3" into (name, values or (start, stop, step)).
+    """
+
+    name, _, spec = text.partition("=")
+    try:
+        if not spec:
+            raise ValueError
+        if ":" in spec:
+            start, stop, step = (float(part) for part in spec.split(":"))
+            return name, (start, stop, step)
+        return name, [float(value) for value in spec.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid range {text!r}, expected name=start:stop:step or name=v1,v2") from None
+
+
+def check_ranges(schema, ranges):
+    """
+    Raise ValueError unless every range of ranges names a parameter of schema and stays
+    within its bounds, so a sweep fails before it starts rather than partway through.
+    """
+
+    for name, spec in ranges.items():
+        if name not in schema.names:
+            raise ValueError(f"Unknown parameter for {schema.name}: {name}")
+        if isinstance(spec, tuple):
+            start, stop, step = spec
+            if step <= 0 or stop < start:
+                raise ValueError(f"Invalid range of {name}: {start}:{stop}:{step}")
+            values = frange(start, stop, step)
+        else:
+            values = spec
+        for value in values:
+            try:
+                schema.validate_param(name, value)
+            except ValueError as e:
+                raise ValueError(f"Range of {name} outside the {schema.name} schema: {e}") from None
+
+
+def _values(param, spec):
+    if spec is None:
+        return param.min, param.max, param.step
+    if isinstance(spec, tuple):
+        return spec
+    return list(spec)
+
+
+def grid(schema, ranges):
+    """
+    Lazily yield every combination of the values in ranges ({name: (start, stop, step) or
+    [values]}); parameters without a range keep their default.
+    """
+
+    names = [name for name in schema.names if name in ranges]
+    axes = []
+    for name in names:
+        spec = _values(schema.params[schema.names.index(name)], ranges[name])
+        axes.append(frange(*spec) if isinstance(spec, tuple) else spec)
+
+    defaults = schema.defaults()
+    for combination in itertools.product(*axes):
+        params = dict(defaults)
+        params.update(zip(names, combination))
+        yield schema.validate(params)
+
+
+def random_search(schema, ranges=None, count=1000, seed=None):
+    """
+    Lazily yield count random configurations, uniform over ranges (or the full schema
+    range of every parameter when ranges is None), snapped to the parameter step.
+    """
+
+    rng = random.Random(seed)
+    ranges = ranges or {name: None for name in schema.names}
+    defaults = schema.defaults()
+    for _ in range(count):
+        params = dict(defaults)
+        for param in schema.params:
+            if param.name not in ranges:
+                continue
+            spec = _values(param, ranges[param.name])
+            if isinstance(spec, list):
+                params[param.name] = rng.choice(spec)
+                continue
+            start, stop, step = spec
+            steps = int(round((stop - start) / step))
+            params[param.name] = min(stop, round(start + rng.randint(0, steps) * step, 10))
+        yield schema.validate(params)
+
+
+def _evaluate_chunk(evaluator, controller, chunk):
+    return [(params, evaluator(controller, params)) for params in chunk]
+
+
+def run_sweep(controller, configs, evaluator=None, workers=None, chunk_size=32, history=None, record=True, sweep_id=None):
+    """
+    Evaluate configs (any iterable, consumed lazily) and yield (params, metrics) as they
+    complete. At most two chunks per worker are in flight, so generators of any size run
+    in bounded memory. With record, every completed chunk is appended to the flag history
+    in one transaction.
+    """
+
+    evaluator = evaluator or SimulatedLapEvaluator()
+    workers = workers or os.cpu_count() or 1
+    if record:
+        history = history or get_history()
+    sweep_id = sweep_id or time.strftime("%Y%m%d-%H%M%S")
+    configs = iter(configs)
+
+    def record_chunk(results):
+        if record:
+            history.append_many(
+                [(controller, params, SWEEP_REASON, f"sweep {sweep_id}", None) for params, _ in results],
+                metrics=[metrics for _, metrics in results],
+            )
+
+    if workers == 1:
+        while True:
+            chunk = list(itertools.islice(configs, chunk_size))
+            if not chunk:
+                return
+            results = _evaluate_chunk(evaluator, controller, chunk)
+            record_chunk(results)
+            yield from results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < 2 * workers:
+                chunk = list(itertools.islice(configs, chunk_size))
+                if not chunk:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(_evaluate_chunk, evaluator, controller, chunk))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                record_chunk(results)
+                yield from results
+
+
+def load_evaluator(spec):
+    """
+    Instantiate an evaluator from "module:attribute"; classes are instantiated.
+    """
+
+    module_name, _, attribute = spec.partition(":")
+    evaluator = getattr(importlib.import_module(module_name), attribute)
+    return evaluator() if isinstance(evaluator, type) else evaluator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a headless parameter sweep.")
+    parser.add_argument("controller")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=START:STOP:STEP",
+                        help="Range of a parameter (or NAME=V1,V2,...); repeat per parameter")
+    parser.add_argument("--random", type=int, metavar="N", help="Sample N random configurations within the ranges instead of the full grid")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--evaluator", default="lap_sim:SimulatedLapEvaluator", help="module:attribute of the evaluator")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--no-history", action="store_true", help="Do not record the results in the flag history")
+    args = parser.parse_args()
+
+    schema = load_schema(args.controller)
+    try:
+        ranges = dict(parse_range(text) for text in args.grid)
+        check_ranges(schema, ranges)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.random:
+        configs = random_search(schema, ranges or None, args.random, args.seed)
+    else:
+        configs = grid(schema, ranges)
+
+    start = time.perf_counter()
+    results = []
+    for params, metrics in run_sweep(args.controller, configs, load_evaluator(args.evaluator), args.workers,
+                                     args.chunk_size, record=not args.no_history):
+        results.append((metrics["score"], params, metrics))
+    elapsed = time.perf_counter() - start
+
+    print(f"Evaluated {len(results)} configurations in {elapsed:.1f} s ({len(results) / elapsed * 60:.0f} per minute)")
+    for score, params, metrics in sorted(results, key=lambda result: result[0])[:args.top]:
+        print(f"score {score:8.3f}  {params}  {metrics}")
+
+
+if __name__ == "__main__":
+    main()
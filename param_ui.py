@@ -0,0 +1,781 @@
+"""
+Tuning UI generated from a controller's parameter schema (see param_schema.py).
+
+build_controller_ui() lays out the same page the per-controller scripts used to build by
+hand: a slider per parameter (with a "Set ..." checkbox for optional parameters), live
+mode, "Set Parameters", flagging and examples, plus a preview plot of the current
+sliders against the examples, simulated offline by controller_sim.py.
+
+"Set Parameters" validates the slider values once and keeps the typed params in a
+gr.State, which "Flag this configuration" then flags as is.
+
+The flag history panel picks a past flag of the controller (or the latest "Golden" one,
+see flag_cache.py), shows how it differs from the sliders, loads it into the sliders or
+rolls back to it.
+
+The auto-tune panel proposes the next configurations to try from the flags (their
+metrics, reasons and lap times, see auto_tune.py) and fills them into the sliders.
+
+The fleet panel pushes the latest flag (or the sliders) to every car of the fleet
+registry at once and shows the ack of every car (see fleet.py).
+
+The lap performance panel ranks the flagged configurations by the telemetry the car
+streamed while they were active (see telemetry.py; the UI ingests it in the background).
+
+build_api() adds session-free endpoints taking params dicts, for scripts and
+gradio_param_client.py: <controller>_set, <controller>_flag_params,
+<controller>_flag_many and <controller>_latest.
+
+Every event and the I/O it triggers is timed (see instrumentation.py); the latency panel
+at the bottom of the page and the "metrics" endpoint show the p50 / p95 / p99.
+
+Several operators can share one server. configure_queue() lets ROBORACER_QUEUE_CONCURRENCY
+events run at once (Gradio's default is one per event). Events that write (flags) run in
+a per-controller concurrency group of one, so they queue behind each other without
+tying up workers; events that only read or publish have no limit and never wait on them.
+
+    python param_ui.py <controller>
+"""
+
+import collections
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+import gradio as gr
+import pandas as pd
+
+import controller_sim
+from auto_tune import AutoTuner
+from flag_cache import diff_params, get_cache
+from flag_history import HISTORY_PATH, get_history
+from fleet import APPLIED, get_fleet_publisher, get_registry
+from flagging import config_dirs, config_paths, flag, flag_many
+from instrumentation import get_metrics, instrument_demo
+from live_update import Coalescer
+from param_schema import FLAG_REASONS, load_schema
+from param_stream import get_publisher
+from param_writer import default_writer
+from telemetry import get_ingestor
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CONCURRENCY = int(os.environ.get("ROBORACER_QUEUE_CONCURRENCY", 16))
+
+# Recent flags listed in the flag history panel
+HISTORY_CHOICES = 25
+
+METRICS_COLUMNS = ["Timer", "Count", "Mean (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)"]
+
+# Proposals of a session counted as running trials
+MAX_PENDING = 32
+
+# Configurations listed in the lap performance panel
+PERFORMANCE_ROWS = 20
+PERFORMANCE_COLUMNS = ["Configuration", "Laps", "Best Lap (s)", "Mean Lap (s)", "Mean Speed (m/s)", "RMS Error (m)", "Max Error (m)", "Samples", "Record"]
+
+FLEET_COLUMNS = ["Car", "Address", "Status", "Attempts", "Ack (ms)", "Error"]
+FLEET_SOURCES = ["Latest flag", "Latest Golden flag", "Sliders"]
+
+# Live mode coalescers kept per (controller, session); the oldest is closed past this.
+MAX_LIVE_SESSIONS = 64
+
+_live_updates = collections.OrderedDict()
+_live_updates_lock = threading.Lock()
+
+
+def write_group(schema):
+    return {"concurrency_id": f"{schema.name}_write", "concurrency_limit": 1}
+
+
+# Events that do not write run without a concurrency limit.
+READ_ONLY = {"concurrency_limit": None}
+
+
+def configure_queue(demo, concurrency=None):
+    """
+    This function enables the queue of demo with the default concurrency of its events.
+    """
+
+    return demo.queue(default_concurrency_limit=concurrency or QUEUE_CONCURRENCY)
+
+
+def get_live_updates(schema, session=None, initial=None):
+    """
+    The live mode coalescer of a controller for one session (browser tab), so the
+    pending values of two operators never mix into one parameter set. A new one starts
+    from initial (default: the schema defaults).
+    """
+
+    key = (schema.name, session)
+    evicted = None
+    with _live_updates_lock:
+        if key in _live_updates:
+            _live_updates.move_to_end(key)
+        else:
+            _live_updates[key] = Coalescer(
+                lambda params: get_publisher().publish(schema.name, params),
+                initial=initial or schema.defaults(),
+            )
+            if len(_live_updates) > MAX_LIVE_SESSIONS:
+                _, evicted = _live_updates.popitem(last=False)
+        coalescer = _live_updates[key]
+    if evicted is not None:
+        evicted.close(timeout=0)
+    return coalescer
+
+
+def send_live_update(schema, session, values):
+    """
+    This function hands values to the live mode coalescer of the session.
+    """
+
+    coalescer = get_live_updates(schema, session)
+    try:
+        coalescer.update_many(values)
+    except RuntimeError:
+        # Evicted by other sessions after it was fetched: carry on in a new coalescer.
+        get_live_updates(schema, session, initial=coalescer.params).update_many(values)
+
+
+def collect_params(schema, values):
+    """
+    Map the flat list of UI values (a "Set" checkbox before every optional slider) to a
+    params dict.
+    """
+
+    params = {}
+    values = iter(values)
+    for param in schema.params:
+        enabled = next(values) if param.optional else True
+        value = next(values)
+        params[param.name] = value if enabled else None
+    return params
+
+
+def example_row(schema, example):
+    row = []
+    for param in schema.params:
+        value = example.get(param.name)
+        if param.optional:
+            row.append(value is not None)
+        row.append(param.default if value is None else value)
+    return row
+
+
+def preview_plot(schema, *values):
+    """
+    This function simulates the slider values and the examples offline in one batch and
+    returns the plot data of the preview.
+    """
+
+    try:
+        params = schema.validate(collect_params(schema, values))
+    except ValueError:
+        return gr.skip()
+
+    defaults = schema.defaults()
+    params_list = [params] + [dict(defaults, **example) for example in schema.examples]
+    labels = ["current"] + [f"example {i}" for i in range(1, len(schema.examples) + 1)]
+    return pd.DataFrame(controller_sim.preview(schema.name, params_list, labels))
+
+
+def set_params(schema, *values):
+    """
+    This function validates the slider values, pushes them to the running node and
+    returns them with their JSON for the flagging panel.
+    """
+
+    try:
+        params = schema.validate(collect_params(schema, values))
+    except ValueError as e:
+        raise gr.Error(str(e))
+
+    # Push the values to the running node right away (see param_stream.py)
+    get_publisher().publish(schema.name, params)
+
+    return params, schema.dumps(params, indent=4)
+
+
+def flag_configuration(schema, params, flag_reason, flag_msg):
+    """
+    This function flags the configuration set with "Set Parameters".
+    It appends the flagged data to the flag history and writes it to the JSON files read by the node.
+    """
+
+    if not params:
+        return 'Click "Set Parameters" before flagging a configuration.'
+
+    get_publisher().publish(schema.name, params)
+
+    filenamelatest, filename_ws = config_paths(schema.name)
+
+    # History append, then an atomic write on the background writer thread (see flagging.py)
+    errors = default_writer.pop_errors()
+    try:
+        record_id, _ = flag(schema.name, params, flag_reason, flag_msg)
+    except Exception as e:
+        return f"Error saving flagged data: {str(e)}"
+
+    result = f"Flagged data {record_id} saved to {HISTORY_PATH} and queued for saving to locations: \n{filenamelatest} \n{filename_ws}"
+    if errors:
+        result = f"Error saving previously flagged data: {'; '.join(errors)}\n" + result
+    return result
+
+
+def history_label(record):
+    label = f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.flagged_at))} {record.flag_reason}"
+    return f"{label} - {record.flag_msg}" if record.flag_msg else label
+
+
+def history_choices(schema, extra=None):
+    records = get_history().query(controller=schema.name, limit=HISTORY_CHOICES, simulated=False).records
+    if extra is not None and extra.record_id not in {record.record_id for record in records}:
+        records.append(extra)
+    return [(history_label(record), record.record_id) for record in records]
+
+
+def format_diff(diff):
+    if not diff:
+        return "Same as the sliders."
+    return "\n".join(f"{name}: {old} (flagged) -> {new} (sliders)" for name, (old, new) in diff.items())
+
+
+def build_history_panel(schema, inputs):
+    """
+    This function builds the flag history panel: pick a past flag, compare it with the sliders, load it or roll back to it.
+    """
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Flag History")
+            with gr.Row():
+                choice = gr.Dropdown(label="Flagged Configuration", choices=history_choices(schema), interactive=True, scale=3)
+                refresh_button = gr.Button("Refresh")
+                golden_button = gr.Button("Latest Golden")
+            diff_text = gr.TextArea(label="Difference", interactive=False, lines=3)
+            with gr.Row():
+                load_button = gr.Button("Load into sliders")
+                rollback_button = gr.Button("Roll back to this configuration", variant="stop")
+            rollback_result = gr.Textbox(label="Rollback Result")
+
+    def record_of(record_id):
+        record = get_cache().get(record_id) if record_id else None
+        if record is None:
+            raise gr.Error("Select a flagged configuration first.")
+        return record
+
+    def refresh():
+        return gr.Dropdown(choices=history_choices(schema), value=None)
+
+    def latest_golden():
+        record = get_cache().latest_golden(schema.name)
+        if record is None:
+            raise gr.Error(f"No Golden {schema.title} configuration flagged yet.")
+        return gr.Dropdown(choices=history_choices(schema, record), value=record.record_id)
+
+    def show_diff(record_id, *values):
+        if not record_id:
+            return ""
+        try:
+            current = schema.validate(collect_params(schema, values))
+        except ValueError as e:
+            return f"Invalid slider values: {e}"
+        return format_diff(diff_params(record_of(record_id).params, current))
+
+    def load(record_id):
+        return example_row(schema, record_of(record_id).params)
+
+    def rollback(record_id):
+        record = record_of(record_id)
+        errors = default_writer.pop_errors()
+        try:
+            new_record_id, _ = get_cache().rollback(record.record_id)
+        except Exception as e:
+            raise gr.Error(f"Error rolling back: {e}")
+        get_publisher().publish(schema.name, record.params)
+        result = f"Flagged {record.record_id} again as {new_record_id} and queued for saving to the workspace."
+        if errors:
+            result = f"Error saving previously flagged data: {'; '.join(errors)}\n" + result
+        return [result] + example_row(schema, record.params)
+
+    refresh_button.click(fn=refresh, outputs=choice, queue=False)
+    golden_button.click(fn=latest_golden, outputs=choice, queue=False)
+    for component in [choice] + inputs:
+        component.change(fn=show_diff, inputs=[choice] + inputs, outputs=diff_text, queue=False, show_progress="hidden", trigger_mode="always_last")
+    load_button.click(fn=load, inputs=choice, outputs=inputs, queue=False)
+    rollback_button.click(fn=rollback, inputs=choice, outputs=[rollback_result] + inputs, **write_group(schema))
+
+
+def performance_table(schema):
+    """
+    This function returns the ranking of the flagged configurations of the controller by lap performance.
+    """
+
+    ingestor = get_ingestor()
+    rows = []
+    for row in ingestor.store.rank(schema.name, PERFORMANCE_ROWS):
+        record = get_cache().get(row.record_id)
+        rows.append([
+            history_label(record) if record else row.record_id, row.laps, row.best_lap, row.mean_lap,
+            row.mean_speed, row.rms_cte, row.max_cte, row.samples, row.record_id,
+        ])
+    return pd.DataFrame(rows, columns=PERFORMANCE_COLUMNS).round(3)
+
+
+def build_performance_panel(schema, inputs):
+    """
+    This function builds the lap performance panel: flagged configurations ranked by the telemetry recorded while they were active.
+    """
+
+    # Start listening for telemetry with the UI, not on the first refresh.
+    get_ingestor()
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Lap Performance")
+            table = gr.Dataframe(value=lambda: performance_table(schema), headers=PERFORMANCE_COLUMNS, interactive=False, label="Best lap first")
+            with gr.Row():
+                refresh_button = gr.Button("Refresh")
+                load_button = gr.Button("Load best into sliders")
+
+    def load_best():
+        ranking = get_ingestor().store.rank(schema.name, 1)
+        record = get_cache().get(ranking[0].record_id) if ranking else None
+        if record is None:
+            raise gr.Error(f"No telemetry recorded for a flagged {schema.title} configuration yet.")
+        return example_row(schema, record.params)
+
+    refresh_button.click(fn=lambda: performance_table(schema), outputs=table, queue=False)
+    load_button.click(fn=load_best, outputs=inputs, queue=False)
+
+
+def fleet_table():
+    """
+    This function returns the cars of the fleet with the result of the latest push to each.
+    """
+
+    status = get_fleet_publisher().status
+    rows = []
+    for car in get_registry().cars():
+        result = status.get(car.name)
+        rows.append([car.name, f"{car.host}:{car.port}"] + (
+            [result.status, result.attempts, round(result.latency_ms, 1) if result.latency_ms is not None else "", result.error or ""]
+            if result else ["", "", "", ""]
+        ))
+    return pd.DataFrame(rows, columns=FLEET_COLUMNS)
+
+
+def build_fleet_panel(schema, inputs):
+    """
+    This function builds the fleet panel: push a configuration to every selected car at once and show their acks.
+    """
+
+    def car_names():
+        return [car.name for car in get_registry().cars()]
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Fleet")
+            table = gr.Dataframe(value=fleet_table, headers=FLEET_COLUMNS, interactive=False, label="Cars")
+            with gr.Row():
+                source = gr.Radio(label="Push", choices=FLEET_SOURCES, value=FLEET_SOURCES[0])
+                cars = gr.CheckboxGroup(label="To", choices=car_names(), value=car_names())
+            with gr.Row():
+                push_button = gr.Button("Push to Fleet", variant="primary")
+                refresh_button = gr.Button("Refresh")
+            push_result = gr.Textbox(label="Fleet Push", interactive=False)
+            with gr.Accordion("Add / Remove Car", open=False):
+                with gr.Row():
+                    car_name = gr.Textbox(label="Name")
+                    car_host = gr.Textbox(label="Host", value="127.0.0.1")
+                    car_port = gr.Number(label="Port", value=47870, precision=0)
+                with gr.Row():
+                    add_button = gr.Button("Add")
+                    remove_button = gr.Button("Remove")
+
+    async def push(source, names, *values):
+        if source == "Sliders":
+            try:
+                params = schema.validate(collect_params(schema, values))
+            except ValueError as e:
+                raise gr.Error(str(e))
+            reason, message, record_id, label = None, "", None, "the sliders"
+        else:
+            record = get_history().latest(schema.name, "Golden" if source == "Latest Golden flag" else None)
+            if record is None:
+                raise gr.Error(f"No {source.lower()} of {schema.title} to push.")
+            params, reason, message, record_id = record.params, record.flag_reason, record.flag_msg, record.record_id
+            label = history_label(record)
+        targets = [car for car in get_registry().cars() if car.name in (names or [])]
+        if not targets:
+            raise gr.Error("Select the cars to push to.")
+        results = await get_fleet_publisher().push(targets, schema.name, params, flag_reason=reason, flag_msg=message, record_id=record_id)
+        applied = sum(result.status == APPLIED for result in results)
+        return fleet_table(), f"{label}: applied on {applied} of {len(results)} cars."
+
+    def refresh():
+        return fleet_table(), gr.CheckboxGroup(choices=car_names())
+
+    def add(name, host, port):
+        if not name or not host:
+            raise gr.Error("A car needs a name and a host.")
+        get_registry().add(name.strip(), host.strip(), int(port))
+        return fleet_table(), gr.CheckboxGroup(choices=car_names(), value=car_names())
+
+    def remove(name):
+        if not get_registry().remove(name.strip()):
+            raise gr.Error(f"No car {name!r} in the fleet.")
+        return fleet_table(), gr.CheckboxGroup(choices=car_names(), value=car_names())
+
+    push_button.click(fn=push, inputs=[source, cars] + inputs, outputs=[table, push_result], **READ_ONLY)
+    refresh_button.click(fn=refresh, outputs=[table, cars], queue=False)
+    add_button.click(fn=add, inputs=[car_name, car_host, car_port], outputs=[table, cars], queue=False)
+    remove_button.click(fn=remove, inputs=car_name, outputs=[table, cars], queue=False)
+
+
+def trial_label(index, params):
+    return f"Trial {index + 1}: " + ", ".join(f"{name}={value}" for name, value in params.items())
+
+
+def build_tuning_panel(schema, inputs):
+    """
+    This function builds the auto-tune panel: propose a batch of configurations to try next and load them into the sliders.
+    """
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Auto-Tune")
+            with gr.Row():
+                batch_size = gr.Slider(label="Configurations to propose", minimum=1, maximum=8, step=1, value=1)
+                propose_button = gr.Button("Propose", variant="primary")
+            with gr.Row():
+                choice = gr.Dropdown(label="Proposed Configuration", choices=[], interactive=True, scale=3)
+                load_button = gr.Button("Load into sliders")
+            tune_info = gr.Textbox(label="Auto-Tune", interactive=False, info="Drive the proposal and flag it: the reason (or its metrics and lap times) feeds the next proposals.")
+    # Everything proposed in this session (running trials until flagged) and the last batch
+    proposals = gr.State([])
+    batch = gr.State([])
+
+    def propose(count, pending):
+        tuner = AutoTuner(schema)
+        observed = tuner.load_history(telemetry_store=get_ingestor().store)
+        for params in pending:
+            tuner.add_pending(params)
+        running = len(tuner.pending)
+        batch = tuner.propose(int(count))
+        info = f"Learned from {observed} flags, {running} earlier proposals not flagged yet."
+        choices = [(trial_label(i, params), i) for i, params in enumerate(batch)]
+        return [(pending + batch)[-MAX_PENDING:], batch, gr.Dropdown(choices=choices, value=0), info] + example_row(schema, batch[0])
+
+    def load_proposal(index, batch):
+        if index is None or index >= len(batch):
+            raise gr.Error("Propose configurations first.")
+        return example_row(schema, batch[index])
+
+    propose_button.click(fn=propose, inputs=[batch_size, proposals], outputs=[proposals, batch, choice, tune_info] + inputs, **READ_ONLY)
+    load_button.click(fn=load_proposal, inputs=[choice, batch], outputs=inputs, queue=False)
+
+
+def build_controller_ui(schema):
+    """
+    This function builds the controls of a controller inside the current gr.Blocks (or gr.Tab) context.
+    """
+
+    os.makedirs(config_dirs(schema.name)[0], exist_ok=True)
+
+    gr.Markdown(f"## Set {schema.title} Parameters")
+    for line in schema.description:
+        gr.Markdown(line)
+
+    sliders = {}
+    toggles = {}
+
+    def slider(param, **kwargs):
+        return gr.Slider(
+            minimum=param.min, maximum=param.max, step=param.step, label=param.label,
+            value=param.default, interactive=True, **kwargs
+        )
+
+    with gr.Row():
+        with gr.Column():
+            # Optional parameters, e.g. throttle control
+            for param in schema.params:
+                if not param.optional:
+                    continue
+                with gr.Row():
+                    with gr.Column():
+                        gr.Markdown(f"### {param.label} Control")
+                        toggles[param.name] = gr.Checkbox(label=f"Set {param.label}", value=True)
+
+                    with gr.Column():
+                        sliders[param.name] = slider(param)
+
+            # Controller Parameters
+            with gr.Row():
+                with gr.Column():
+                    gr.Markdown(f"### {schema.title} Parameters")
+                    for param in schema.params:
+                        if not param.optional:
+                            sliders[param.name] = slider(param)
+
+                    live_mode = gr.Checkbox(
+                        label="Live Mode", value=False,
+                        info="Stream slider changes to the car as you drag them. Every session streams its own sliders: "
+                             "with several operators in live mode on this controller, the car follows the last change."
+                    )
+                    submit_button = gr.Button("Set Parameters", variant="primary")
+
+            # Offline preview (see controller_sim.py)
+            preview = None
+            if schema.name in controller_sim.PREVIEWS:
+                kind, x_title, y_title = controller_sim.PREVIEWS[schema.name]
+                plot = gr.LinePlot if kind == "line" else gr.ScatterPlot
+                preview = plot(
+                    value=preview_plot(schema, *example_row(schema, schema.defaults())),
+                    x="x", y="y", color="config", x_title=x_title, y_title=y_title,
+                    label="Preview (simulated)"
+                )
+
+        with gr.Column():
+
+            gr.Markdown("### Flagging")
+
+            # Flagging
+
+            flagged_text = gr.TextArea(label="Flagging Configuration", interactive=False)
+
+            gr.Textbox(label="Flag History", value=HISTORY_PATH, interactive=False)
+            current_params = gr.State(None)
+
+            with gr.Row():
+                flag_reason = gr.Dropdown(
+                    choices=FLAG_REASONS,
+                    label="Flagging Reason",
+                    value="Latest",
+                    interactive=True
+                )
+                flag_msg = gr.Textbox(label="Flagging Message", placeholder="Optional Flagging Message.", interactive=True)
+
+            with gr.Row():
+                flag_button = gr.Button("Flag this configuration", variant="primary")
+
+            with gr.Row():
+                flag_result = gr.Textbox(label="Flagging Result")
+
+    # UI values in collect_params() order
+    inputs = []
+    for param in schema.params:
+        if param.optional:
+            inputs.append(toggles[param.name])
+        inputs.append(sliders[param.name])
+
+    build_history_panel(schema, inputs)
+    build_tuning_panel(schema, inputs)
+    build_performance_panel(schema, inputs)
+    build_fleet_panel(schema, inputs)
+
+    # Controller specific panels declared in the schema
+    for panel in schema.panels:
+        module_name, _, function = panel.partition(":")
+        getattr(importlib.import_module(module_name), function)(schema, inputs)
+
+    if schema.examples:
+        with gr.Row():
+            # Examples
+            gr.Examples(
+                examples=[example_row(schema, example) for example in schema.examples],
+                inputs=inputs,
+                outputs=list(sliders.values()),
+            )
+
+    steps = [f"Use the sliders to adjust the parameters to affect the {schema.title} Behaviour."]
+    for param in schema.params:
+        if param.optional:
+            step = f'Check "Set {param.label}" if you want to set {param.label.lower()} manually'
+            steps.append(f"{step} ({param.info})." if param.info else f"{step}.")
+    steps.append('Click "Set parameters" to see the current configuration before flagging (or check "Live Mode" to stream slider changes to the car as you drag them).')
+    steps.append(f'Once you are ready, click on "Flag this configuration" to save the configuration in a JSON file (Read inside ros2 {schema.name} node).')
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("")
+            gr.Markdown("")
+            gr.Markdown("")
+
+            gr.Markdown(
+                "## Instructions\n\n"
+                + "\n".join(f"{i}. {step}" for i, step in enumerate(steps, 1))
+                + "\n\nAll flagged configurations are kept with timestamps in the flag history (query it with `python flag_history.py query`)."
+            )
+
+    def activate(enabled):
+        return gr.Slider(visible=enabled)
+
+    for name, toggle in toggles.items():
+        toggle.change(fn=activate, inputs=toggle, outputs=sliders[name])
+
+    def session_of(request):
+        return request.session_hash if request is not None else None
+
+    def live_update_all(request: gr.Request, live, *values):
+        # Send the current slider values as soon as live mode is switched on
+        if live:
+            try:
+                params = schema.validate(collect_params(schema, values))
+            except ValueError as e:
+                raise gr.Error(str(e))
+            send_live_update(schema, session_of(request), params)
+
+    live_mode.change(
+        fn=live_update_all,
+        inputs=[live_mode] + inputs,
+        queue=False,
+        show_progress="hidden"
+    )
+
+    def live_update(param):
+        def update(request: gr.Request, live, *values):
+            if live:
+                enabled = values[0] if param.optional else True
+                try:
+                    value = schema.validate_param(param.name, values[-1] if enabled else None)
+                except ValueError as e:
+                    raise gr.Error(str(e))
+                send_live_update(schema, session_of(request), {param.name: value})
+        return update
+
+    for param in schema.params:
+        live_inputs = [live_mode, sliders[param.name]]
+        if param.optional:
+            live_inputs.insert(1, toggles[param.name])
+        for component in live_inputs[1:]:
+            component.change(
+                fn=live_update(param),
+                inputs=live_inputs,
+                queue=False,
+                show_progress="hidden",
+                trigger_mode="always_last"
+            )
+
+    if preview is not None:
+        for component in inputs:
+            component.change(
+                fn=lambda *values: preview_plot(schema, *values),
+                inputs=inputs,
+                outputs=preview,
+                queue=False,
+                show_progress="hidden",
+                trigger_mode="always_last"
+            )
+
+    submit_button.click(
+        fn=lambda *values: set_params(schema, *values),
+        inputs=inputs,
+        outputs=[current_params, flagged_text],
+        api_name=f"{schema.name}_set_params",
+        **READ_ONLY
+    )
+
+    flag_button.click(
+        fn=lambda params, reason, msg: flag_configuration(schema, params, reason, msg),
+        inputs=[current_params, flag_reason, flag_msg],
+        outputs=flag_result,
+        api_name=f"{schema.name}_flag",
+        **write_group(schema)
+    )
+
+
+def build_api(schema):
+    """
+    This function registers the API endpoints of a controller in the current gr.Blocks.
+    They do not depend on the session or on the controller's tab being rendered.
+    """
+
+    def validate(params):
+        try:
+            return schema.validate(params)
+        except ValueError as e:
+            raise gr.Error(str(e))
+
+    def set_params_api(params: dict) -> dict:
+        """Validate params, push them to the running node and return the typed params."""
+        params = validate(params)
+        get_publisher().publish(schema.name, params)
+        return params
+
+    def flag_many_api(configs: list, flag_reason: str = "Latest", flag_msg: str = "") -> list:
+        """Flag every params dict of configs in one history transaction, return their record ids."""
+        configs = [validate(params) for params in configs]
+        if not configs:
+            return []
+        for error in default_writer.pop_errors():
+            logger.warning("Error saving previously flagged data: %s", error)
+        get_publisher().publish(schema.name, configs[-1])
+        record_ids, _ = flag_many(schema.name, configs, flag_reason, flag_msg)
+        return record_ids
+
+    def flag_params_api(params: dict, flag_reason: str = "Latest", flag_msg: str = "") -> str:
+        """Flag params, return the record id."""
+        return flag_many_api([params], flag_reason, flag_msg)[0]
+
+    def latest_api(flag_reason: str = "") -> dict:
+        """The latest flag of the controller (with flag_reason if given): record_id, flagged_at, flag_reason, flag_msg and params."""
+        record = get_history().latest(schema.name, flag_reason or None)
+        if record is None:
+            return {}
+        return {key: getattr(record, key) for key in ("record_id", "flagged_at", "flag_reason", "flag_msg", "params")}
+
+    gr.api(set_params_api, api_name=f"{schema.name}_set", **READ_ONLY)
+    gr.api(latest_api, api_name=f"{schema.name}_latest", **READ_ONLY)
+    gr.api(flag_params_api, api_name=f"{schema.name}_flag_params", **write_group(schema))
+    gr.api(flag_many_api, api_name=f"{schema.name}_flag_many", **write_group(schema))
+
+
+def metrics_table():
+    rows = [
+        [name, stats["count"], stats.get("mean"), stats.get("p50"), stats.get("p95"), stats.get("p99"), stats.get("max")]
+        for name, stats in get_metrics().snapshot().items()
+    ]
+    return pd.DataFrame(rows, columns=METRICS_COLUMNS).round(3)
+
+
+def build_metrics_panel():
+    """
+    This function builds the latency panel of the page and the "metrics" API endpoint (shared by every controller of the server).
+    """
+
+    with gr.Accordion("Latency", open=False):
+        table = gr.Dataframe(headers=METRICS_COLUMNS, interactive=False, label="queue.* / event.* / handler.*: Gradio events, io.*: writes")
+        with gr.Row():
+            refresh_button = gr.Button("Refresh")
+            reset_button = gr.Button("Reset")
+
+    def reset():
+        get_metrics().reset()
+        return metrics_table()
+
+    refresh_button.click(fn=metrics_table, outputs=table, queue=False)
+    reset_button.click(fn=reset, outputs=table, queue=False)
+
+    def metrics_api() -> dict:
+        return get_metrics().snapshot()
+
+    gr.api(metrics_api, api_name="metrics")
+
+
+def build_demo(schema):
+    with gr.Blocks(theme="soft", title=f"Set {schema.title} Parameters") as demo:
+        build_controller_ui(schema)
+        build_api(schema)
+        build_metrics_panel()
+    return instrument_demo(configure_queue(demo))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("Usage: python param_ui.py <controller>")
+    build_demo(load_schema(sys.argv[1])).launch()
@@ -0,0 +1,251 @@
+"""
+Atomic, batched writer for the parameter JSON files.
+
+Flagging a configuration writes the same data to the flag history directory and to
+the src/ and install/ config copies read by the ros2 nodes. Writing those files in
+place lets a node read a half written file, so every file is written to a temporary
+file in the same directory and atomically renamed over the target.
+
+Writes are handed to a single background thread, so the Gradio request thread only
+serializes the data and queues it. The thread drains everything queued since its last
+pass, writes the files (each fsynced before its rename, so a rename that survives a
+crash never points at empty data) and then issues one fsync per directory to make the
+renames durable. A flag to the three copies of a controller therefore costs three file
+fsyncs and two directory fsyncs; only the directory ones are shared within a batch.
+
+Written files keep the mode of the file they replace, or get the usual 0o666 minus the
+umask for new ones, so nodes running as another user can read them.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+from instrumentation import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+metrics = get_metrics()
+
+_umask = None
+_umask_lock = threading.Lock()
+
+
+def _get_umask():
+    # The umask from /proc: os.umask() can only read it by setting it, which would
+    # briefly give the files every other thread creates the umask set meanwhile.
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            try:
+                with open("/proc/self/status") as f:
+                    _umask = next(int(line.split()[1], 8) for line in f if line.startswith("Umask:"))
+            except (OSError, StopIteration, ValueError, IndexError):
+                # Not Linux: read it the only way there is, once.
+                _umask = os.umask(0o077)
+                os.umask(_umask)
+        return _umask
+
+
+@metrics.timed("io.fsync_dir")
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@metrics.timed("io.write_atomic")
+def write_atomic(path, payload, fsync=False):
+    """
+    This function writes payload (bytes) to path through a temporary file and a rename,
+    so readers see either the old or the new file, never a partial one.
+    fsync syncs the data before the rename; the directory is not synced, see ParamWriter
+    for batched durability.
+    """
+
+    directory = os.path.dirname(path) or "."
+    try:
+        mode = os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_get_umask()
+    # mkstemp creates the file 0600, which a node running as another user cannot read.
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), mode)
+            f.write(payload)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def combine(futures):
+    """
+    A Future which resolves to the paths of all the futures (ParamWriter.submit()
+    futures) once they are all done, or fails with the first of their errors.
+    """
+
+    futures = list(futures)
+    combined = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            combined.set_exception(errors[0])
+        else:
+            combined.set_result([path for future in futures for path in future.result()])
+
+    if not futures:
+        combined.set_result([])
+    for future in futures:
+        future.add_done_callback(done)
+    return combined
+
+
+class _WriteJob:
+
+    def __init__(self, paths, payload):
+        self.paths = list(paths)
+        self.payload = payload
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class ParamWriter:
+    """
+    Single background writer thread shared by all controllers.
+
+    submit() returns a concurrent.futures.Future which resolves to the list of written
+    paths once the files are renamed into place and their directories are synced.
+    """
+
+    def __init__(self, fsync=True):
+        self.fsync = fsync
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._errors = []
+        self._errors_lock = threading.Lock()
+
+    def submit(self, paths, data):
+        """
+        Queue data (a JSON serializable object) to be written to every path in paths.
+        The data is serialized once, on the calling thread.
+        """
+
+        payload = json.dumps(data, indent=4).encode("utf-8")
+        return self.submit_bytes(paths, payload)
+
+    def submit_bytes(self, paths, payload):
+        job = _WriteJob(paths, payload)
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued before this call has been written.
+        """
+
+        marker = _WriteJob([], b"")
+        self._ensure_started()
+        self._queue.put(marker)
+        marker.future.result(timeout=timeout)
+
+    def pop_errors(self):
+        """
+        Return and clear the errors of failed background writes.
+        """
+
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="param-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            with metrics.timer("io.writer_batch"):
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        # Later jobs win when several jobs target the same path (e.g. the *_params.json copies).
+        latest = {}
+        for job in batch:
+            for path in job.paths:
+                latest[path] = job.payload
+
+        failed = {}
+        synced_dirs = set()
+        for path, payload in latest.items():
+            try:
+                write_atomic(path, payload, fsync=self.fsync)
+                synced_dirs.add(os.path.dirname(path) or ".")
+            except Exception as e:
+                failed[path] = e
+
+        if self.fsync:
+            for directory in synced_dirs:
+                try:
+                    _fsync_dir(directory)
+                except OSError as e:
+                    for path in latest:
+                        if (os.path.dirname(path) or ".") == directory:
+                            failed.setdefault(path, e)
+
+        for job in batch:
+            errors = [failed[path] for path in job.paths if path in failed]
+            if errors:
+                message = "; ".join(str(e) for e in errors)
+                logger.error("Error saving flagged data: %s", message)
+                metrics.count("io.write_errors")
+                with self._errors_lock:
+                    self._errors.append(message)
+                job.future.set_exception(errors[0])
+            else:
+                if job.paths:
+                    metrics.observe("io.flag_to_disk", time.perf_counter() - job.submitted)
+                job.future.set_result(job.paths)
+
+
+default_writer = ParamWriter()
+
+
+@atexit.register
+def _flush_default_writer():
+    if default_writer._thread is not None:
+        default_writer.flush(timeout=5)
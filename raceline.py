@@ -0,0 +1,376 @@
+"""
+Racelines (waypoint paths) for the pure pursuit controller, with a spatial index and
+the lookahead and speed profile of a parameter set computed for every waypoint at once.
+
+A raceline is a CSV of waypoints: comma, semicolon or whitespace separated, "#" comment
+lines, and an optional header naming the x and y columns ("x", "x_m"), otherwise the
+first two columns are x and y. This covers the waypoint logger output (x, y, theta,
+speed) and the "# s_m; x_m; y_m; ..." racelines of the F1TENTH optimizers. The CSV is
+parsed in chunks of CHUNK_ROWS lines, then cached as <csv>.npy next to it; later loads
+memory-map the cache, so a large raceline is only ever parsed once.
+
+Raceline precomputes the arc length, heading and curvature of every waypoint, and a
+uniform grid over the waypoints: nearest() finds the nearest waypoint of a batch of
+positions by looking at the surrounding cells only, widening the search ring by ring
+when no waypoint is close enough, so a query costs about the same for 1k or 1M
+waypoints. A line whose ends meet is closed and wraps around.
+
+pursuit_profile() applies the pure pursuit law of lap_sim.py to every waypoint: the car
+on the raceline, heading along it, steers towards the point lookahead_distance further
+along the line at kp * 2 sin(alpha) / lookahead curvature, at throttle * MAX_SPEED /
+(1 + kv |curvature|).
+
+    python raceline.py synthetic raceline.csv --points 100000
+    python raceline.py profile raceline.csv --kp 1 --kv 1 --lookahead-distance 1.2
+"""
+
+import argparse
+import collections
+import io
+import logging
+import os
+
+import numpy as np
+
+from lap_sim import MAX_SPEED, MAX_STEER, WHEELBASE
+from param_writer import write_atomic
+
+logger = logging.getLogger(__name__)
+
+RACELINE_PATH = os.environ.get("ROBORACER_RACELINE", "roboracer_racelines/raceline.csv")
+
+CHUNK_ROWS = 65536
+X_COLUMNS = ("x", "x_m")
+Y_COLUMNS = ("y", "y_m")
+
+# Grid cells span CELL_WAYPOINTS waypoints along a straight line, and at least
+# MIN_CELL_SIZE metres, so the nearest waypoint of a car on the track is within a few
+# rings of cells; farther queries fall back to a linear scan.
+CELL_WAYPOINTS = 4
+MIN_CELL_SIZE = 0.25
+MAX_RINGS = 4
+QUERY_CHUNK = 4096
+
+PursuitProfile = collections.namedtuple("PursuitProfile", "lookahead curvature steer speed lap_time")
+
+
+def _delimiter(line):
+    if ";" in line:
+        return ";"
+    if "," in line:
+        return ","
+    return None
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def _columns(header, delimiter):
+    names = [name.strip().lower() for name in header.lstrip("#").split(delimiter)]
+    try:
+        return (next(names.index(name) for name in X_COLUMNS if name in names),
+                next(names.index(name) for name in Y_COLUMNS if name in names))
+    except StopIteration:
+        return 0, 1
+
+
+def read_csv(path, chunk_rows=CHUNK_ROWS):
+    """
+    The (N, 2) x, y waypoints of a raceline CSV, parsed chunk_rows lines at a time.
+    """
+
+    header, delimiter, columns = None, None, None
+    chunks, lines = [], []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("#"):
+                header = line
+                continue
+            if columns is None:
+                delimiter = _delimiter(line)
+                fields = line.split(delimiter)
+                if not _is_number(fields[0]):
+                    header = line
+                    continue
+                if len(fields) < 2:
+                    raise ValueError(f"{path}: waypoints need x and y columns")
+                columns = _columns(header, delimiter) if header else (0, 1)
+            lines.append(line)
+            if len(lines) == chunk_rows:
+                chunks.append(np.loadtxt(lines, delimiter=delimiter, usecols=columns, ndmin=2))
+                lines = []
+    if lines:
+        chunks.append(np.loadtxt(lines, delimiter=delimiter, usecols=columns, ndmin=2))
+    if not chunks:
+        raise ValueError(f"{path} has no waypoints")
+    return np.concatenate(chunks)
+
+
+def write_csv(path, points):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    np.savetxt(path, points, fmt="%.6f", delimiter=",", header="x,y", comments="")
+
+
+def load_points(path):
+    """
+    The waypoints of a raceline CSV: memory-mapped from its .npy cache if that is newer
+    than the CSV, else parsed and cached.
+    """
+
+    cache = path + ".npy"
+    try:
+        if os.path.getmtime(cache) >= os.path.getmtime(path):
+            return np.load(cache, mmap_mode="r")
+    except OSError:
+        pass
+    points = read_csv(path)
+    buffer = io.BytesIO()
+    np.save(buffer, points)
+    try:
+        write_atomic(cache, buffer.getvalue())
+    except OSError as e:
+        logger.warning("Raceline cache %s not written: %s", cache, e)
+    return points
+
+
+def load_raceline(path=RACELINE_PATH, **kwargs):
+    return Raceline(load_points(path), **kwargs)
+
+
+def synthetic_raceline(points=1000, length=300.0):
+    """
+    A closed, wavy test raceline of points waypoints and about length metres.
+    """
+
+    theta = np.linspace(0, 2 * np.pi, points, endpoint=False)
+    radius = 1 + 0.25 * np.sin(3 * theta) + 0.1 * np.cos(7 * theta)
+    xy = np.column_stack((radius * np.cos(theta), 1.6 * radius * np.sin(theta)))
+    perimeter = np.hypot(*np.diff(np.vstack((xy, xy[:1])), axis=0).T).sum()
+    return xy * (length / perimeter)
+
+
+class Raceline:
+    """
+    Waypoints with their arc length s, heading, curvature and a grid index; see the
+    module docstring. closed defaults to whether the ends are within a few waypoint
+    spacings of each other.
+    """
+
+    def __init__(self, points, closed=None, cell_size=None):
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2 or points.shape[1] < 2:
+            raise ValueError("Waypoints must be an (N, 2) array")
+        points = points[:, :2]
+        # Repeated waypoints have no heading.
+        keep = np.r_[True, np.any(np.diff(points, axis=0) != 0, axis=1)]
+        points = points[keep]
+        if len(points) < 3:
+            raise ValueError("A raceline needs at least 3 distinct waypoints")
+
+        segments = np.hypot(*np.diff(points, axis=0).T)
+        spacing = float(np.median(segments))
+        closing = float(np.hypot(*(points[0] - points[-1])))
+        if closed is None:
+            closed = closing <= 3 * spacing
+        if closed and closing == 0:
+            points, segments = points[:-1], segments[:-1]
+            closing = float(np.hypot(*(points[0] - points[-1])))
+
+        self.points = points
+        self.closed = bool(closed)
+        self.spacing = spacing
+        self.s = np.r_[0.0, np.cumsum(segments)]
+        self.length = self.s[-1] + (closing if self.closed else 0.0)
+        # Interpolation arrays, with the closing segment of a closed line
+        self._s = np.r_[self.s, self.length] if self.closed else self.s
+        self._points = np.vstack((points, points[:1])) if self.closed else points
+        self.heading, self.curvature = self._derivatives()
+        self._build_grid(cell_size or max(CELL_WAYPOINTS * spacing, MIN_CELL_SIZE))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __repr__(self):
+        return f"Raceline({len(self)} waypoints, {self.length:.1f} m, {'closed' if self.closed else 'open'})"
+
+    def _derivatives(self):
+        points, s = self.points, self.s
+        if self.closed:
+            # Two waypoints of the other end on each side, for the wrap-around
+            points = np.vstack((points[-2:], points, points[:2]))
+            s = np.r_[self.s[-2:] - self.length, self.s, self.s[:2] + self.length]
+        dx, dy = np.gradient(points[:, 0], s), np.gradient(points[:, 1], s)
+        ddx, ddy = np.gradient(dx, s), np.gradient(dy, s)
+        curvature = (dx * ddy - dy * ddx) / np.maximum(dx * dx + dy * dy, 1e-12) ** 1.5
+        heading = np.arctan2(dy, dx)
+        if self.closed:
+            heading, curvature = heading[2:-2], curvature[2:-2]
+        return heading, curvature
+
+    def _build_grid(self, cell_size):
+        self.cell_size = cell_size
+        self._origin = self.points.min(axis=0)
+        cells = np.floor((self.points - self._origin) / cell_size).astype(np.int64)
+        self._shape = cells.max(axis=0) + 1
+        keys = cells[:, 0] * self._shape[1] + cells[:, 1]
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+        # Cell offsets within each ring count
+        self._squares = {}
+        for rings in range(1, MAX_RINGS + 1):
+            offsets = np.arange(-rings, rings + 1)
+            self._squares[rings] = np.stack(np.meshgrid(offsets, offsets, indexing="ij"), axis=-1).reshape(-1, 2)
+
+    def _cell_keys(self, cells):
+        inside = np.all((cells >= 0) & (cells < self._shape), axis=-1)
+        return np.where(inside, cells[..., 0] * self._shape[1] + cells[..., 1], -1)
+
+    def _search_rings(self, xy, rings):
+        # Nearest waypoint among the cells within rings cells of each query's cell, and
+        # the distance from the query to the edge of those cells: waypoints outside are
+        # farther than that.
+        square = self._squares[rings]
+        cells = np.floor((xy - self._origin) / self.cell_size).astype(np.int64)
+        low = self._origin + (cells - rings) * self.cell_size
+        margin = np.minimum(xy - low, low + (2 * rings + 1) * self.cell_size - xy).min(axis=1)
+        keys = self._cell_keys(cells[:, None, :] + square)
+        start = np.searchsorted(self._keys, keys, side="left").ravel()
+        counts = np.searchsorted(self._keys, keys, side="right").ravel() - start
+
+        # Every waypoint of every searched cell, query by query
+        per_query = counts.reshape(len(xy), -1).sum(axis=1)
+        slots = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        candidates = self._order[np.repeat(start, counts) + slots]
+        query = np.repeat(np.arange(len(xy)), per_query)
+        delta = self.points[candidates] - xy[query]
+        squared = np.einsum("ij,ij->i", delta, delta)
+
+        index = np.zeros(len(xy), dtype=np.int64)
+        best = np.full(len(xy), np.inf)
+        found = per_query > 0
+        if found.any():
+            best[found] = np.minimum.reduceat(squared, (np.cumsum(per_query) - per_query)[found])
+            # The first candidate of each query at its minimum
+            is_best = np.flatnonzero(squared == best[query])
+            queries, first = np.unique(query[is_best], return_index=True)
+            index[queries] = candidates[is_best[first]]
+        return index, np.sqrt(best), margin
+
+    def nearest_linear(self, xy):
+        """
+        nearest() by a linear scan of every waypoint, for reference.
+        """
+
+        xy = np.atleast_2d(np.asarray(xy, dtype=float))
+        index = np.empty(len(xy), dtype=np.int64)
+        distance = np.empty(len(xy))
+        chunk = max(1, 2 ** 22 // len(self.points))
+        for start in range(0, len(xy), chunk):
+            part = xy[start:start + chunk]
+            d = np.hypot(self.points[:, 0] - part[:, :1], self.points[:, 1] - part[:, 1:])
+            index[start:start + chunk] = d.argmin(axis=1)
+            distance[start:start + chunk] = d[np.arange(len(part)), index[start:start + chunk]]
+        return index, distance
+
+    def nearest(self, xy):
+        """
+        (index, distance) of the nearest waypoint of every (x, y) row of xy.
+        """
+
+        xy = np.atleast_2d(np.asarray(xy, dtype=float))
+        index = np.empty(len(xy), dtype=np.int64)
+        distance = np.empty(len(xy))
+        for start in range(0, len(xy), QUERY_CHUNK):
+            pending = np.arange(start, min(start + QUERY_CHUNK, len(xy)))
+            for rings in range(1, MAX_RINGS + 1):
+                found, d, margin = self._search_rings(xy[pending], rings)
+                done = d <= margin
+                index[pending[done]], distance[pending[done]] = found[done], d[done]
+                pending = pending[~done]
+                if not len(pending):
+                    break
+            if len(pending):
+                index[pending], distance[pending] = self.nearest_linear(xy[pending])
+        return index, distance
+
+    def point_at(self, s):
+        """
+        The (x, y) rows at arc lengths s, wrapped around a closed line and clamped to the
+        ends of an open one.
+        """
+
+        s = np.asarray(s, dtype=float)
+        s = np.mod(s, self.length) if self.closed else np.clip(s, 0, self.length)
+        segment = np.clip(np.searchsorted(self._s, s, side="right") - 1, 0, len(self._s) - 2)
+        t = (s - self._s[segment]) / (self._s[segment + 1] - self._s[segment])
+        return self._points[segment] + t[..., None] * (self._points[segment + 1] - self._points[segment])
+
+    def lookahead(self, xy, distance):
+        """
+        The point distance along the raceline from the nearest waypoint of every row of xy.
+        """
+
+        index, _ = self.nearest(xy)
+        return self.point_at(self.s[index] + distance)
+
+    def pursuit_profile(self, params):
+        """
+        The PursuitProfile of a pure_pursuit params dict at every waypoint: lookahead
+        points (N, 2), commanded curvature, steering angle, speed, and the lap time at
+        those speeds (inf when the car does not move).
+        """
+
+        lookahead = max(0.3, params["lookahead_distance"])
+        target = self.point_at(self.s + lookahead)
+        chord = target - self.points
+        alpha = np.arctan2(chord[:, 1], chord[:, 0]) - self.heading
+        curvature = params["kp"] * 2 * np.sin(alpha) / lookahead
+        steer = np.clip(np.arctan(WHEELBASE * curvature), -MAX_STEER, MAX_STEER)
+        speed = params["throttle"] * MAX_SPEED / (1 + params["kv"] * np.abs(curvature))
+        segments = np.diff(self._s)
+        with np.errstate(divide="ignore"):
+            lap_time = float(np.sum(segments / speed[:len(segments)])) if np.all(speed > 0) else float("inf")
+        return PursuitProfile(target, curvature, steer, speed, lap_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write and inspect racelines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synthetic = commands.add_parser("synthetic", help="Write a synthetic closed raceline")
+    synthetic.add_argument("path", nargs="?", default=RACELINE_PATH)
+    synthetic.add_argument("--points", type=int, default=1000)
+    synthetic.add_argument("--length", type=float, default=300.0, help="Length in m")
+
+    profile = commands.add_parser("profile", help="Pure pursuit speed profile of a raceline")
+    profile.add_argument("path", nargs="?", default=RACELINE_PATH)
+    profile.add_argument("--throttle", type=float, default=0.15)
+    profile.add_argument("--kp", type=float, default=1.0)
+    profile.add_argument("--kv", type=float, default=1.0)
+    profile.add_argument("--lookahead-distance", type=float, default=1.2)
+
+    args = parser.parse_args()
+    if args.command == "synthetic":
+        write_csv(args.path, synthetic_raceline(args.points, args.length))
+        print(f"Wrote {args.points} waypoints to {args.path}")
+        return
+
+    raceline = load_raceline(args.path)
+    result = raceline.pursuit_profile({"throttle": args.throttle, "kp": args.kp, "kv": args.kv,
+                                       "lookahead_distance": args.lookahead_distance})
+    print(raceline)
+    print(f"speed {result.speed.min():.2f} - {result.speed.max():.2f} m/s, "
+          f"max |steer| {np.degrees(np.abs(result.steer).max()):.1f} deg, lap {result.lap_time:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark of the raceline subsystem (raceline.py) on a 100k waypoint track.
+
+    load            parsing the CSV against memory-mapping its .npy cache
+    build           arc length, heading, curvature and the grid index
+    lookahead       lookahead queries per second (nearest waypoint of a position near the
+                    line, then the point lookahead_distance further), through the grid
+                    index and by a linear scan, in batches and one at a time as a car
+                    would ask; the lookahead points are checked to be the same
+    profile         lookahead and kv speed profile of every waypoint (one slider redraw)
+
+Usage:
+    python raceline_benchmark.py [--points 100000] [--queries 20000] [--offset 0.2]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from raceline import Raceline, load_points, synthetic_raceline, write_csv
+
+PARAMS = {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--offset", type=float, default=0.2, help="Standard deviation of the query positions from the line, in m")
+    parser.add_argument("--length", type=float, default=300.0, help="Track length in m")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "raceline.csv")
+        write_csv(path, synthetic_raceline(args.points, args.length))
+        size_mb = os.path.getsize(path) / 1e6
+        _, parse_s = timed(load_points, path)
+        points, mmap_s = timed(load_points, path)
+        print(f"load ({args.points} waypoints, {size_mb:.1f} MB CSV): parse {parse_s * 1000:.1f} ms, cached memory map {mmap_s * 1000:.2f} ms")
+
+        raceline, build_s = timed(Raceline, points)
+        print(f"build: {build_s * 1000:.1f} ms  ({raceline}, grid cells {raceline.cell_size:.2f} m)")
+
+        rng = np.random.default_rng(0)
+        queries = raceline.points[rng.integers(len(raceline), size=args.queries)] + rng.normal(0, args.offset, (args.queries, 2))
+        distance = PARAMS["lookahead_distance"]
+
+        def linear_lookahead(xy):
+            index, _ = raceline.nearest_linear(xy)
+            return raceline.point_at(raceline.s[index] + distance)
+
+        grid_points, grid_s = timed(raceline.lookahead, queries, distance)
+        linear_count = max(1, min(args.queries, 2000))
+        linear_points, linear_s = timed(linear_lookahead, queries[:linear_count])
+        same = np.allclose(grid_points[:linear_count], linear_points)
+        print(f"lookahead, batched: grid {args.queries / grid_s:10.0f} /s   linear {linear_count / linear_s:10.0f} /s"
+              f"   ({(linear_s / linear_count) / (grid_s / args.queries):.0f}x, same points: {same})")
+
+        single = queries[:500]
+        start = time.perf_counter()
+        for xy in single:
+            raceline.lookahead(xy, distance)
+        grid_one = (time.perf_counter() - start) / len(single)
+        start = time.perf_counter()
+        for xy in single[:100]:
+            linear_lookahead(xy)
+        linear_one = (time.perf_counter() - start) / 100
+        print(f"lookahead, one at a time: grid {grid_one * 1e6:8.0f} us   linear {linear_one * 1e6:8.0f} us   ({linear_one / grid_one:.0f}x)")
+
+        profile, profile_s = timed(raceline.pursuit_profile, PARAMS)
+        print(f"profile of every waypoint: {profile_s * 1000:.1f} ms  (speed {profile.speed.min():.2f} - {profile.speed.max():.2f} m/s, lap {profile.lap_time:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Raceline panel of the pure_pursuit tab (declared in schemas/pure_pursuit.json).
+
+Shows the raceline being tracked (see raceline.py) with the lookahead of the current
+sliders drawn from evenly spaced waypoints, and the speed profile that kv implies along
+the whole line. Both are recomputed for every waypoint in one pass and redrawn as the
+sliders move. Without a raceline file the lap_sim test track is shown.
+"""
+
+import os
+from functools import lru_cache
+
+import gradio as gr
+import numpy as np
+import pandas as pd
+
+from controller_sim import synthetic_track
+from param_ui import collect_params
+from raceline import RACELINE_PATH, Raceline, load_raceline
+
+# Points per plot, and waypoints with their lookahead drawn
+MAX_PLOT_POINTS = 2000
+LOOKAHEAD_CHORDS = 24
+CHORD_POINTS = 10
+
+
+@lru_cache(maxsize=4)
+def _open_raceline(path, mtime, size):
+    return load_raceline(path)
+
+
+@lru_cache(maxsize=1)
+def _test_track():
+    return Raceline(synthetic_track())
+
+
+def get_raceline(path):
+    """
+    The Raceline at path, reloaded when the file changes; the lap_sim test track when
+    there is no file.
+    """
+
+    if not path or not os.path.exists(path):
+        return _test_track()
+    stat = os.stat(path)
+    return _open_raceline(path, stat.st_mtime, stat.st_size)
+
+
+def raceline_plots(raceline, params):
+    """
+    This function returns the status line, the map with the lookahead chords and the
+    speed profile of params along raceline.
+    """
+
+    profile = raceline.pursuit_profile(params)
+    stride = max(1, len(raceline) // MAX_PLOT_POINTS)
+
+    chords = np.linspace(0, len(raceline), LOOKAHEAD_CHORDS, endpoint=False).astype(int)
+    t = np.linspace(0, 1, CHORD_POINTS)[:, None, None]
+    chord_points = (raceline.points[chords] + t * (profile.lookahead[chords] - raceline.points[chords])).reshape(-1, 2)
+    line = raceline.points[::stride]
+    map_plot = pd.DataFrame({
+        "x (m)": np.concatenate([line[:, 0], chord_points[:, 0]]),
+        "y (m)": np.concatenate([line[:, 1], chord_points[:, 1]]),
+        "series": np.concatenate([np.full(len(line), "raceline"), np.full(len(chord_points), "lookahead")]),
+    })
+    speed_plot = pd.DataFrame({"arc length (m)": raceline.s[::stride], "speed (m/s)": profile.speed[::stride]})
+
+    lap = f"{profile.lap_time:.1f} s" if np.isfinite(profile.lap_time) else "never (no forward speed)"
+    status = (f"{len(raceline)} waypoints, {raceline.length:.1f} m, {'closed' if raceline.closed else 'open'}; "
+              f"speed {profile.speed.min():.2f} - {profile.speed.max():.2f} m/s, "
+              f"max steering {np.degrees(np.abs(profile.steer).max()):.1f} deg, lap {lap}")
+    return status, map_plot, speed_plot
+
+
+def build_raceline_panel(schema, inputs):
+    """
+    This function builds the raceline preview inside the current controller UI.
+    """
+
+    def show(path, *values):
+        try:
+            params = schema.validate(collect_params(schema, values))
+        except ValueError:
+            return gr.skip()
+        try:
+            raceline = get_raceline(path)
+        except (OSError, ValueError) as e:
+            raise gr.Error(f"Cannot load raceline: {e}")
+        status, map_plot, speed_plot = raceline_plots(raceline, params)
+        if raceline is _test_track():
+            status = f"No raceline at {path}, showing the lap_sim test track. " + status
+        return status, map_plot, speed_plot
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Raceline")
+            with gr.Row():
+                raceline_path = gr.Textbox(label="Raceline CSV", value=RACELINE_PATH, info="Waypoints x, y; write a test one with `python raceline.py synthetic`.")
+                load_button = gr.Button("Load")
+            status = gr.Textbox(label="Profile", interactive=False)
+            with gr.Row():
+                map_plot = gr.ScatterPlot(x="x (m)", y="y (m)", color="series", label="Raceline and lookahead", height=400)
+                speed_plot = gr.LinePlot(x="arc length (m)", y="speed (m/s)", label="Speed profile", height=400)
+
+    load_button.click(fn=show, inputs=[raceline_path] + inputs, outputs=[status, map_plot, speed_plot])
+
+    for component in inputs:
+        component.change(
+            fn=show,
+            inputs=[raceline_path] + inputs,
+            outputs=[status, map_plot, speed_plot],
+            queue=False,
+            show_progress="hidden",
+            trigger_mode="always_last"
+        )
@@ -0,0 +1,257 @@
+"""
+Regression benchmark of the tuning UI's end-to-end paths, to catch slowdowns before race
+day. Without network access, every controller app (param_ui.build_demo) is built
+in-process and driven like the browser would: "Set Parameters" then "Flag this
+configuration", through Blocks.process_api, with the files written to a temporary
+workspace. Measured per controller:
+
+    build_ms               building the Blocks app (import_ms is the import of gradio and
+                           the UI modules, in a fresh interpreter)
+    set_p50_ms / p95       "Set Parameters" event
+    flag_p50_ms / p95      "Flag this configuration" event
+    flag_to_disk_p95_ms    flag submitted -> files renamed and synced (io.flag_to_disk)
+    concurrent_flags_per_s flags per second from --sessions sessions at once, until
+                           every file is on disk (and the workspace file holds a flag
+                           that was made)
+
+Every measurement is repeated --rounds times; the result is the median of the rounds,
+and their spread (the median absolute deviation) is kept with it. The results are
+compared with a JSON baseline: a time more than --threshold (default 25 %) and
+--slack-ms above it, or a throughput more than --threshold below it, is a regression
+and the run exits with status 1. On a noisy machine the tolerance widens to NOISE
+times the spread of the baseline and of this run, so a metric only regresses by more
+than the rounds themselves disagree, but never past MAX_WIDENING times --threshold.
+The baseline records --flags and --sessions, and runs with other values are not
+compared with it (exit status 2). --save writes the results as the new baseline;
+re-save it in any change that is meant to make the UI heavier (e.g. a new panel).
+Baselines are only comparable on the same machine.
+
+Usage:
+    python regression_benchmark.py [--baseline regression_baseline.json] [--save]
+                                   [--threshold 0.25] [--rounds 5] [--flags 100] [--sessions 8]
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CONTROLLERS = ("wall_follow", "gap_follow", "pure_pursuit")
+# Spreads (of the baseline plus this run) a change must exceed to be a regression, and
+# the most the noise may widen --threshold by
+NOISE = 3.0
+MAX_WIDENING = 2.0
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "regression_baseline.json")
+
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def timed(coroutine):
+    start = time.perf_counter()
+    result = await coroutine
+    return result, (time.perf_counter() - start) * 1000
+
+
+def import_ms():
+    """
+    Time to import the UI in a fresh interpreter.
+    """
+
+    code = "import time; start = time.perf_counter(); import param_ui; print((time.perf_counter() - start) * 1000)"
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=script_dir))
+    return float(output.stdout.split()[-1])
+
+
+def run_round(flags, sessions):
+    """
+    Run every measurement once; returns {metric: value}.
+    """
+
+    from gradio.state_holder import SessionState
+
+    import param_ui
+    from flagging import config_dirs, config_paths
+    from instrumentation import get_metrics
+    from param_schema import load_schema
+    from param_writer import default_writer
+
+    results = {"import_ms": import_ms()}
+
+    for controller in CONTROLLERS:
+        schema = load_schema(controller)
+        for config_dir in config_dirs(controller):
+            os.makedirs(config_dir, exist_ok=True)
+
+        # Garbage from the previous controller is not this one's to pay for.
+        gc.collect()
+        start = time.perf_counter()
+        demo = param_ui.build_demo(schema)
+        results[f"{controller}.build_ms"] = (time.perf_counter() - start) * 1000
+
+        events = {fn.api_name: fn for fn in demo.fns.values()}
+        set_event, flag_event = events[f"{controller}_set_params"], events[f"{controller}_flag"]
+        values = param_ui.example_row(schema, schema.defaults())
+
+        async def set_and_flag(state, message):
+            result, set_ms = await timed(demo.process_api(block_fn=set_event, inputs=values, state=state))
+            params = result["data"][-1]
+            _, flag_ms = await timed(demo.process_api(block_fn=flag_event, inputs=[params, "Latest", message], state=state))
+            return set_ms, flag_ms
+
+        async def sequential():
+            state = SessionState(demo)
+            return [await set_and_flag(state, f"sequential {i}") for i in range(flags)]
+
+        get_metrics().reset()
+        timings = asyncio.run(sequential())
+        default_writer.flush()
+        set_ms, flag_ms = [t for t, _ in timings], [t for _, t in timings]
+        results[f"{controller}.set_p50_ms"] = statistics.median(set_ms)
+        results[f"{controller}.set_p95_ms"] = percentile(set_ms, 0.95)
+        results[f"{controller}.flag_p50_ms"] = statistics.median(flag_ms)
+        results[f"{controller}.flag_p95_ms"] = percentile(flag_ms, 0.95)
+        results[f"{controller}.flag_to_disk_p95_ms"] = get_metrics().snapshot()["io.flag_to_disk"]["p95"]
+
+        async def concurrent():
+            async def session(index):
+                state = SessionState(demo)
+                for i in range(flags // sessions):
+                    await set_and_flag(state, f"session {index} flag {i}")
+            await asyncio.gather(*(session(index) for index in range(sessions)))
+
+        start = time.perf_counter()
+        asyncio.run(concurrent())
+        default_writer.flush()
+        elapsed = time.perf_counter() - start
+        results[f"{controller}.concurrent_flags_per_s"] = sessions * (flags // sessions) / elapsed
+
+        with open(config_paths(controller)[0]) as f:
+            message = json.load(f)["flag_msg"]
+        if not message.startswith("session "):
+            raise RuntimeError(f"{controller}: the workspace file holds {message!r}, not a concurrent flag")
+    return results
+
+
+def run(rounds, flags, sessions):
+    """
+    ({metric: median}, {metric: median absolute deviation}) over rounds rounds.
+    """
+
+    values = {}
+    for _ in range(rounds):
+        for name, value in run_round(flags, sessions).items():
+            values.setdefault(name, []).append(value)
+    medians = {name: statistics.median(samples) for name, samples in values.items()}
+    spreads = {name: statistics.median(abs(value - medians[name]) for value in samples) for name, samples in values.items()}
+    return medians, spreads
+
+
+def compare(results, baseline, threshold, slack_ms, spreads=None, baseline_spreads=None):
+    """
+    (metric, baseline, current, change, regressed) for every metric of the baseline.
+    """
+
+    spreads, baseline_spreads = spreads or {}, baseline_spreads or {}
+    rows = []
+    for name, reference in sorted(baseline.items()):
+        if name not in results:
+            continue
+        current = results[name]
+        change = (current - reference) / reference if reference else 0.0
+        noise = NOISE * (spreads.get(name, 0.0) + baseline_spreads.get(name, 0.0))
+        tolerance = max(threshold * abs(reference), min(noise, MAX_WIDENING * threshold * abs(reference)))
+        if name.endswith("_per_s"):
+            regressed = current < reference - tolerance
+        else:
+            regressed = current > reference + tolerance + slack_ms
+        rows.append((name, reference, current, change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--slack-ms", type=float, default=0.5, help="Absolute tolerance of the times, for the sub-millisecond ones")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--flags", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    baseline = None
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        # Checked before measuring: the times depend on the workload.
+        workload = (baseline.get("flags"), baseline.get("sessions"))
+        if workload != (args.flags, args.sessions):
+            print(f"The baseline was measured with --flags {workload[0]} --sessions {workload[1]}, not "
+                  f"--flags {args.flags} --sessions {args.sessions}: run with those, or --save a new baseline")
+            sys.exit(2)
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Everything the apps write goes to the temporary directory; nothing leaves the machine.
+        os.environ.update(
+            ROBORACER_WS=os.path.join(directory, "ws"),
+            ROBORACER_FLAG_HISTORY=os.path.join(directory, "flag_history.sqlite3"),
+            ROBORACER_TELEMETRY_DB=os.path.join(directory, "telemetry.sqlite3"),
+            ROBORACER_TELEMETRY="127.0.0.1:0",
+            GRADIO_ANALYTICS_ENABLED="False",
+        )
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            results, spreads = run(args.rounds, args.flags, args.sessions)
+        finally:
+            os.chdir(cwd)
+
+    report = {"machine": machine(), "created": time.strftime("%Y-%m-%d %H:%M:%S"), "rounds": args.rounds, "flags": args.flags,
+              "sessions": args.sessions, "results": results, "spreads": spreads}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if baseline is None:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=4)
+        for name, value in sorted(results.items()):
+            print(f"{name:40s} {value:10.2f}")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if baseline.get("machine") != report["machine"]:
+        print(f"Warning: the baseline was measured on {baseline.get('machine')}, this is {report['machine']}")
+    if baseline.get("rounds") != args.rounds:
+        print(f"Warning: the baseline is the median of {baseline.get('rounds')} rounds, this run of {args.rounds}")
+
+    rows = compare(results, baseline["results"], args.threshold, args.slack_ms, spreads, baseline.get("spreads"))
+    print(f"{'metric':40s} {'baseline':>10s} {'current':>10s} {'change':>8s}")
+    for name, reference, current, change, regressed in rows:
+        print(f"{name:40s} {reference:10.2f} {current:10.2f} {change:+8.0%}{'  REGRESSION' if regressed else ''}")
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) past {args.threshold:.0%} (see above)")
+        sys.exit(1)
+    print(f"No regression past {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
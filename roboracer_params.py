@@ -0,0 +1,170 @@
+"""
+Command line tool setting and flagging controller parameters without the UI, for scripts
+and the car's onboard computer.
+
+    python roboracer_params.py set gap_follow --window-half-size 40
+    python roboracer_params.py flag gap_follow --window-half-size 40 --reason Golden --msg "dry track"
+    python roboracer_params.py latest gap_follow --reason Golden
+    python roboracer_params.py list
+
+Every parameter of the controller's schema is an option (underscores as dashes; "none"
+switches an optional parameter off). The others keep the value of the latest flag of the
+controller (--base golden: the latest "Golden" one, --base defaults: the schema
+defaults). "set" validates the parameters and pushes them to the running node over the
+parameter stream (param_stream.py), like "Set Parameters" in the UI; "flag" also appends
+them to the flag history and writes the *_params.json workspace copies (flagging.py),
+like "Flag this configuration", and waits until the files are on disk.
+
+Only the schemas, the flag history, the writer and the stream are imported, none of them
+use Gradio, NumPy or pandas, so the tool starts in a few tens of milliseconds (see
+roboracer_params_benchmark.py).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from param_schema import FLAG_REASONS, list_schemas, load_schema
+
+BASES = ("latest", "golden", "defaults")
+
+# Seconds to wait for the workspace files
+WRITE_TIMEOUT = 10
+
+
+def option(name):
+    return "--" + name.replace("_", "-")
+
+
+def parse_value(text):
+    return None if text.strip().lower() == "none" else text
+
+
+def base_params(schema, base, history=None):
+    """
+    The params the options are applied to: the latest flag of the controller (the
+    latest "Golden" one with base "golden") or the schema defaults when there is none.
+    """
+
+    if base != "defaults":
+        from flag_history import get_history
+
+        record = (history or get_history()).latest(schema.name, "Golden" if base == "golden" else None)
+        if record is not None:
+            return {name: record.params.get(name) for name in schema.names}
+    return schema.defaults()
+
+
+def resolve_params(schema, values, base="latest", history=None):
+    """
+    The typed params of the controller with values ({name: value}, values still as
+    text) applied to base. Raises ValueError like ControllerSchema.validate.
+    """
+
+    return schema.validate(dict(base_params(schema, base, history), **values))
+
+
+def set_params(controller, params):
+    """
+    Push params to the running node; returns the stream sequence number.
+    """
+
+    from param_stream import get_publisher
+
+    return get_publisher().publish(controller, params)
+
+
+def flag_params(controller, params, flag_reason="Latest", flag_msg=""):
+    """
+    Push params to the running node and flag them; returns (record_id, future) like
+    flagging.flag().
+    """
+
+    from flagging import flag
+
+    set_params(controller, params)
+    return flag(controller, params, flag_reason, flag_msg)
+
+
+def add_param_options(parser, schema):
+    parser.add_argument("--base", choices=BASES, default="latest", help="Values of the parameters not given (default: the latest flag)")
+    for param in schema.params:
+        help_text = f"{param.label}, {param.type} in [{param.min}, {param.max}]"
+        if param.optional:
+            help_text += ', or "none"'
+        parser.add_argument(option(param.name), dest=f"param_{param.name}", metavar="VALUE", help=help_text)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Set and flag controller parameters without the tuning UI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    schemas = list_schemas()
+
+    for command, help_text in (("set", "Push parameters to the running node"),
+                               ("flag", "Push parameters to the running node, flag them and write the workspace files")):
+        command_parser = commands.add_parser(command, help=help_text)
+        controllers = command_parser.add_subparsers(dest="controller", required=True, metavar="controller")
+        for schema in schemas:
+            controller_parser = controllers.add_parser(schema.name, help=f"{schema.title} parameters")
+            add_param_options(controller_parser, schema)
+            if command == "flag":
+                controller_parser.add_argument("--reason", default="Latest", choices=FLAG_REASONS)
+                controller_parser.add_argument("--msg", default="", help="Flag message")
+
+    latest_parser = commands.add_parser("latest", help="Print the latest flag of a controller")
+    latest_parser.add_argument("controller", choices=[schema.name for schema in schemas])
+    latest_parser.add_argument("--reason", choices=FLAG_REASONS)
+
+    commands.add_parser("list", help="List the controllers and their parameters")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "list":
+        for schema in list_schemas():
+            print(f"{schema.name} ({schema.package})")
+            for param in schema.params:
+                print(f"  {option(param.name):28s} {param.type:5s} [{param.min}, {param.max}] default {param.default}")
+        return
+
+    if args.command == "latest":
+        from flag_history import get_history
+
+        record = get_history().latest(args.controller, args.reason)
+        if record is None:
+            sys.exit(f"No flag of {args.controller}" + (f" with reason {args.reason}" if args.reason else ""))
+        print(json.dumps({key: getattr(record, key) for key in ("record_id", "flagged_at", "flag_reason", "flag_msg", "params")}, indent=4))
+        return
+
+    schema = load_schema(args.controller)
+    given = {name: getattr(args, f"param_{name}") for name in schema.names}
+    values = {name: parse_value(text) for name, text in given.items() if text is not None}
+    try:
+        params = resolve_params(schema, values, args.base)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+
+    if args.command == "set":
+        sequence = set_params(schema.name, params)
+        print(json.dumps(params, indent=4))
+        print(f"Pushed to the node (stream sequence {sequence})", file=sys.stderr)
+        return
+
+    from flagging import config_dirs, config_paths
+
+    # Like the UI; the install/ copy only exists once the package is built.
+    os.makedirs(config_dirs(schema.name)[0], exist_ok=True)
+    record_id, future = flag_params(schema.name, params, args.reason, args.msg)
+    print(json.dumps(params, indent=4))
+    try:
+        future.result(WRITE_TIMEOUT)
+    except Exception as e:
+        sys.exit(f"Flagged {record_id} as {args.reason}, but writing the workspace files failed: {e}")
+    print(f"Flagged {record_id} as {args.reason}, written to {', '.join(config_paths(schema.name))}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: start-up of the command line tool (roboracer_params.py) against the Gradio
+scripts, which were the only way into flagging.
+
+Every case runs --runs times as a fresh process (after one run writing the .pyc files),
+from a scratch working directory and flag history, and reports the median wall time,
+the same over a bare interpreter start, the import time measured by
+`python -X importtime` (every top-level import, with `site`, which every Python process
+pays) and the peak resident memory. The slowest imports of the tool are listed last.
+
+    cli list / set / flag      python roboracer_params.py ... gap_follow --window-half-size 40
+    script import              import gap_follow_params_set (imports Gradio and the UI)
+    script build               ... and build_demo(), the app the script launches
+
+Usage:
+    python roboracer_params_benchmark.py [--runs 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+CLI = os.path.join(REPO_DIR, "roboracer_params.py")
+
+CASES = [
+    ("python (no imports)", ["-c", "pass"]),
+    ("cli list", [CLI, "list"]),
+    ("cli set", [CLI, "set", "gap_follow", "--window-half-size", "40"]),
+    ("cli flag", [CLI, "flag", "gap_follow", "--window-half-size", "40", "--msg", "benchmark"]),
+    ("script import", ["-c", "import gap_follow_params_set"]),
+    ("script build", ["-c", "import gap_follow_params_set as s, param_ui; param_ui.build_demo(s.schema)"]),
+]
+
+
+def parse_importtime(stderr):
+    """
+    {module: cumulative us} of the top-level imports in -X importtime output, and
+    {module: self us} of every import.
+    """
+
+    top, own = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        own[name.strip()] = int(self_us)
+        if not name[1:].startswith(" "):
+            top[name.strip()] = int(cumulative)
+    return top, own
+
+
+def run_once(arguments, cwd, env):
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-X", "importtime"] + arguments, cwd=cwd, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    stderr = process.stderr.read()
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{arguments} exited with {process.returncode}:\n{stderr[-2000:]}")
+    top, own = parse_importtime(stderr)
+    return elapsed, sum(top.values()) / 1e6, usage.ru_maxrss / 1024, own
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(
+            os.environ,
+            ROBORACER_WS=os.path.join(cwd, "ws"),
+            ROBORACER_FLAG_HISTORY=os.path.join(cwd, "flag_history.sqlite3"),
+            GRADIO_ANALYTICS_ENABLED="False",
+            PYTHONPATH=REPO_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        )
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        # The install/ copy is written too, as on a built workspace.
+        os.makedirs(os.path.join(cwd, "ws/install/gap_follow_ui_control/share/gap_follow_ui_control/config"))
+
+        print(f"{'':22s} {'wall (ms)':>10s} {'over python':>12s} {'imports (ms)':>13s} {'peak RSS (MB)':>14s}   median of {args.runs} runs")
+        slowest, python_wall = {}, None
+        for name, arguments in CASES:
+            runs = 1 if name == "script build" else args.runs
+            run_once(arguments, cwd, env)
+            results = [run_once(arguments, cwd, env) for _ in range(runs)]
+            wall = statistics.median(result[0] for result in results) * 1000
+            imports = statistics.median(result[1] for result in results) * 1000
+            rss = statistics.median(result[2] for result in results)
+            python_wall = wall if python_wall is None else python_wall
+            print(f"{name:22s} {wall:10.1f} {wall - python_wall:12.1f} {imports:13.1f} {rss:14.1f}" + ("   (1 run)" if runs == 1 else ""))
+            if name == "cli flag":
+                slowest = results[len(results) // 2][3]
+
+    print("\nSlowest imports of `cli flag` (self time):")
+    for module, self_us in sorted(slowest.items(), key=lambda item: -item[1])[:10]:
+        print(f"    {module:30s} {self_us / 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+All controllers in one Gradio server.
+
+Running wall_follow_params_set.py, gap_follow_params_set.py and
+pure_pursuit_params_set.py separately pays the gradio import, the Blocks build and a
+server for each of them, and only one of them gets port 7860. This script imports gradio
+once and serves every controller as a tab of a single app, along with the API endpoints
+of every controller (see param_ui.build_api()). Queue concurrency is set by
+ROBORACER_QUEUE_CONCURRENCY (see param_ui.configure_queue()).
+
+There is a tab for every controller schema in schemas/ (see param_schema.py). A
+controller's controls are only built the first time its tab is opened in a session;
+telemetry ingestion (see telemetry.py) starts with the server. Every event, rendered
+tabs included, is timed (see instrumentation.py).
+
+    python roboracer_ui.py
+"""
+
+import gradio as gr
+
+from param_schema import list_schemas
+from instrumentation import instrument_demo
+from param_ui import build_api, build_controller_ui, build_metrics_panel, configure_queue
+from telemetry import get_ingestor
+
+
+def _lazy_tab(schema):
+    """
+    Build the controller's UI in the current tab once its "visited" state turns True.
+    State.change only fires on an actual change, so the tab is rendered once per session.
+    """
+
+    visited = gr.State(False)
+
+    @gr.render(inputs=visited, triggers=[visited.change])
+    def render(visited):
+        if visited:
+            build_controller_ui(schema)
+
+    return visited
+
+
+def build_demo():
+    get_ingestor()
+    with gr.Blocks(theme="soft", title="Roboracer Autodrive UI") as demo:
+        visited_states = []
+        with gr.Tabs():
+            for schema in list_schemas():
+                with gr.Tab(schema.title) as tab:
+                    visited = _lazy_tab(schema)
+                tab.select(fn=lambda: True, outputs=visited, queue=False, show_progress="hidden")
+                visited_states.append(visited)
+                build_api(schema)
+
+        build_metrics_panel()
+
+        # The first tab is shown on page load.
+        demo.load(fn=lambda: True, outputs=visited_states[0], queue=False, show_progress="hidden")
+    return instrument_demo(configure_queue(demo))
+
+
+if __name__ == "__main__":
+    build_demo().launch()
@@ -0,0 +1,280 @@
+"""
+Recorded LaserScan logs, read by memory mapping and processed in chunks.
+
+A scan log is a local stand-in for a rosbag of sensor_msgs/LaserScan: a 64 byte header
+(magic, version, beam count, angle_min, angle_max, range_max) followed by fixed size
+records of a float64 stamp and float32 ranges. Fixed size records let ScanLog map the
+file with np.memmap, so any frame is one slice away and a log of any length is streamed
+chunk by chunk without loading it into RAM. A log that is still being written can be
+read; a partially written last record is ignored.
+
+gap_frames() runs the disparity extender and gap selection of controller_sim.py on every
+frame of a log, a chunk of frames per array pass.
+
+    python scan_log.py record-synthetic scans.rrsl --seconds 600 --rate 40
+    python scan_log.py import-bag my_bag scans.rrsl --topic /scan   (needs the rosbags package)
+    python scan_log.py gaps scans.rrsl --window-half-size 40 --disparity-extender 50
+"""
+
+import argparse
+import collections
+import logging
+import os
+import struct
+import time
+
+import numpy as np
+
+from controller_sim import MAX_RANGE, SCAN_BEAMS, SCAN_FOV, extend_disparities, select_gaps, synthetic_scan
+
+logger = logging.getLogger(__name__)
+
+SCAN_LOG_PATH = os.environ.get("ROBORACER_SCAN_LOG", "roboracer_scans/scans.rrsl")
+
+MAGIC = b"RRSL"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIddd")
+HEADER_SIZE = 64
+
+GapFrames = collections.namedtuple("GapFrames", "index stamp gap_start gap_stop target steer")
+
+
+def record_dtype(beams):
+    return np.dtype([("stamp", "<f8"), ("ranges", "<f4", (beams,))])
+
+
+class ScanLogWriter:
+    """
+    Append scans to a log, creating it (and its directory) if needed. A partial record
+    at the end of an existing log (a writer that died mid-write) is dropped.
+    """
+
+    def __init__(self, path, beams=SCAN_BEAMS, angle_min=-SCAN_FOV / 2, angle_max=SCAN_FOV / 2, range_max=MAX_RANGE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            with ScanLog(path) as log:
+                if log.beams != beams:
+                    raise ValueError(f"{path} has {log.beams} beams per scan, not {beams}")
+            self._file = open(path, "r+b")
+            torn = (os.path.getsize(path) - HEADER_SIZE) % record_dtype(beams).itemsize
+            if torn:
+                logger.warning("Dropping a partial record of %d bytes at the end of %s", torn, path)
+                self._file.truncate(os.path.getsize(path) - torn)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION, 0, beams, angle_min, angle_max, range_max).ljust(HEADER_SIZE, b"\0"))
+        self.path = path
+        self.beams = beams
+        self._dtype = record_dtype(beams)
+
+    def write(self, stamp, ranges):
+        self.write_many([stamp], [ranges])
+
+    def write_many(self, stamps, ranges):
+        records = np.empty(len(stamps), dtype=self._dtype)
+        records["stamp"] = stamps
+        records["ranges"] = ranges
+        self._file.write(records.tobytes())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ScanLog:
+    """
+    Read-only, memory-mapped view of a scan log.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a scan log (truncated header)")
+        magic, version, _, beams, angle_min, angle_max, range_max = HEADER.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a scan log")
+        if version != VERSION:
+            raise ValueError(f"Unsupported scan log version {version} in {path}")
+
+        self.path = path
+        self.beams = beams
+        self.angle_min = angle_min
+        self.angle_max = angle_max
+        self.range_max = range_max
+        self.angles = np.linspace(angle_min, angle_max, beams)
+
+        dtype = record_dtype(beams)
+        count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+        self._records = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,)) if count else np.empty(0, dtype)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __repr__(self):
+        return f"ScanLog({self.path!r}, {len(self)} scans of {self.beams} beams)"
+
+    @property
+    def stamps(self):
+        return self._records["stamp"]
+
+    @property
+    def duration(self):
+        return float(self.stamps[-1] - self.stamps[0]) if len(self) > 1 else 0.0
+
+    def frame(self, index):
+        """
+        (stamp, ranges) of one scan, ranges as float64.
+        """
+
+        record = self._records[index]
+        return float(record["stamp"]), record["ranges"].astype(float)
+
+    def chunks(self, chunk_size=1024, start=0, stop=None):
+        """
+        Yield (first index, stamps, ranges) for consecutive chunks of at most chunk_size
+        scans. Only the chunk being processed is paged in.
+        """
+
+        stop = len(self) if stop is None else min(stop, len(self))
+        for first in range(start, stop, chunk_size):
+            records = self._records[first:min(first + chunk_size, stop)]
+            yield first, np.array(records["stamp"]), records["ranges"].astype(float)
+
+    def close(self):
+        self._records = np.empty(0, self._records.dtype)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def select_frame_gaps(ranges, params):
+    """
+    Disparity extender and gap selection on a chunk of scans (F, N) with one params dict.
+    Returns (extended ranges, gap_start, gap_stop, target), see controller_sim.select_gaps.
+    """
+
+    extended = extend_disparities(ranges, params["disparity_extender"])
+    gap_start, gap_stop, target = select_gaps(extended, params["window_half_size"], params["max_actionable_dist"])
+    return extended, gap_start, gap_stop, target
+
+
+def gap_frames(log, params, chunk_size=1024, start=0, stop=None):
+    """
+    Yield a GapFrames of arrays per chunk of the log: frame index, stamp, the chosen gap
+    and the steering angle towards its target beam.
+    """
+
+    for first, stamps, ranges in log.chunks(chunk_size, start, stop):
+        _, gap_start, gap_stop, target = select_frame_gaps(ranges, params)
+        index = np.arange(first, first + len(stamps))
+        yield GapFrames(index, stamps, gap_start, gap_stop, target, log.angles[target])
+
+
+def record_synthetic(path, seconds=600.0, rate=40.0, beams=SCAN_BEAMS, seed=0, chunk_size=4096):
+    """
+    Record a synthetic log: a corridor of varying width with an obstacle drifting across
+    it, plus range noise. Written chunk by chunk.
+    """
+
+    rng = np.random.default_rng(seed)
+    count = int(seconds * rate)
+    with ScanLogWriter(path, beams) as writer:
+        for first in range(0, count, chunk_size):
+            t = np.arange(first, min(first + chunk_size, count)) / rate
+            obstacle = (1.5 + 1.0 * np.sin(t / 7.0), 0.6 * np.sin(t / 3.0), 0.2 + 0.1 * np.sin(t / 11.0) ** 2)
+            ranges = synthetic_scan(beams, obstacle, half_width=1.2 + 0.4 * np.sin(t / 13.0))
+            ranges = np.clip(ranges + rng.normal(0, 0.01, ranges.shape), 0, MAX_RANGE)
+            writer.write_many(t, ranges)
+    return count
+
+
+def import_bag(bag_path, path, topic="/scan"):
+    """
+    Convert the LaserScan messages of a rosbag (ROS 1 or 2) into a scan log. Needs the
+    rosbags package (pip install rosbags); ROS itself is not needed.
+    """
+
+    try:
+        from pathlib import Path
+
+        from rosbags.highlevel import AnyReader
+    except ImportError:
+        raise ImportError("Importing rosbags needs the rosbags package: pip install rosbags") from None
+
+    count = 0
+    writer = None
+    with AnyReader([Path(bag_path)]) as reader:
+        connections = [connection for connection in reader.connections if connection.topic == topic]
+        if not connections:
+            raise ValueError(f"No topic {topic} in {bag_path}")
+        for connection, timestamp, rawdata in reader.messages(connections=connections):
+            msg = reader.deserialize(rawdata, connection.msgtype)
+            if writer is None:
+                writer = ScanLogWriter(path, len(msg.ranges), msg.angle_min, msg.angle_max, msg.range_max)
+            writer.write(timestamp / 1e9, np.nan_to_num(np.asarray(msg.ranges, dtype=float), nan=0.0, posinf=msg.range_max))
+            count += 1
+    if writer is not None:
+        writer.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record, import and process scan logs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record-synthetic", help="Record a synthetic scan log")
+    record.add_argument("path", nargs="?", default=SCAN_LOG_PATH)
+    record.add_argument("--seconds", type=float, default=600)
+    record.add_argument("--rate", type=float, default=40)
+
+    bag = commands.add_parser("import-bag", help="Convert the LaserScan topic of a rosbag")
+    bag.add_argument("bag")
+    bag.add_argument("path", nargs="?", default=SCAN_LOG_PATH)
+    bag.add_argument("--topic", default="/scan")
+
+    gaps = commands.add_parser("gaps", help="Run gap selection over a log")
+    gaps.add_argument("path", nargs="?", default=SCAN_LOG_PATH)
+    gaps.add_argument("--window-half-size", type=int, default=40)
+    gaps.add_argument("--disparity-extender", type=int, default=50)
+    gaps.add_argument("--max-actionable-dist", type=float, default=2.0)
+
+    args = parser.parse_args()
+    if args.command == "record-synthetic":
+        print(f"Recorded {record_synthetic(args.path, args.seconds, args.rate)} scans to {args.path}")
+    elif args.command == "import-bag":
+        print(f"Imported {import_bag(args.bag, args.path, args.topic)} scans to {args.path}")
+    else:
+        params = {
+            "window_half_size": args.window_half_size,
+            "disparity_extender": args.disparity_extender,
+            "max_actionable_dist": args.max_actionable_dist,
+        }
+        with ScanLog(args.path) as log:
+            start = time.perf_counter()
+            frames = no_gap = 0
+            steer = []
+            for chunk in gap_frames(log, params):
+                frames += len(chunk.index)
+                no_gap += int((chunk.gap_start < 0).sum())
+                steer.append(np.degrees(chunk.steer))
+            elapsed = time.perf_counter() - start
+            steer = np.concatenate(steer) if steer else np.zeros(0)
+            print(f"{log}: {frames} frames in {elapsed:.2f} s ({log.duration / elapsed:.0f}x real time)")
+            if frames:
+                print(f"no gap in {no_gap} frames, steering {steer.min():.1f} to {steer.max():.1f} deg (mean |steer| {np.abs(steer).mean():.1f} deg)")
+
+
+if __name__ == "__main__":
+    main()
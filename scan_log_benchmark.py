@@ -0,0 +1,69 @@
+"""
+Benchmark of the scan log reader: records a synthetic log (10 minutes at 40 Hz by
+default), then runs disparity extension and gap selection over every frame, streaming it
+chunk by chunk from the memory map. Reports the speed against real time and the
+anonymous (non file-backed) memory in use, which stays at the size of a chunk rather than
+the size of the log. Also reports the latency of random access to single frames, as used
+by the scrub slider.
+
+Usage:
+    python scan_log_benchmark.py [--seconds 600] [--rate 40] [--chunk-size 1024]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from param_schema import load_schema
+from scan_log import ScanLog, gap_frames, record_synthetic, select_frame_gaps
+
+
+def anonymous_memory_mb():
+    # RssAnon excludes the file pages of the memory map, which the kernel can drop at will.
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=600)
+    parser.add_argument("--rate", type=float, default=40)
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    args = parser.parse_args()
+    params = load_schema("gap_follow").defaults()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scans.rrsl")
+        start = time.perf_counter()
+        count = record_synthetic(path, args.seconds, args.rate)
+        print(f"recorded {count} scans ({os.path.getsize(path) / 2 ** 20:.0f} MB) in {time.perf_counter() - start:.1f} s")
+
+        with ScanLog(path) as log:
+            baseline = peak = anonymous_memory_mb()
+            start = time.perf_counter()
+            frames = 0
+            for chunk in gap_frames(log, params, args.chunk_size):
+                frames += len(chunk.index)
+                peak = max(peak, anonymous_memory_mb())
+            elapsed = time.perf_counter() - start
+            print(
+                f"gap selection over {frames} frames: {elapsed:.2f} s, {frames / elapsed:.0f} frames/s, "
+                f"{log.duration / elapsed:.0f}x real time; anonymous memory +{peak - baseline:.0f} MB "
+                f"for a {os.path.getsize(path) / 2 ** 20:.0f} MB log"
+            )
+
+            indices = [random.randrange(len(log)) for _ in range(200)]
+            start = time.perf_counter()
+            for index in indices:
+                _, ranges = log.frame(index)
+                select_frame_gaps(ranges[None], params)
+            print(f"random frame + gap selection (scrubbing): {(time.perf_counter() - start) / len(indices) * 1000:.2f} ms per frame")
+
+
+if __name__ == "__main__":
+    main()
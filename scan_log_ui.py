@@ -0,0 +1,141 @@
+"""
+Scan log preview panel of the gap_follow tab (declared in schemas/gap_follow.json).
+
+Load a recorded scan log (see scan_log.py) and scrub through it: for the current slider
+values the panel shows the frame after disparity extension with the chosen gap, and the
+steering angle towards the chosen gap over the whole log.
+"""
+
+import os
+from functools import lru_cache
+
+import gradio as gr
+import numpy as np
+import pandas as pd
+
+from param_ui import collect_params
+from scan_log import SCAN_LOG_PATH, ScanLog, gap_frames, select_frame_gaps
+
+# Points of the whole-log steering plot
+MAX_PLOT_POINTS = 2000
+
+
+@lru_cache(maxsize=4)
+def _open_log(path, mtime, size):
+    return ScanLog(path)
+
+
+def get_log(path):
+    """
+    The ScanLog at path, reopened when the file changes.
+    """
+
+    stat = os.stat(path)
+    return _open_log(path, stat.st_mtime, stat.st_size)
+
+
+def frame_plot(log, index, params):
+    """
+    This function returns the plot data of one frame: raw and extended scan, the chosen gap
+    and a ray towards its target.
+    """
+
+    _, ranges = log.frame(index)
+    extended, gap_start, gap_stop, target = select_frame_gaps(ranges[None], params)
+    extended = extended[0]
+    cos, sin = np.cos(log.angles), np.sin(log.angles)
+    gap = slice(gap_start[0], gap_stop[0] + 1) if gap_start[0] >= 0 else slice(0, 0)
+    ray = np.linspace(0, min(3.0, extended[target[0]]), 20)
+
+    series = [
+        ("scan", ranges * cos, ranges * sin),
+        ("extended", extended * cos, extended * sin),
+        ("gap", (extended * cos)[gap], (extended * sin)[gap]),
+        ("target", ray * cos[target[0]], ray * sin[target[0]]),
+    ]
+    return pd.DataFrame({
+        "x": np.concatenate([x for _, x, _ in series]),
+        "y": np.concatenate([y for _, _, y in series]),
+        "series": np.concatenate([np.full(len(x), name) for name, x, _ in series]),
+    })
+
+
+def steering_plot(log, params):
+    """
+    This function runs gap selection over the whole log and returns the steering angle
+    per frame, decimated to MAX_PLOT_POINTS.
+    """
+
+    stamps, steer = [], []
+    for chunk in gap_frames(log, params):
+        stamps.append(chunk.stamp)
+        steer.append(np.degrees(chunk.steer))
+    if not stamps:
+        return pd.DataFrame({"time (s)": [], "steering (deg)": []})
+    stamps, steer = np.concatenate(stamps), np.concatenate(steer)
+    stride = max(1, len(stamps) // MAX_PLOT_POINTS)
+    return pd.DataFrame({"time (s)": stamps[::stride] - stamps[0], "steering (deg)": steer[::stride]})
+
+
+def build_scan_log_panel(schema, inputs):
+    """
+    This function builds the scan log preview inside the current controller UI.
+    """
+
+    def params_of(values):
+        try:
+            return schema.validate(collect_params(schema, values))
+        except ValueError as e:
+            raise gr.Error(str(e))
+
+    def load(path, *values):
+        try:
+            log = get_log(path)
+        except (OSError, ValueError) as e:
+            raise gr.Error(f"Cannot open scan log: {e}")
+        if not len(log):
+            raise gr.Error(f"{path} has no scans")
+        params = params_of(values)
+        info = f"{len(log)} scans of {log.beams} beams, {log.duration:.1f} s"
+        return info, gr.Slider(maximum=max(len(log) - 1, 1), value=0), frame_plot(log, 0, params), steering_plot(log, params)
+
+    def show_frame(path, index, *values):
+        if not os.path.exists(path):
+            return gr.skip()
+        log = get_log(path)
+        if not len(log):
+            return gr.skip()
+        try:
+            params = schema.validate(collect_params(schema, values))
+        except ValueError:
+            return gr.skip()
+        return frame_plot(log, min(int(index), len(log) - 1), params)
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Scan Log Preview")
+            with gr.Row():
+                log_path = gr.Textbox(label="Scan Log", value=SCAN_LOG_PATH, info="Record one with `python scan_log.py record-synthetic` or `import-bag`.")
+                log_info = gr.Textbox(label="Log", interactive=False)
+            with gr.Row():
+                load_button = gr.Button("Load / Run over whole log")
+            frame = gr.Slider(minimum=0, maximum=1, step=1, value=0, label="Frame", interactive=True)
+            with gr.Row():
+                scan_plot = gr.ScatterPlot(x="x", y="y", color="series", x_title="x (m)", y_title="y (m)", label="Frame")
+                gap_plot = gr.LinePlot(x="time (s)", y="steering (deg)", label="Steering towards the chosen gap")
+
+    load_button.click(
+        fn=load,
+        inputs=[log_path] + inputs,
+        outputs=[log_info, frame, scan_plot, gap_plot]
+    )
+
+    for component in [frame] + inputs:
+        component.change(
+            fn=show_frame,
+            inputs=[log_path, frame] + inputs,
+            outputs=scan_plot,
+            queue=False,
+            show_progress="hidden",
+            trigger_mode="always_last"
+        )
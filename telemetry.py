@@ -0,0 +1,593 @@
+"""
+Telemetry from the car (lap times, speed, cross track error), joined to the flagged
+configuration that was active, so configurations can be ranked by measured performance.
+
+Samples are JSON objects, one per line (a local stand-in for the ROS topics):
+
+    {"t": 1760000000.02, "controller": "pure_pursuit", "speed": 3.1, "cte": 0.05, "steering": 0.1}
+    {"t": 1760000018.40, "controller": "pure_pursuit", "lap_time": 18.4, "start": 1760000000.0}
+
+A lap belongs to the configuration active when it started ("start", t - lap_time if
+absent); a window to the one active at its first sample.
+
+They arrive as UDP datagrams of one or more lines (ROBORACER_TELEMETRY, default
+127.0.0.1:47861) or from a JSON lines file, optionally followed as it grows.
+
+TelemetryIngestor works in bounded memory:
+    - only the controllers of the schemas are taken; samples of any other controller
+      name are dropped and counted (unknown)
+    - the latest samples of every controller go to a fixed size NumPy RingBuffer, for
+      live views such as telemetry_ui.py (capacity ROBORACER_TELEMETRY_CAPACITY, default one hour at 100 Hz);
+      samples older than the newest buffered one are left out of it and counted (late)
+    - samples are downsampled into windows of `window` seconds (count, mean speed,
+      RMS and max |cross track error|, mean |steering|) with running sums
+Every closed window and every lap is joined to the configuration active at its time,
+the latest flag of the controller in the flag history, and stored in the telemetry
+database (ROBORACER_TELEMETRY_DB, next to the flag history by default). rank() then
+aggregates per configuration in SQL, without touching the raw samples.
+
+    python telemetry.py ingest [--file telemetry.jsonl [--follow]]
+    python telemetry.py drive pure_pursuit --laps 3    (stand-in car, see drive())
+    python telemetry.py rank pure_pursuit
+"""
+
+import argparse
+import collections
+import json
+import logging
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import lap_sim
+from flag_history import HISTORY_PATH, get_history
+from param_schema import list_schemas
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_DB = os.environ.get("ROBORACER_TELEMETRY_DB", os.path.join(os.path.dirname(HISTORY_PATH) or ".", "telemetry.sqlite3"))
+DEFAULT_CAPACITY = int(os.environ.get("ROBORACER_TELEMETRY_CAPACITY", 100 * 3600))
+DEFAULT_WINDOW = 1.0
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47861
+MAX_DATAGRAM = 65507
+
+COLUMNS = ("t", "speed", "cte", "steering")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS windows (
+    controller TEXT NOT NULL,
+    record_id TEXT,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    samples INTEGER NOT NULL,
+    mean_speed REAL,
+    mean_sq_cte REAL,
+    max_cte REAL,
+    mean_abs_steering REAL
+);
+CREATE INDEX IF NOT EXISTS windows_config ON windows (controller, record_id);
+CREATE TABLE IF NOT EXISTS laps (
+    controller TEXT NOT NULL,
+    record_id TEXT,
+    finished_at REAL NOT NULL,
+    lap_time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS laps_config ON laps (controller, record_id, lap_time);
+"""
+
+Window = collections.namedtuple("Window", "controller record_id start end samples mean_speed mean_sq_cte max_cte mean_abs_steering")
+Lap = collections.namedtuple("Lap", "controller record_id finished_at lap_time")
+ConfigPerformance = collections.namedtuple("ConfigPerformance", "record_id laps best_lap mean_lap mean_speed rms_cte max_cte samples")
+
+
+def default_address():
+    """
+    Telemetry address from ROBORACER_TELEMETRY ("host:port"), or the local default.
+    """
+
+    value = os.environ.get("ROBORACER_TELEMETRY")
+    if not value:
+        return (DEFAULT_HOST, DEFAULT_PORT)
+    host, _, port = value.rpartition(":")
+    return (host or DEFAULT_HOST, int(port))
+
+
+class RingBuffer:
+    """
+    Fixed size buffer of the latest rows (one column per name in columns). Thread safe.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, columns=COLUMNS):
+        self.capacity = capacity
+        self.columns = columns
+        self._data = np.empty((capacity, len(columns)))
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._end, self.capacity)
+
+    @property
+    def total(self):
+        """
+        Rows ever appended.
+        """
+
+        return self._end
+
+    def extend(self, rows):
+        rows = np.asarray(rows, dtype=float).reshape(-1, len(self.columns))
+        with self._lock:
+            if len(rows) > self.capacity:
+                self._end += len(rows) - self.capacity
+                rows = rows[-self.capacity:]
+            start = self._end % self.capacity
+            first = min(len(rows), self.capacity - start)
+            self._data[start:start + first] = rows[:first]
+            self._data[:len(rows) - first] = rows[first:]
+            self._end += len(rows)
+
+    def last(self):
+        """
+        Copy of the latest row, or None.
+        """
+
+        with self._lock:
+            return self._data[(self._end - 1) % self.capacity].copy() if self._end else None
+
+    def view(self, since=None):
+        """
+        Copy of the buffered rows, oldest first; with since, only the rows whose first
+        column (the time) is at least since, found by bisection before copying, so the
+        rows must have been appended in time order.
+        """
+
+        with self._lock:
+            if self._end <= self.capacity:
+                segments = [self._data[:self._end]]
+            else:
+                start = self._end % self.capacity
+                segments = [self._data[start:], self._data[:start]]
+            if since is not None:
+                segments = [segment[np.searchsorted(segment[:, 0], since):] for segment in segments]
+            if len(segments) == 1:
+                return segments[0].copy()
+            return np.concatenate(segments)
+
+
+class TelemetryStore:
+    """
+    Windows and laps joined to flag record ids, in SQLite.
+    """
+
+    def __init__(self, path=TELEMETRY_DB):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def add(self, windows=(), laps=()):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT INTO windows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", windows)
+                self._conn.executemany("INSERT INTO laps VALUES (?, ?, ?, ?)", laps)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def rank(self, controller, limit=20):
+        """
+        ConfigPerformance of the configurations of controller with telemetry: best lap
+        first, configurations without a completed lap last (by RMS cross track error).
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                WITH keys AS (
+                    SELECT record_id FROM windows WHERE controller = :c AND record_id IS NOT NULL
+                    UNION SELECT record_id FROM laps WHERE controller = :c AND record_id IS NOT NULL
+                ), w AS (
+                    SELECT record_id, SUM(samples) AS samples, SUM(mean_speed * samples) / SUM(samples) AS mean_speed,
+                           SUM(mean_sq_cte * samples) / SUM(samples) AS mean_sq_cte, MAX(max_cte) AS max_cte
+                    FROM windows WHERE controller = :c GROUP BY record_id
+                ), l AS (
+                    SELECT record_id, COUNT(*) AS laps, MIN(lap_time) AS best_lap, AVG(lap_time) AS mean_lap
+                    FROM laps WHERE controller = :c GROUP BY record_id
+                )
+                SELECT keys.record_id, COALESCE(l.laps, 0), l.best_lap, l.mean_lap, w.mean_speed, w.mean_sq_cte, w.max_cte, COALESCE(w.samples, 0)
+                FROM keys LEFT JOIN w USING (record_id) LEFT JOIN l USING (record_id)
+                ORDER BY l.best_lap IS NULL, l.best_lap, w.mean_sq_cte
+                LIMIT :limit
+                """,
+                {"c": controller, "limit": limit},
+            ).fetchall()
+        return [
+            ConfigPerformance(record_id, laps, best_lap, mean_lap, mean_speed, None if mean_sq is None else math.sqrt(mean_sq), max_cte, samples)
+            for record_id, laps, best_lap, mean_lap, mean_speed, mean_sq, max_cte, samples in rows
+        ]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _OpenWindow:
+
+    def __init__(self, index):
+        self.index = index
+        self.start = math.inf
+        self.end = -math.inf
+        self.count = 0
+        self.speed = 0.0
+        self.sq_cte = 0.0
+        self.max_cte = 0.0
+        self.abs_steering = 0.0
+
+
+class TelemetryIngestor:
+    """
+    Buffers, downsamples and stores telemetry samples (see the module docstring).
+    """
+
+    def __init__(self, store=None, history=None, window=DEFAULT_WINDOW, capacity=DEFAULT_CAPACITY, controllers=None):
+        self.store = store or TelemetryStore()
+        self.history = history or get_history()
+        self.window = window
+        self.capacity = capacity
+        self.controllers = frozenset(controllers if controllers is not None else (schema.name for schema in list_schemas()))
+        self.buffers = {}
+        self.samples = 0
+        self.unknown = 0
+        self.late = 0
+        self.windows = 0
+        self.laps = 0
+        self._open = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def buffer(self, controller):
+        """
+        The RingBuffer of controller's latest samples (columns COLUMNS), in time order.
+        """
+
+        if controller not in self.controllers:
+            raise ValueError(f"Unknown controller: {controller!r}")
+        if controller not in self.buffers:
+            self.buffers[controller] = RingBuffer(self.capacity)
+        return self.buffers[controller]
+
+    def active_config(self, controller, t):
+        """
+        The record id of the latest flag of controller before t, or None. Simulated flags
+        (sweeps, auto-tune trials) never ran on the car and are left out.
+        """
+
+        records = self.history.query(controller=controller, until=t, limit=1, simulated=False).records
+        return records[0].record_id if records else None
+
+    def _close(self, controller, window):
+        record_id = self.active_config(controller, window.start)
+        return Window(
+            controller, record_id, window.start, window.end, window.count, window.speed / window.count,
+            window.sq_cte / window.count, window.max_cte, window.abs_steering / window.count,
+        )
+
+    def _aggregate(self, controller, rows, closed):
+        # Samples are grouped by window index; the running sums of the open window absorb
+        # late samples, a newer window closes it.
+        index = np.floor(rows[:, 0] / self.window).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+        t, speed, cte, steering = rows.T
+        counts = np.diff(np.r_[starts, len(rows)])
+        sums = (
+            np.add.reduceat(speed, starts), np.add.reduceat(cte * cte, starts),
+            np.maximum.reduceat(np.abs(cte), starts), np.add.reduceat(np.abs(steering), starts),
+            np.minimum.reduceat(t, starts), np.maximum.reduceat(t, starts),
+        )
+        for group, window_index in enumerate(index[starts]):
+            current = self._open.get(controller)
+            if current is None or window_index > current.index:
+                if current is not None:
+                    closed.append(self._close(controller, current))
+                current = self._open[controller] = _OpenWindow(window_index)
+            current.count += int(counts[group])
+            current.speed += sums[0][group]
+            current.sq_cte += sums[1][group]
+            current.max_cte = max(current.max_cte, sums[2][group])
+            current.abs_steering += sums[3][group]
+            current.start = min(current.start, sums[4][group])
+            current.end = max(current.end, sums[5][group])
+
+    def ingest(self, samples):
+        """
+        Ingest an iterable of sample dicts; returns the number of samples taken.
+        """
+
+        rows = collections.defaultdict(list)
+        laps = []
+        unknown = 0
+        for sample in samples:
+            try:
+                controller = sample["controller"]
+                if controller not in self.controllers:
+                    # Every name would get a buffer of its own.
+                    unknown += 1
+                    continue
+                if "lap_time" in sample:
+                    t, lap_time = float(sample["t"]), float(sample["lap_time"])
+                    laps.append((controller, t, lap_time, float(sample.get("start", t - lap_time))))
+                else:
+                    rows[controller].append((float(sample["t"]), float(sample["speed"]), float(sample.get("cte", 0.0)), float(sample.get("steering", 0.0))))
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Ignoring invalid telemetry sample %r", sample)
+
+        closed = []
+        with self._lock:
+            for controller, controller_rows in rows.items():
+                controller_rows = np.array(controller_rows)
+                buffer = self.buffer(controller)
+                # view() bisects on time, so late samples stay out of the buffer; the
+                # windows still count them.
+                last = buffer.last()
+                newest = np.maximum.accumulate(np.r_[-np.inf if last is None else last[0], controller_rows[:-1, 0]])
+                in_order = controller_rows[:, 0] >= newest
+                buffer.extend(controller_rows[in_order])
+                self.late += len(controller_rows) - int(np.count_nonzero(in_order))
+                self._aggregate(controller, controller_rows, closed)
+            joined_laps = [Lap(controller, self.active_config(controller, start), t, lap_time) for controller, t, lap_time, start in laps]
+            self.samples += sum(len(controller_rows) for controller_rows in rows.values())
+            self.unknown += unknown
+            self.windows += len(closed)
+            self.laps += len(joined_laps)
+        if closed or joined_laps:
+            self.store.add(closed, joined_laps)
+        return sum(len(controller_rows) for controller_rows in rows.values()) + len(laps)
+
+    def flush(self):
+        """
+        Close and store the open windows (end of a stream).
+        """
+
+        with self._lock:
+            closed = [self._close(controller, window) for controller, window in self._open.items()]
+            self._open.clear()
+            self.windows += len(closed)
+        if closed:
+            self.store.add(closed)
+
+    def ingest_lines(self, lines):
+        samples = []
+        for line in lines:
+            line = line.strip()
+            if line:
+                try:
+                    samples.append(json.loads(line))
+                except ValueError:
+                    logger.warning("Ignoring invalid telemetry line %r", line[:100])
+        return self.ingest(samples)
+
+    def ingest_file(self, path, follow=False, batch_lines=10000, stop_event=None):
+        """
+        Ingest a JSON lines file in batches; with follow, keep reading as it grows until
+        stop_event is set.
+        """
+
+        stop_event = stop_event or self._stop
+        with open(path) as f:
+            while not stop_event.is_set():
+                lines = f.readlines(batch_lines * 100)
+                if lines:
+                    self.ingest_lines(lines)
+                elif follow:
+                    time.sleep(0.1)
+                else:
+                    break
+        self.flush()
+
+    def serve_udp(self, address=None, stop_event=None, ready=None):
+        """
+        Ingest datagrams sent to address until stop_event is set.
+        """
+
+        stop_event = stop_event or self._stop
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(address or default_address())
+        sock.settimeout(0.2)
+        self.address = sock.getsockname()
+        if ready is not None:
+            ready.set()
+        try:
+            while not stop_event.is_set():
+                try:
+                    datagrams = [sock.recv(MAX_DATAGRAM)]
+                    # Drain what else is queued, to ingest it as one batch.
+                    sock.setblocking(False)
+                    try:
+                        while len(datagrams) < 256:
+                            datagrams.append(sock.recv(MAX_DATAGRAM))
+                    except BlockingIOError:
+                        pass
+                    sock.settimeout(0.2)
+                except socket.timeout:
+                    continue
+                self.ingest_lines(b"\n".join(datagrams).decode(errors="replace").splitlines())
+        finally:
+            sock.close()
+            self.flush()
+
+    def start(self, address=None):
+        """
+        Serve UDP from a background thread; returns once the socket is bound (or failed).
+        """
+
+        if self._thread is None:
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._serve, args=(address, ready), name="telemetry", daemon=True)
+            self._thread.start()
+            ready.wait(5)
+        return self
+
+    def _serve(self, address, ready):
+        try:
+            self.serve_udp(address, ready=ready)
+        except OSError as e:
+            logger.warning("Telemetry ingestion not started: %s", e)
+            ready.set()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+            self._thread = None
+
+
+class TelemetryPublisher:
+    """
+    Sends samples as JSON lines datagrams (the car side stand-in).
+    """
+
+    def __init__(self, address=None, batch=20):
+        self.address = address or default_address()
+        self.batch = batch
+        self._pending = []
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, sample):
+        self._pending.append(json.dumps(sample, separators=(",", ":")))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            try:
+                self._sock.sendto("\n".join(self._pending).encode(), self.address)
+            except OSError:
+                pass
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        self._sock.close()
+
+
+def drive(controller, laps=3, speedup=1.0, publisher=None, history=None, rate_divider=1):
+    """
+    Stand-in car: drive laps of lap_sim with the latest flagged configuration of
+    controller (re-read before every lap, like a node picking up a new flag) and send the
+    telemetry, paced at speedup times real time. Returns the lap metrics.
+    """
+
+    from param_schema import load_schema
+
+    publisher = publisher or TelemetryPublisher()
+    history = history or get_history()
+    results = []
+    wall_start = time.time()
+    sim_offset = 0.0
+    for _ in range(laps):
+        record = history.latest(controller)
+        params = record.params if record else load_schema(controller).defaults()
+        steps = [0]
+        lap_start = wall_start + sim_offset / speedup
+
+        def on_step(t, s, e, speed, steer):
+            steps[0] += 1
+            if steps[0] % rate_divider:
+                return
+            sim_t = sim_offset + t
+            delay = wall_start + sim_t / speedup - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            publisher.send({"t": wall_start + sim_t / speedup, "controller": controller, "speed": round(speed, 4),
+                            "cte": round(e, 4), "steering": round(steer, 4)})
+
+        metrics = lap_sim.simulate_lap(controller, params, on_step)
+        sim_offset += steps[0] * lap_sim.DT
+        if metrics["completed"]:
+            publisher.send({"t": wall_start + sim_offset / speedup, "controller": controller, "lap_time": metrics["lap_time"], "start": lap_start})
+        publisher.flush()
+        results.append(metrics)
+    return results
+
+
+_default_ingestor = None
+_default_ingestor_lock = threading.Lock()
+
+
+def get_ingestor():
+    """
+    The process' ingestor, serving the default UDP address.
+    """
+
+    global _default_ingestor
+    with _default_ingestor_lock:
+        if _default_ingestor is None:
+            _default_ingestor = TelemetryIngestor().start()
+        return _default_ingestor
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description="Ingest telemetry and rank configurations by it.")
+    parser.add_argument("--db", default=TELEMETRY_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Ingest from UDP (default) or a JSON lines file")
+    ingest.add_argument("--file")
+    ingest.add_argument("--follow", action="store_true")
+    ingest.add_argument("--window", type=float, default=DEFAULT_WINDOW)
+
+    drive_parser = commands.add_parser("drive", help="Stand-in car streaming simulated laps")
+    drive_parser.add_argument("controller")
+    drive_parser.add_argument("--laps", type=int, default=3)
+    drive_parser.add_argument("--speedup", type=float, default=1.0)
+
+    rank = commands.add_parser("rank", help="Rank the configurations of a controller by lap performance")
+    rank.add_argument("controller")
+    rank.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "drive":
+        for metrics in drive(args.controller, args.laps, args.speedup):
+            logger.info("lap: %s", metrics)
+        return
+
+    store = TelemetryStore(args.db)
+    if args.command == "rank":
+        history = get_history()
+        for row in store.rank(args.controller, args.limit):
+            record = history.get(row.record_id)
+            best = "-" if row.best_lap is None else f"{row.best_lap:.2f} s"
+            print(f"{row.record_id}  laps {row.laps:3d}  best {best:>8s}  speed {row.mean_speed or 0:5.2f}  "
+                  f"rms cte {row.rms_cte or 0:.3f}  {record.flag_reason if record else ''}  {record.params if record else ''}")
+        return
+
+    ingestor = TelemetryIngestor(store, window=args.window)
+    try:
+        if args.file:
+            ingestor.ingest_file(args.file, follow=args.follow)
+        else:
+            logger.info("Ingesting telemetry on udp://%s:%d", *default_address())
+            ingestor.serve_udp()
+    except KeyboardInterrupt:
+        ingestor.flush()
+    logger.info("%d samples, %d windows, %d laps (%d samples of unknown controllers, %d late)",
+                ingestor.samples, ingestor.windows, ingestor.laps, ingestor.unknown, ingestor.late)
+
+
+if __name__ == "__main__":
+    main()
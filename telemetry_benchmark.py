@@ -0,0 +1,130 @@
+"""
+Benchmark of telemetry ingestion (telemetry.py): an hour of 100 Hz pure_pursuit telemetry
+with a lap every ~15 s, driven under 20 configurations flagged one after the other.
+
+Reports the ingestion rate from a JSON lines file, anonymous memory while ingesting
+(bounded by the ring buffer, whatever the length of the stream), the rank() latency and
+whether the ranking finds the configuration with the best laps. Also sends a minute of
+telemetry over UDP to an ingesting thread and counts what arrived.
+
+Usage:
+    python telemetry_benchmark.py [--hours 1] [--rate 100] [--configs 20]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from flag_history import FlagHistory
+from flag_history_benchmark import random_params, timed
+from scan_log_benchmark import anonymous_memory_mb
+from telemetry import TelemetryIngestor, TelemetryPublisher, TelemetryStore
+
+CONTROLLER = "pure_pursuit"
+LAP_DISTANCE = 45.0
+
+
+def write_telemetry(path, start, seconds, rate, quality, rng):
+    """
+    Samples of every config period (quality[i] scales speed up and error down) and laps.
+    """
+
+    count = int(seconds * rate)
+    t = start + np.arange(count) / rate
+    config = np.minimum((np.arange(count) * len(quality)) // count, len(quality) - 1)
+    speed = 2.0 + 2.0 * quality[config] + rng.normal(0, 0.1, count)
+    cte = rng.normal(0, 0.2 - 0.15 * quality[config])
+    steering = rng.normal(0, 0.1, count)
+    distance = np.cumsum(speed) / rate
+    laps = np.flatnonzero(np.diff(np.floor(distance / LAP_DISTANCE)) > 0) + 1
+
+    with open(path, "w") as f:
+        lap_start = start
+        lap_iter = iter(laps.tolist() + [None])
+        next_lap = next(lap_iter)
+        for i in range(count):
+            f.write(f'{{"t":{t[i]:.3f},"controller":"{CONTROLLER}","speed":{speed[i]:.3f},"cte":{cte[i]:.4f},"steering":{steering[i]:.4f}}}\n')
+            if i == next_lap:
+                f.write(f'{{"t":{t[i]:.3f},"controller":"{CONTROLLER}","lap_time":{t[i] - lap_start:.3f},"start":{lap_start:.3f}}}\n')
+                lap_start = t[i]
+                next_lap = next(lap_iter)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=1)
+    parser.add_argument("--rate", type=float, default=100)
+    parser.add_argument("--configs", type=int, default=20)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    seconds = args.hours * 3600
+    start = 1.7e9
+
+    with tempfile.TemporaryDirectory() as directory:
+        history = FlagHistory(os.path.join(directory, "flag_history.sqlite3"))
+        period = seconds / args.configs
+        record_ids = history.append_many([
+            (CONTROLLER, random_params(random.Random(i), CONTROLLER), "Latest", "", start + i * period - 1)
+            for i in range(args.configs)
+        ])
+        quality = rng.permutation(args.configs) / (args.configs - 1)
+        best_record_id = record_ids[int(np.argmax(quality))]
+
+        path = os.path.join(directory, "telemetry.jsonl")
+        count = write_telemetry(path, start, seconds, args.rate, quality, rng)
+        size_mb = os.path.getsize(path) / 1e6
+
+        store = TelemetryStore(os.path.join(directory, "telemetry.sqlite3"))
+        ingestor = TelemetryIngestor(store, history)
+        memory = [anonymous_memory_mb()]
+        began = time.perf_counter()
+        with open(path) as f:
+            while True:
+                lines = f.readlines(1 << 20)
+                if not lines:
+                    break
+                ingestor.ingest_lines(lines)
+                memory.append(anonymous_memory_mb())
+        ingestor.flush()
+        elapsed = time.perf_counter() - began
+        print(f"ingested {count} samples ({size_mb:.0f} MB of JSON lines, {args.hours:g} h at {args.rate:g} Hz) in {elapsed:.1f} s: "
+              f"{count / elapsed:,.0f} samples/s, {seconds / elapsed:.0f}x real time")
+        print(f"{ingestor.windows} windows and {ingestor.laps} laps stored; ring buffer {len(ingestor.buffer(CONTROLLER))} rows "
+              f"({ingestor.buffer(CONTROLLER)._data.nbytes / 1e6:.1f} MB)")
+        quarter = len(memory) // 4
+        print("anonymous memory (MB) at 0/25/50/75/100 % of the stream: " + " / ".join(f"{memory[i]:.0f}" for i in (0, quarter, 2 * quarter, 3 * quarter, -1)))
+
+        ranking = store.rank(CONTROLLER)
+        print(f"rank() over {args.configs} configs: {timed(lambda: store.rank(CONTROLLER), 50):.2f} ms; "
+              f"best lap {ranking[0].best_lap:.2f} s by the best config: {ranking[0].record_id == best_record_id}")
+
+        udp_store = TelemetryStore(":memory:")
+        udp = TelemetryIngestor(udp_store, history)
+        address = ("127.0.0.1", 0)
+        ready = threading.Event()
+        thread = threading.Thread(target=udp.serve_udp, args=(address,), kwargs={"ready": ready})
+        thread.start()
+        ready.wait(5)
+        publisher = TelemetryPublisher(udp.address)
+        sent = int(60 * args.rate)
+        began = time.perf_counter()
+        for i in range(sent):
+            publisher.send({"t": start + i / args.rate, "controller": CONTROLLER, "speed": 3.0, "cte": 0.01, "steering": 0.0})
+        publisher.close()
+        time.sleep(0.5)
+        udp.stop()
+        thread.join()
+        print(f"UDP: sent a minute of telemetry ({sent} samples) in {time.perf_counter() - began - 0.5:.2f} s, ingested {udp.samples}")
+        store.close()
+        udp_store.close()
+        history.close()
+
+
+if __name__ == "__main__":
+    main()
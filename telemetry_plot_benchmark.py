@@ -0,0 +1,75 @@
+"""
+Benchmark of the live telemetry plots (telemetry_ui.py) with a full ring buffer (an hour
+of 100 Hz telemetry): time to build a refresh and its payload (the JSON the plots send
+to the browser, serialization included in the time) per window, decimated against
+every sample. Then an hour long session
+that keeps appending 100 Hz telemetry and refreshing the plots, with its anonymous memory.
+
+Usage:
+    python telemetry_plot_benchmark.py [--rate 100] [--session-hours 1] [--fps 5]
+"""
+
+import argparse
+import json
+import time
+
+import gradio as gr
+import numpy as np
+
+from flag_history_benchmark import timed
+from scan_log_benchmark import anonymous_memory_mb
+from telemetry import DEFAULT_CAPACITY, RingBuffer
+from telemetry_ui import PLOT_BUCKETS, SERIES, TIME, WINDOWS, live_frames
+
+
+def samples(rng, start, count, rate):
+    t = start + np.arange(count) / rate
+    return np.column_stack((t, 3 + rng.normal(0, 0.2, count), rng.normal(0, 0.1, count), rng.normal(0, 0.2, count)))
+
+
+PLOTS = [gr.LinePlot(x=TIME, y=title, render=False) for _, title in SERIES]
+
+
+def payload_bytes(frames):
+    return sum(len(json.dumps(plot.postprocess(frame).model_dump(), default=str)) for plot, frame in zip(PLOTS, frames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=100)
+    parser.add_argument("--session-hours", type=float, default=1)
+    parser.add_argument("--fps", type=float, default=5)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+
+    buffer = RingBuffer(DEFAULT_CAPACITY)
+    buffer.extend(samples(rng, 0.0, DEFAULT_CAPACITY, args.rate))
+    print(f"{'window':>8s} {'samples':>9s} {'refresh ms':>11s} {'payload KB':>11s} {'all samples ms':>15s} {'all samples KB':>15s}")
+    for name, window in WINDOWS.items():
+        def refresh(buckets):
+            return payload_bytes(live_frames(buffer, window, buckets)[1:])
+
+        print(f"{name:>8s} {int(min(window * args.rate, len(buffer))):9d} {timed(lambda: refresh(PLOT_BUCKETS), 10):11.1f} "
+              f"{refresh(PLOT_BUCKETS) / 1e3:11.1f} {timed(lambda: refresh(DEFAULT_CAPACITY), 3):15.1f} {refresh(DEFAULT_CAPACITY) / 1e3:15.1f}")
+
+    # A session refreshing the 1 h window at fps while the car streams: one refresh per
+    # rate / fps samples.
+    chunk = int(args.rate / args.fps)
+    refreshes = int(args.session_hours * 3600 * args.fps)
+    t = DEFAULT_CAPACITY / args.rate
+    memory = [anonymous_memory_mb()]
+    began = time.perf_counter()
+    for i in range(refreshes):
+        buffer.extend(samples(rng, t, chunk, args.rate))
+        t += chunk / args.rate
+        live_frames(buffer, WINDOWS["1 h"])
+        if i % max(1, refreshes // 6) == 0:
+            memory.append(anonymous_memory_mb())
+    memory.append(anonymous_memory_mb())
+    elapsed = time.perf_counter() - began
+    print(f"{args.session_hours:g} h session ({refreshes} refreshes of the 1 h window, {buffer.total} samples streamed) in {elapsed:.0f} s")
+    print("anonymous memory (MB) through the session: " + " / ".join(f"{mb:.0f}" for mb in memory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Live telemetry panel of the Wall Follow tab (declared in schemas/wall_follow.json).
+
+Plots the cross track error, steering and speed the car streams (see telemetry.py;
+`python telemetry.py drive wall_follow` stands in for the car) over a chosen window
+ending at the latest sample. The plots read the fixed size ring buffer of the UI's
+telemetry ingestor, so memory stays flat however long the session runs, and every
+series is decimated on the server to the min and max of PLOT_BUCKETS buckets: a refresh
+sends at most 2 * PLOT_BUCKETS points per plot, for ten seconds as for an hour of 100 Hz
+data. A gr.Timer refreshes the plots at most ROBORACER_PLOT_FPS (default 5) times per
+second, adjustable on the page.
+"""
+
+import os
+
+import gradio as gr
+import numpy as np
+import pandas as pd
+
+from telemetry import COLUMNS, get_ingestor
+
+PLOT_FPS = float(os.environ.get("ROBORACER_PLOT_FPS", 5))
+PLOT_BUCKETS = 500
+WINDOWS = {"10 s": 10, "1 min": 60, "10 min": 600, "1 h": 3600}
+SERIES = [("cte", "error (m)"), ("steering", "steering (rad)"), ("speed", "speed (m/s)")]
+TIME = "time (s)"
+
+
+def decimate_minmax(x, y, buckets=PLOT_BUCKETS):
+    """
+    The points of y holding the min and the max of each of buckets equal slices, in
+    order, so peaks survive the decimation. The oldest len(x) % buckets points are dropped.
+    """
+
+    if len(x) <= 2 * buckets:
+        return x, y
+    size = len(x) // buckets
+    skip = len(x) - size * buckets
+    blocks = y[skip:].reshape(buckets, size)
+    low, high = blocks.argmin(axis=1), blocks.argmax(axis=1)
+    base = skip + np.arange(buckets) * size
+    index = np.column_stack((base + np.minimum(low, high), base + np.maximum(low, high))).ravel()
+    return x[index], y[index]
+
+
+def live_frames(buffer, window, buckets=PLOT_BUCKETS):
+    """
+    This function returns a status line and a decimated plot frame per series, over the
+    last window seconds of a telemetry RingBuffer.
+    """
+
+    latest = buffer.last()
+    if latest is None:
+        return ["No telemetry received yet."] + [pd.DataFrame({TIME: [], title: []}) for _, title in SERIES]
+    rows = buffer.view(since=latest[0] - window)
+    t = rows[:, 0] - latest[0]
+    frames = []
+    for name, title in SERIES:
+        x, y = decimate_minmax(t, rows[:, COLUMNS.index(name)], buckets)
+        frames.append(pd.DataFrame({TIME: x, title: y}))
+    status = f"{len(rows)} samples, {len(frames[0])} plotted per series; buffer {len(buffer)} / {buffer.capacity} rows"
+    return [status] + frames
+
+
+def build_live_plot_panel(schema, inputs):
+    """
+    This function builds the live telemetry plots inside the current controller UI.
+    """
+
+    get_ingestor()
+
+    with gr.Row():
+        with gr.Column():
+            gr.Markdown("### Live Telemetry")
+            with gr.Row():
+                live = gr.Checkbox(label="Live Plot", value=True)
+                window = gr.Radio(label="Window", choices=list(WINDOWS), value="1 min")
+                fps = gr.Slider(label="Max Refresh Rate (per second)", minimum=0.5, maximum=30, step=0.5, value=PLOT_FPS)
+            status = gr.Textbox(label="Telemetry", interactive=False, info="Stream a simulated car with `python telemetry.py drive wall_follow`.")
+            with gr.Row():
+                plots = [gr.LinePlot(x=TIME, y=title, label=title.split(" ")[0].capitalize(), height=220) for _, title in SERIES]
+
+    timer = gr.Timer(1 / PLOT_FPS)
+
+    def refresh_plots(window_name):
+        return live_frames(get_ingestor().buffer(schema.name), WINDOWS[window_name])
+
+    live.change(fn=lambda enabled: gr.Timer(active=enabled), inputs=live, outputs=timer, queue=False)
+    fps.change(fn=lambda rate: gr.Timer(value=1 / rate), inputs=fps, outputs=timer, queue=False)
+    timer.tick(fn=refresh_plots, inputs=window, outputs=[status] + plots, queue=False, show_progress="hidden")
+    window.change(fn=refresh_plots, inputs=window, outputs=[status] + plots, queue=False, show_progress="hidden")
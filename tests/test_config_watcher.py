@@ -0,0 +1,34 @@
+import json
+import os
+
+from config_watcher import ConfigWatcher
+
+PARAMS = {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}
+
+
+def write(path, params, mtime):
+    with open(path, "w") as f:
+        json.dump(dict(params, flag_reason="Latest", flag_msg=""), f)
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_newest_copy_wins_whichever_is_checked_last(tmp_path):
+    src, install = str(tmp_path / "src.json"), str(tmp_path / "install.json")
+    write(src, dict(PARAMS, kp=2.0), 2_000_000_000)
+    write(install, PARAMS, 1_000_000_000)
+    delivered = []
+    watcher = ConfigWatcher([src, install], delivered.append, schema="pure_pursuit", backend="poll")
+
+    assert watcher.check([src, install])
+    assert delivered[-1]["kp"] == 2.0
+    # A stale install/ copy changing on its own does not replace the newer edit.
+    write(install, dict(PARAMS, kp=0.5), 1_500_000_000)
+    assert not watcher.check(install)
+    assert watcher.params["kp"] == 2.0
+
+    # Both copies of a new flag are delivered once.
+    write(src, dict(PARAMS, kp=3.0), 3_000_000_000)
+    write(install, dict(PARAMS, kp=3.0), 3_000_000_000)
+    assert watcher.check(src)
+    assert not watcher.check(install)
+    assert [params["kp"] for params in delivered] == [2.0, 3.0]
@@ -0,0 +1,67 @@
+import pytest
+
+from flag_cache import FlagCache
+from flag_history import SWEEP_REASON, FlagHistory
+from param_schema import load_schema
+from param_sweep import check_ranges, parse_range, run_sweep
+from telemetry import TelemetryIngestor, TelemetryStore
+
+PARAMS = {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}
+
+
+def test_sweep_does_not_change_latest(tmp_path):
+    history = FlagHistory(str(tmp_path / "flag_history.sqlite3"))
+    cache = FlagCache(history)
+    ingestor = TelemetryIngestor(store=TelemetryStore(str(tmp_path / "telemetry.sqlite3")), history=history)
+    car_id = history.append("pure_pursuit", PARAMS, "Golden", flagged_at=1000.0)
+    assert cache.latest("pure_pursuit").record_id == car_id
+
+    configs = [dict(PARAMS, kp=kp) for kp in (0.5, 1.5)]
+    results = list(run_sweep("pure_pursuit", configs, workers=1, history=history))
+
+    assert len(results) == 2
+    assert history.count("pure_pursuit", SWEEP_REASON) == 2
+    assert history.latest("pure_pursuit").record_id == car_id
+    assert history.latest("pure_pursuit", SWEEP_REASON).params["kp"] in (0.5, 1.5)
+    assert cache.latest("pure_pursuit").record_id == car_id
+    assert ingestor.active_config("pure_pursuit", 2e9) == car_id
+
+
+def test_cache_starts_after_the_last_row_not_the_newest_flag(tmp_path):
+    history = FlagHistory(str(tmp_path / "flag_history.sqlite3"))
+    history.append("pure_pursuit", PARAMS, "Golden", flagged_at=2000.0)
+    # Imported later, flagged earlier.
+    imported_id = history.append("pure_pursuit", dict(PARAMS, kp=2.0), "Other", flagged_at=1000.0)
+
+    assert history.max_id() == history.get(imported_id).id
+    assert FlagCache(history)._last_id == history.max_id()
+    assert FlagHistory(str(tmp_path / "empty.sqlite3")).max_id() == 0
+
+
+def test_cache_keeps_a_flag_appended_during_a_miss(tmp_path):
+    class RacingHistory(FlagHistory):
+        def latest(self, controller, reason=None):
+            record = super().latest(controller, reason)
+            if controller == "pure_pursuit" and not racing:
+                # Another operator flags between the read and the cache update.
+                racing.append(self.append("pure_pursuit", dict(PARAMS, kp=3.0), "Golden", flagged_at=3000.0))
+            return record
+
+    racing = []
+    history = RacingHistory(str(tmp_path / "flag_history.sqlite3"))
+    history.append("pure_pursuit", PARAMS, "Golden", flagged_at=1000.0)
+    cache = FlagCache(history, sync_interval=None)
+
+    assert cache.latest("pure_pursuit").record_id == racing[0]
+    assert cache.latest("pure_pursuit").record_id == racing[0]
+    assert not cache._pending
+
+
+def test_sweep_ranges_are_checked_before_the_sweep():
+    schema = load_schema("pure_pursuit")
+    check_ranges(schema, dict([parse_range("kp=0.5:5:0.5"), parse_range("kv=0,1.5")]))
+    for text in ("kp=0.5:6:0.5", "kv=0,9", "kp=3:1:0.5", "kp=1:2:0", "speed=1:2:1"):
+        with pytest.raises(ValueError):
+            check_ranges(schema, dict([parse_range(text)]))
+    with pytest.raises(ValueError, match="expected name=start:stop:step"):
+        parse_range("kp=1:3:x")
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from flag_history import FlagHistory
+from flagging import flag
+from param_writer import ParamWriter
+
+PARAMS = {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}
+
+
+def test_flag_reports_failed_json_write_with_snapshots(tmp_path):
+    history = FlagHistory(str(tmp_path / "flag_history.sqlite3"))
+    # A directory where the JSON file should go: the rename over it fails, the snapshot
+    # next to it is written.
+    json_path = tmp_path / "pure_pursuit_params.json"
+    json_path.mkdir()
+
+    record_id, future = flag("pure_pursuit", PARAMS, "Golden", history=history, writer=ParamWriter(fsync=False),
+                             paths=[str(json_path)], snapshots=True)
+
+    with pytest.raises(OSError):
+        future.result(timeout=10)
+    assert os.path.exists(tmp_path / "pure_pursuit_params.bin")
+    assert history.get(record_id).params == PARAMS
+
+
+def test_flag_with_snapshots_resolves_to_every_path(tmp_path):
+    paths = [str(tmp_path / "pure_pursuit_params.json")]
+    _, future = flag("pure_pursuit", PARAMS, history=FlagHistory(str(tmp_path / "flag_history.sqlite3")),
+                     writer=ParamWriter(fsync=False), paths=paths, snapshots=True)
+
+    assert future.result(timeout=10) == paths + [str(tmp_path / "pure_pursuit_params.bin")]
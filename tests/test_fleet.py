@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+from fleet import ACK_MAGIC, APPLIED, PUSH_MAGIC, REJECTED, SUPERSEDED, FleetAgent, decode, encode
+from flagging import config_paths
+from param_writer import ParamWriter
+
+KEY = b"fleet secret"
+PUSH = {"car": "car1", "controller": "pure_pursuit", "params": {"throttle": 0.15, "kp": 1.0, "kv": 1.0, "lookahead_distance": 1.2}}
+
+
+def agent(tmp_path, host="127.0.0.1", key=None):
+    return FleetAgent("car1", host, 0, str(tmp_path), writer=ParamWriter(fsync=False), key=key)
+
+
+def test_agent_listens_on_loopback_without_key(tmp_path):
+    car = agent(tmp_path)
+    try:
+        assert car.address[0] == "127.0.0.1"
+        _, _, _, ack = decode(car.handle(encode(PUSH_MAGIC, 1, 1, PUSH)), ACK_MAGIC)
+        assert ack["status"] == APPLIED
+    finally:
+        car.close()
+
+
+def test_agent_requires_key_on_other_addresses(tmp_path):
+    with pytest.raises(ValueError):
+        agent(tmp_path, "0.0.0.0")
+    with pytest.raises(ValueError):
+        agent(tmp_path, "")
+
+
+def test_keyed_agent_only_takes_signed_pushes(tmp_path):
+    car = agent(tmp_path, "0.0.0.0", KEY)
+    try:
+        assert car.handle(encode(PUSH_MAGIC, 1, 1, PUSH)) is None
+        assert car.handle(encode(PUSH_MAGIC, 1, 1, PUSH, b"another key")) is None
+        _, _, _, ack = decode(car.handle(encode(PUSH_MAGIC, 1, 1, PUSH, KEY)), ACK_MAGIC, KEY)
+        assert ack["status"] == APPLIED
+    finally:
+        car.close()
+
+
+def test_agent_rejects_replayed_pushes(tmp_path):
+    car = agent(tmp_path, "0.0.0.0", KEY)
+    old = dict(PUSH, params=dict(PUSH["params"], kp=2.0))
+    try:
+        captured = encode(PUSH_MAGIC, 1, 1, old, KEY)
+        assert decode(car.handle(captured), ACK_MAGIC, KEY)[3]["status"] == APPLIED
+        # A newer publisher session pushes, then the captured push is replayed.
+        assert decode(car.handle(encode(PUSH_MAGIC, 2, 1, PUSH, KEY)), ACK_MAGIC, KEY)[3]["status"] == APPLIED
+        assert decode(car.handle(captured), ACK_MAGIC, KEY)[3]["status"] == SUPERSEDED
+        with open(config_paths("pure_pursuit", str(tmp_path))[0]) as f:
+            assert json.load(f)["kp"] == 1.0
+    finally:
+        car.close()
+
+
+def test_agent_rejects_stale_pushes(tmp_path):
+    car = agent(tmp_path, "0.0.0.0", KEY)
+    try:
+        stale = encode(PUSH_MAGIC, 1, 1, PUSH, KEY, sent_at=time.time() - 60)
+        assert decode(car.handle(stale), ACK_MAGIC, KEY)[3]["status"] == REJECTED
+        ahead = encode(PUSH_MAGIC, 1, 2, PUSH, KEY, sent_at=time.time() + 60)
+        assert decode(car.handle(ahead), ACK_MAGIC, KEY)[3]["status"] == REJECTED
+    finally:
+        car.close()
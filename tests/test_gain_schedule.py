@@ -0,0 +1,58 @@
+import math
+
+import numpy as np
+import pytest
+
+from gain_schedule import MAX_TABLE_BYTES, GainSchedule, GainTable
+
+SPEEDS = [0, 1, 2, 3, 4, 5, 6, 8, 10]
+CURVATURES = [0, 0.1, 0.2, 0.4, 0.8, 1.5]
+
+
+def schedule(speeds, curvatures):
+    rng = np.random.default_rng(0)
+    shape = (len(speeds), len(curvatures))
+    gains = {"kp": rng.uniform(0.2, 3, shape).tolist(), "kd": rng.uniform(0, 1, shape).tolist(), "ki": rng.uniform(0, 0.1, shape).tolist()}
+    return GainSchedule("wall_follow", speeds, curvatures, gains)
+
+
+def test_uniform_table_is_exact():
+    table = schedule(SPEEDS, CURVATURES).compile()
+
+    assert table.uniform
+    assert (table.speed_nodes, table.curvature_nodes) == (11, 16)
+    assert table.error < 1e-6
+
+
+def test_uneven_breakpoints_are_indexed_within_the_size_cap():
+    gain_schedule = schedule([0, 1.3, 4, 10], [0, 0.37, 1.5])
+    table = gain_schedule.compile()
+
+    # A uniform grid through every breakpoint takes 101 x 151 nodes.
+    assert not table.uniform
+    assert table.nbytes <= MAX_TABLE_BYTES
+    assert table.error < 1e-6
+    speeds, curvatures = np.linspace(-1, 11, 500), np.linspace(-1.6, 1.6, 500)
+    expected = gain_schedule.lookup_many(speeds, curvatures)
+    assert np.abs(np.array([table.lookup(s, c) for s, c in zip(speeds, curvatures)]) - expected).max() < 1e-6
+    assert np.abs(table.lookup_many(speeds, curvatures) - expected).max() < 1e-6
+
+    loaded = GainTable.from_bytes(table.to_bytes())
+    assert len(table.to_bytes()) == table.nbytes
+    assert np.abs(loaded.lookup_many(speeds, curvatures) - expected).max() < 1e-6
+
+
+@pytest.mark.parametrize("speeds, curvatures", [(SPEEDS, CURVATURES), ([0, 1.3, 4, 10], [0, 0.37, 1.5])])
+def test_non_finite_inputs_are_clamped(speeds, curvatures):
+    gain_schedule = schedule(speeds, curvatures)
+    table = gain_schedule.compile()
+    first, last = gain_schedule.lookup(0, 0), gain_schedule.lookup(speeds[-1], curvatures[-1])
+
+    assert table.lookup(math.nan, 0.0) == pytest.approx(first, abs=1e-6)
+    assert table.lookup(0.0, math.nan) == pytest.approx(first, abs=1e-6)
+    assert table.lookup(math.inf, -math.inf) == pytest.approx(last, abs=1e-6)
+    assert gain_schedule.lookup(math.nan, math.nan) == pytest.approx(first)
+    batch = table.lookup_many([math.nan, math.inf, -math.inf], [math.nan, math.inf, 0.0])
+    assert np.abs(batch[:2] - np.array([first, last])).max() < 1e-6
+    assert np.all(np.isfinite(batch))
+    assert np.all(np.isfinite(gain_schedule.lookup_many([math.nan], [math.nan])))
@@ -0,0 +1,18 @@
+import os
+import stat
+
+from param_writer import ParamWriter, write_atomic
+
+
+def test_new_files_get_the_umask_and_keep_existing_modes(tmp_path):
+    umask = os.umask(0o022)
+    os.umask(umask)
+    path = str(tmp_path / "pure_pursuit_params.json")
+
+    write_atomic(path, b"{}")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o666 & ~umask
+
+    os.chmod(path, 0o640)
+    ParamWriter(fsync=True).submit([path], {"kp": 1.0}).result(timeout=10)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp_")]
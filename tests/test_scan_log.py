@@ -0,0 +1,21 @@
+import numpy as np
+
+from scan_log import ScanLog, ScanLogWriter, record_dtype
+
+
+def test_writer_drops_a_partial_record_when_reopening(tmp_path):
+    path = str(tmp_path / "scans.bin")
+    with ScanLogWriter(path, beams=8) as writer:
+        writer.write_many([0.0, 0.1], np.ones((2, 8)))
+    with open(path, "ab") as f:
+        # A writer killed partway through a record.
+        f.write(b"\1" * (record_dtype(8).itemsize // 2))
+
+    with ScanLogWriter(path, beams=8) as writer:
+        writer.write(0.2, np.full(8, 2.0))
+
+    with ScanLog(path) as log:
+        assert len(log) == 3
+        stamp, ranges = log.frame(2)
+        assert stamp == 0.2
+        np.testing.assert_array_equal(ranges, np.full(8, 2.0))
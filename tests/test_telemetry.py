@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from flag_history import FlagHistory
+from telemetry import TelemetryIngestor, TelemetryStore
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    return TelemetryIngestor(store=TelemetryStore(str(tmp_path / "telemetry.sqlite3")),
+                             history=FlagHistory(str(tmp_path / "flag_history.sqlite3")), capacity=100)
+
+
+def sample(t, controller="pure_pursuit"):
+    return {"t": t, "controller": controller, "speed": 3.0, "cte": 0.1, "steering": 0.0}
+
+
+def test_unknown_controllers_are_dropped(ingestor):
+    taken = ingestor.ingest([sample(1.0), sample(1.0, "nope"), sample(1.1, "x" * 1000), sample(1.2, ["pure_pursuit"])])
+
+    assert taken == 1
+    assert ingestor.unknown == 2
+    assert set(ingestor.buffers) == {"pure_pursuit"}
+    with pytest.raises(ValueError):
+        ingestor.buffer("nope")
+
+
+def test_late_samples_stay_out_of_the_buffer(ingestor):
+    ingestor.ingest([sample(t) for t in (1.0, 2.0, 3.0)])
+    ingestor.ingest([sample(t) for t in (2.5, 4.0, 3.5, 5.0)])
+
+    buffer = ingestor.buffer("pure_pursuit")
+    assert ingestor.late == 2
+    assert buffer.view()[:, 0].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert np.all(np.diff(buffer.view()[:, 0]) >= 0)
+    assert buffer.view(since=3.5)[:, 0].tolist() == [4.0, 5.0]
+    # The windows still count every sample.
+    assert ingestor.samples == 7
@@ -42,4 +42,5 @@ demo = gr.Interface(
     theme="soft",
     )
 
-demo.launch()
\ No newline at end of file
+if __name__ == "__main__":
+    demo.launch()